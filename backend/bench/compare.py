@@ -0,0 +1,43 @@
+"""
+Compare two bench.run result files endpoint by endpoint.
+
+    cd backend && python -m bench.compare before.json after.json
+"""
+import argparse
+import json
+
+COLUMNS = ("throughput_rps", "p50_ms", "p95_ms", "p99_ms", "bytes_per_request", "cpu_ms_per_request")
+
+
+def _change(old, new):
+    if not old:
+        return "    n/a"
+    return f"{(new - old) / old * 100:+6.1f}%"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("before")
+    parser.add_argument("after")
+    args = parser.parse_args()
+
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+    print(f"before: {before['meta'].get('commit')}  after: {after['meta'].get('commit')}")
+    print(f"{'endpoint':<18}" + "".join(f"{c:>24}" for c in COLUMNS))
+    for name, new in after["endpoints"].items():
+        old = before["endpoints"].get(name)
+        if old is None:
+            print(f"{name:<18}  (new)")
+            continue
+        print(f"{name:<18}" + "".join(
+            f"{old[c]:>9.1f} →{new[c]:>7.1f} {_change(old[c], new[c])}" if c in old and c in new
+            else f"{'n/a':>24}"
+            for c in COLUMNS
+        ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Mixed read/write load test, driving the FastAPI app in-process.
+
+Concurrent clients issue a mix of catalog/detail/search reads and
+complete/review writes against a scratch copy of the database and report
+throughput and latency percentiles per request type.
+
+    cd backend && python -m bench.mixed_load [--clients 64] [--seconds 10] [--write-ratio 0.2]
+
+Exits non-zero on any 5xx response, or a p99 over --max-p99-ms.
+"""
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from bench.stats import percentile
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+async def client(http, course_ids, write_ratio, deadline, stats, rng):
+    while time.perf_counter() < deadline:
+        if rng.random() < write_ratio:
+            if rng.random() < 0.5:
+                kind, call = "complete", http.post(
+                    "/api/complete", json={"user_id": f"u{rng.randrange(1000)}", "course_id": rng.choice(course_ids)})
+            else:
+                kind, call = "review", http.post(
+                    "/api/review", json={"course_id": rng.choice(course_ids), "rating": rng.randint(1, 5)})
+        else:
+            r = rng.random()
+            if r < 0.4:
+                kind, call = "courses", http.get(
+                    "/api/courses", params={"limit": 20, "cursor": rng.choice(course_ids) + 1})
+            elif r < 0.8:
+                kind, call = "course", http.get(f"/api/course/{rng.choice(course_ids)}")
+            else:
+                kind, call = "search", http.get("/api/search", params={"q": rng.choice(["data", "web", "mach", "cloud"])})
+        start = time.perf_counter()
+        resp = await call
+        elapsed = (time.perf_counter() - start) * 1000
+        stats.setdefault(kind, []).append(elapsed)
+        if resp.status_code >= 500:
+            stats.setdefault("errors", []).append(elapsed)
+
+
+async def run(app, clients, seconds, write_ratio, seed):
+    import httpx
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as http:
+            resp = await http.get("/api/courses", params={"fields": "course_id"})
+            course_ids = [c["course_id"] for c in resp.json()["courses"]]
+            stats = {}
+            deadline = time.perf_counter() + seconds
+            started = time.perf_counter()
+            await asyncio.gather(*[
+                client(http, course_ids, write_ratio, deadline, stats, random.Random(seed + i))
+                for i in range(clients)
+            ])
+            elapsed = time.perf_counter() - started
+    return stats, elapsed
+
+
+def report(stats, elapsed):
+    total = sum(len(v) for k, v in stats.items() if k != "errors")
+    print(f"{total} requests in {elapsed:.1f}s: {total / elapsed:.0f} req/s, "
+          f"{len(stats.get('errors', []))} errors")
+    print(f"{'kind':<10}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for kind in sorted(k for k in stats if k != "errors"):
+        values = sorted(stats[kind])
+        print(f"{kind:<10}{len(values):>8}{percentile(values, 50):>10.2f}"
+              f"{percentile(values, 95):>10.2f}{percentile(values, 99):>10.2f}")
+
+
+def failures(stats, max_p99_ms=None):
+    """Why this run should fail: server errors, and p99s over max_p99_ms."""
+    problems = []
+    if stats.get("errors"):
+        problems.append(f"{len(stats['errors'])} requests failed with 5xx")
+    if max_p99_ms is not None:
+        for kind in sorted(k for k in stats if k != "errors"):
+            p99 = percentile(sorted(stats[kind]), 99)
+            if p99 > max_p99_ms:
+                problems.append(f"{kind} p99 {p99:.1f} ms > {max_p99_ms:g} ms")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mixed read/write load test")
+    parser.add_argument("--db", default=os.path.join(BACKEND, "db.sqlite"),
+                        help="database to copy into a scratch directory")
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    parser.add_argument("--no-cache", action="store_true", help="disable the response cache")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-p99-ms", type=float,
+                        help="exit non-zero if any request type's p99 exceeds this")
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp(prefix="course-bench-")
+    try:
+        db_path = os.path.join(scratch, "db.sqlite")
+        shutil.copy(args.db, db_path)
+        # Configuration is read at import time.
+        os.environ["COURSE_DB_PATH"] = db_path
+        os.environ["MODEL_DIR"] = os.path.join(scratch, "models")
+        if args.no_cache:
+            os.environ["RESPONSE_CACHE_SIZE"] = "0"
+        sys.path.insert(0, BACKEND)
+        from main import app
+
+        stats, elapsed = asyncio.run(run(app, args.clients, args.seconds, args.write_ratio, args.seed))
+        report(stats, elapsed)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+    problems = failures(stats, args.max_p99_ms)
+    if problems:
+        sys.exit("FAIL: " + "; ".join(problems))
+
+
+if __name__ == "__main__":
+    main()
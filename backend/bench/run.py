@@ -0,0 +1,230 @@
+"""
+Per-endpoint API benchmark on a synthetic database.
+
+Builds (or reuses) a synthetic database with bench.synthetic, then drives
+each endpoint with concurrent clients either in-process (httpx ASGI
+transport, no network) or over HTTP against a running server, and writes
+p50/p95/p99 latency, throughput, bytes on the wire and CPU per request for
+each endpoint to a JSON file so runs can be compared across commits.
+
+    cd backend && python -m bench.run --scale medium --out bench-medium.json
+    cd backend && python -m bench.run --db /tmp/bench.sqlite --clients 32 --requests 2000
+    cd backend && python -m bench.run --url http://127.0.0.1:8000 --out bench-http.json
+
+With --url, the server must already be serving the database given by --db
+(or the one the scale would generate); it is only used to pick ids.
+
+CPU per request is process time over the scenario, so in-process it covers
+the app and the client, and with --url only the client. Serialization and
+compression before/after (see payloads.py):
+
+    cd backend && COMPRESSION=0 JSON_ENCODER=json python -m bench.run --out before.json
+    cd backend && python -m bench.run --out after.json
+    cd backend && python -m bench.compare before.json after.json
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench.stats import summarize
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+QUERIES = ["data", "web", "machine learning", "cloud", "security", "design", "python"]
+
+
+def _catalog(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        course_ids = [r[0] for r in conn.execute("SELECT course_id FROM courses")]
+        tags = set()
+        for (value,) in conn.execute("SELECT tags FROM courses LIMIT 2000"):
+            tags.update(t.strip() for t in (value or "").split(",") if t.strip())
+    finally:
+        conn.close()
+    return course_ids, sorted(tags)
+
+
+def scenarios(course_ids, tags):
+    """name -> fn(rng) returning (method, path, kwargs) for one request."""
+    def recommend_body(rng):
+        return {"cgpa": round(rng.uniform(5.0, 10.0), 1),
+                "interests": rng.sample(tags, min(3, len(tags))), "top_k": 10}
+
+    return {
+        "courses": lambda rng: ("GET", "/api/courses", {
+            "params": {"limit": 50, "cursor": rng.choice(course_ids)}}),
+        "courses_filtered": lambda rng: ("GET", "/api/courses", {
+            "params": {"limit": 50, "tag": rng.choice(tags), "max_min_cgpa": 8}}),
+        "course": lambda rng: ("GET", f"/api/course/{rng.choice(course_ids)}", {}),
+        "search": lambda rng: ("GET", "/api/search", {"params": {"q": rng.choice(QUERIES)}}),
+        "similar": lambda rng: ("GET", f"/api/course/{rng.choice(course_ids)}/similar", {}),
+        "recommend": lambda rng: ("POST", "/api/recommend", {"json": recommend_body(rng)}),
+        "recommend_batch": lambda rng: ("POST", "/api/recommend/batch", {
+            "json": {"requests": [recommend_body(rng) for _ in range(16)]}}),
+        "complete": lambda rng: ("POST", "/api/complete", {
+            "json": {"user_id": f"user{rng.randrange(10_000)}", "course_id": rng.choice(course_ids)}}),
+        "review": lambda rng: ("POST", "/api/review", {
+            "json": {"course_id": rng.choice(course_ids), "user_id": f"user{rng.randrange(10_000)}",
+                     "rating": rng.randint(1, 5)}}),
+    }
+
+
+async def run_scenario(http, make_request, clients, requests, seed):
+    latencies = []
+    errors = wire_bytes = body_bytes = 0
+    remaining = iter(range(requests))
+
+    async def client(rng):
+        nonlocal errors, wire_bytes, body_bytes
+        for _ in remaining:
+            method, path, kwargs = make_request(rng)
+            start = time.perf_counter()
+            resp = await http.request(method, path, **kwargs)
+            latencies.append((time.perf_counter() - start) * 1000)
+            wire_bytes += resp.num_bytes_downloaded
+            body_bytes += len(resp.content)
+            if resp.status_code >= 400:
+                errors += 1
+
+    started, cpu_started = time.perf_counter(), time.process_time()
+    await asyncio.gather(*[client(random.Random(seed + i)) for i in range(clients)])
+    result = summarize(latencies, time.perf_counter() - started, errors)
+    n = max(len(latencies), 1)
+    result["bytes_per_request"] = round(wire_bytes / n, 1)
+    result["body_bytes_per_request"] = round(body_bytes / n, 1)
+    result["cpu_ms_per_request"] = round((time.process_time() - cpu_started) * 1000 / n, 3)
+    return result
+
+
+async def run_all(http, selected, clients, requests, warmup, seed, log=print):
+    results = {}
+    for name, make_request in selected.items():
+        if warmup:
+            await run_scenario(http, make_request, clients, warmup, seed)
+        results[name] = await run_scenario(http, make_request, clients, requests, seed)
+        r = results[name]
+        log(f"{name:<18}{r['count']:>7}{r['throughput_rps']:>10.0f}{r['p50_ms']:>10.2f}"
+            f"{r['p95_ms']:>10.2f}{r['p99_ms']:>10.2f}{r['bytes_per_request']:>10.0f}"
+            f"{r['cpu_ms_per_request']:>8.2f}{r['errors']:>8}")
+    return results
+
+
+async def in_process(app, selected, args):
+    import httpx
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench",
+                                     headers={"accept-encoding": args.accept_encoding}) as http:
+            return await run_all(http, selected, args.clients, args.requests, args.warmup, args.seed)
+
+
+async def over_http(url, selected, args):
+    import httpx
+
+    limits = httpx.Limits(max_connections=args.clients)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30,
+                                 headers={"accept-encoding": args.accept_encoding}) as http:
+        return await run_all(http, selected, args.clients, args.requests, args.warmup, args.seed)
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    scratch = tempfile.mkdtemp(prefix="course-bench-")
+    db_path = os.path.join(scratch, "db.sqlite")
+    # Configuration (db.DB_PATH included) is read at import time, so point it
+    # at the scratch copy before anything from the backend is imported.
+    os.environ["COURSE_DB_PATH"] = db_path
+    os.environ["MODEL_DIR"] = os.path.join(scratch, "models")
+    from bench import synthetic
+
+    parser = argparse.ArgumentParser(description="Per-endpoint API benchmark")
+    synthetic.add_arguments(parser)
+    parser.add_argument("--db", help="existing database to copy instead of generating one")
+    parser.add_argument("--url", help="benchmark a running server instead of the app in-process")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=1000, help="requests per endpoint")
+    parser.add_argument("--warmup", type=int, default=50, help="unmeasured requests per endpoint")
+    parser.add_argument("--endpoints", help="comma-separated subset of scenarios")
+    parser.add_argument("--no-cache", action="store_true", help="disable the response cache")
+    parser.add_argument("--accept-encoding", default="gzip, br",
+                        help='Accept-Encoding sent by the clients ("identity" for none)')
+    parser.add_argument("--out", default="bench-results.json")
+    args = parser.parse_args()
+    if args.no_cache:
+        os.environ["RESPONSE_CACHE_SIZE"] = "0"
+
+    try:
+        if args.db:
+            shutil.copy(args.db, db_path)
+        else:
+            synthetic.generate(db_path, *synthetic.sizes(args), seed=args.seed)
+
+        course_ids, tags = _catalog(db_path)
+        selected = scenarios(course_ids, tags)
+        if args.endpoints:
+            names = [n.strip() for n in args.endpoints.split(",") if n.strip()]
+            unknown = set(names) - set(selected)
+            if unknown:
+                parser.error(f"unknown endpoints: {', '.join(sorted(unknown))}")
+            selected = {n: selected[n] for n in names}
+
+        print(f"{'endpoint':<18}{'count':>7}{'req/s':>10}{'p50 ms':>10}"
+              f"{'p95 ms':>10}{'p99 ms':>10}{'bytes':>10}{'cpu ms':>8}{'errors':>8}")
+        if args.url:
+            results = asyncio.run(over_http(args.url, selected, args))
+        else:
+            sys.path.insert(0, BACKEND)
+            from main import app
+
+            results = asyncio.run(in_process(app, selected, args))
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    courses, reviews, interactions, users = synthetic.sizes(args)
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.datetime.utcnow().isoformat(timespec="seconds") + "Z",
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "mode": "http" if args.url else "in-process",
+            "url": args.url,
+            "db": args.db,
+            "scale": None if args.db else {
+                "name": args.scale, "courses": courses, "reviews": reviews,
+                "interactions": interactions, "users": users, "seed": args.seed,
+            },
+            "clients": args.clients,
+            "requests": args.requests,
+            "response_cache": not args.no_cache,
+            "accept_encoding": args.accept_encoding,
+            "compression": os.environ.get("COMPRESSION", "1") != "0",
+            "json_encoder": os.environ.get("JSON_ENCODER", "orjson"),
+        },
+        "endpoints": results,
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print("Wrote", args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""
+Startup-time benchmark: how long a new worker takes to import, to pass
+GET /ready, and to answer its first /api/recommend compared with a warm
+one, on a synthetic (or copied) database.
+
+Two ways of starting a worker are measured, each as a real server process:
+
+    cold     `uvicorn main:app`: import, preload and warm-up in the worker
+    forked   PRELOAD_ON_IMPORT=1 parent that has already imported and
+             preloaded, forking the worker (what gunicorn --preload does);
+             timed from the fork request
+
+    cd backend && python -m bench.startup --scale small --runs 5
+    cd backend && python -m bench.startup --db /tmp/bench.sqlite --modes cold
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench.run import BACKEND, git_commit
+
+READY_TIMEOUT = 120.0
+RECOMMEND_BODY = {"cgpa": 8.0, "interests": ["Python", "Data Science"], "top_k": 10}
+STEADY_REQUESTS = 20
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def import_time(env):
+    """Seconds to `import main` in a fresh interpreter (interpreter startup excluded)."""
+    code = "import time; t = time.perf_counter(); import main; print(time.perf_counter() - t)"
+    out = subprocess.run([sys.executable, "-c", code], cwd=BACKEND, env=env,
+                         capture_output=True, text=True, check=True).stdout
+    return float(out.strip().splitlines()[-1])
+
+
+def wait_ready(http, url, proc, started):
+    """Poll /ready until it returns 200; seconds since `started`."""
+    while time.perf_counter() - started < READY_TIMEOUT:
+        if proc.poll() is not None:
+            raise RuntimeError(f"server exited with {proc.returncode}")
+        try:
+            if http.get(url + "/ready").status_code == 200:
+                return time.perf_counter() - started
+        except Exception:
+            pass
+        time.sleep(0.005)
+    raise RuntimeError("server did not become ready")
+
+
+def request_times(http, url):
+    """(first /api/recommend ms, median of the next STEADY_REQUESTS ms)."""
+    times = []
+    for _ in range(STEADY_REQUESTS + 1):
+        started = time.perf_counter()
+        http.post(url + "/api/recommend", json=RECOMMEND_BODY).raise_for_status()
+        times.append((time.perf_counter() - started) * 1000)
+    return times[0], statistics.median(times[1:])
+
+
+def start_worker(mode, port, env):
+    """(process, perf_counter at which the worker started being created)."""
+    if mode == "cold":
+        cmd = [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+               "--port", str(port), "--log-level", "warning"]
+        started = time.perf_counter()
+        return subprocess.Popen(cmd, cwd=BACKEND, env=env), started
+    cmd = [sys.executable, "-m", "bench.startup", "--serve-forked", str(port)]
+    proc = subprocess.Popen(cmd, cwd=BACKEND, env=dict(env, PRELOAD_ON_IMPORT="1"),
+                            stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    while proc.stdout.readline().strip() != "preloaded":
+        if proc.poll() is not None:
+            raise RuntimeError(f"preloading parent exited with {proc.returncode}")
+    started = time.perf_counter()
+    proc.stdin.write("fork\n")
+    proc.stdin.flush()
+    return proc, started
+
+
+def measure(mode, env):
+    import httpx
+
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}"
+    proc, started = start_worker(mode, port, env)
+    try:
+        with httpx.Client(timeout=30) as http:
+            ready = wait_ready(http, url, proc, started)
+            first, steady = request_times(http, url)
+            startup_ms = http.get(url + "/ready").json().get("startup_ms", {})
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        proc.wait(timeout=30)
+    return {"ready_ms": ready * 1000, "first_request_ms": first,
+            "steady_request_ms": steady, "server": startup_ms}
+
+
+def serve_forked(port):
+    """--serve-forked: import (and so preload) main, then fork one uvicorn worker on request."""
+    sys.path.insert(0, BACKEND)
+    import uvicorn
+
+    import main
+
+    print("preloaded", flush=True)
+    sys.stdin.readline()
+    pid = os.fork()
+    if pid == 0:
+        uvicorn.run(main.app, host="127.0.0.1", port=port, log_level="warning")
+        os._exit(0)
+    signal.signal(signal.SIGTERM, lambda *_: os.kill(pid, signal.SIGTERM))
+    os.waitpid(pid, 0)
+
+
+def _median(runs, key):
+    return round(statistics.median(r[key] for r in runs), 2)
+
+
+def main():
+    if len(sys.argv) == 3 and sys.argv[1] == "--serve-forked":
+        serve_forked(int(sys.argv[2]))
+        return
+
+    from bench import synthetic
+
+    parser = argparse.ArgumentParser(description="Startup-time benchmark")
+    synthetic.add_arguments(parser)
+    parser.add_argument("--db", help="existing database to copy instead of generating one")
+    parser.add_argument("--runs", type=int, default=3, help="server starts per mode")
+    parser.add_argument("--modes", default="cold,forked", help="comma-separated: cold, forked")
+    parser.add_argument("--out", default="bench-startup.json")
+    args = parser.parse_args()
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    unknown = set(modes) - {"cold", "forked"}
+    if unknown:
+        parser.error(f"unknown modes: {', '.join(sorted(unknown))}")
+
+    scratch = tempfile.mkdtemp(prefix="course-startup-")
+    db_path = os.path.join(scratch, "db.sqlite")
+    env = dict(os.environ, COURSE_DB_PATH=db_path, MODEL_DIR=os.path.join(scratch, "models"))
+    try:
+        if args.db:
+            shutil.copy(args.db, db_path)
+        else:
+            synthetic.generate(db_path, *synthetic.sizes(args), seed=args.seed)
+        # Migrate the schema and fold the interactions into popularity once,
+        # so every measured start sees an already-deployed database.
+        subprocess.run([sys.executable, "popularity.py", "--db", db_path], cwd=BACKEND,
+                       env=env, check=True, capture_output=True)
+
+        imports = [import_time(env) * 1000 for _ in range(args.runs)]
+        print(f"import main: {statistics.median(imports):.0f} ms (median of {args.runs})")
+        print(f"{'mode':<8}{'ready ms':>10}{'first ms':>10}{'steady ms':>11}")
+        results = {"import_ms": round(statistics.median(imports), 2)}
+        for mode in modes:
+            runs = [measure(mode, env) for _ in range(args.runs)]
+            results[mode] = {
+                "ready_ms": _median(runs, "ready_ms"),
+                "first_request_ms": _median(runs, "first_request_ms"),
+                "steady_request_ms": _median(runs, "steady_request_ms"),
+                "server_startup_ms": runs[-1]["server"],
+            }
+            r = results[mode]
+            print(f"{mode:<8}{r['ready_ms']:>10.0f}{r['first_request_ms']:>10.2f}"
+                  f"{r['steady_request_ms']:>11.2f}")
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    courses, reviews, interactions, users = synthetic.sizes(args)
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.datetime.utcnow().isoformat(timespec="seconds") + "Z",
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "db": args.db,
+            "scale": None if args.db else {
+                "name": args.scale, "courses": courses, "reviews": reviews,
+                "interactions": interactions, "users": users, "seed": args.seed,
+            },
+            "runs": args.runs,
+        },
+        "startup": results,
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print("Wrote", args.out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Synthetic catalogs, reviews and interactions at benchmark scale.
+
+Extends seed_db.py: the schema comes from init_db() and courses are
+variations on SEED_COURSES (same providers, tag vocabulary, CGPA and
+difficulty distributions), written with chunked executemany.
+
+    cd backend && python -m bench.synthetic --scale medium --out /tmp/bench.sqlite
+    cd backend && python -m bench.synthetic --courses 5000 --interactions 2000000 --out ...
+"""
+import argparse
+import datetime
+import os
+import random
+import sqlite3
+import sys
+import time
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND not in sys.path:
+    sys.path.insert(0, BACKEND)
+
+from db import register_functions  # noqa: E402
+from seed_db import SEED_COURSES, init_db, sync_course_tags  # noqa: E402
+
+# courses, reviews, interactions, users
+SCALES = {
+    "small": (1_000, 5_000, 100_000, 2_000),
+    "medium": (10_000, 50_000, 1_000_000, 20_000),
+    "large": (100_000, 500_000, 5_000_000, 200_000),
+}
+
+CHUNK = 20_000
+EVENT_TYPES = ["view"] * 6 + ["purchase"] * 2 + ["complete"] * 2
+LEVELS = ["Foundations of", "Applied", "Advanced", "Practical", "Modern", "Hands-on"]
+EXTRA_TAGS = ["Python", "Statistics", "Mobile", "Databases", "Networks", "Robotics",
+              "Game Development", "Product Management", "Marketing", "Embedded Systems"]
+WORDS = ("project based lectures quizzes case studies labs assignments industry "
+         "tools theory practice fundamentals deployment optimization design").split()
+
+
+def _courses(rng, n):
+    for i in range(n):
+        base = rng.choice(SEED_COURSES)
+        tags = [t.strip() for t in base["tags"].split(",")]
+        if rng.random() < 0.5:
+            tags.append(rng.choice(EXTRA_TAGS))
+        description = base["description"] + " " + " ".join(rng.choices(WORDS, k=12))
+        yield (
+            f"{rng.choice(LEVELS)} {base['title']} {i + 1}",
+            base["provider"],
+            description,
+            ", ".join(dict.fromkeys(tags)),
+            rng.choice([0.0, 5.0, 5.5, 6.0, 6.5, 7.0, 7.5, 8.0]),
+            base["difficulty"],
+            base["duration_weeks"],
+            "",
+            base["source"],
+        )
+
+
+def _timestamp(rng, now, days):
+    return now - datetime.timedelta(seconds=rng.randrange(days * 86_400))
+
+
+def _reviews(rng, n, course_ids, users, now):
+    for _ in range(n):
+        yield (
+            rng.choice(course_ids),
+            f"user{rng.randrange(users)}",
+            None,
+            min(5, max(1, int(rng.gauss(3.8, 1.0) + 0.5))),
+            None,
+            None,
+            rng.choice([None, "good", "too long", "great projects"]),
+            int(rng.random() < 0.2),
+            _timestamp(rng, now, 365),
+        )
+
+
+def _interactions(rng, n, course_ids, users, now):
+    # A few popular courses get most of the traffic, as in production.
+    weights = [1.0 / (rank + 1) ** 0.8 for rank in range(len(course_ids))]
+    popular = rng.sample(course_ids, len(course_ids))
+    for start in range(0, n, CHUNK):
+        picks = rng.choices(popular, weights=weights, k=min(CHUNK, n - start))
+        for cid in picks:
+            yield (
+                f"user{rng.randrange(users)}",
+                cid,
+                rng.choice(EVENT_TYPES),
+                None,
+                _timestamp(rng, now, 180),
+            )
+
+
+def _insert(conn, sql, rows):
+    count = 0
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= CHUNK:
+            conn.executemany(sql, batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        conn.executemany(sql, batch)
+        count += len(batch)
+    conn.commit()
+    return count
+
+
+def generate(db_path, courses, reviews, interactions, users, seed=0, log=print):
+    """Create db_path with init_db() and fill it with synthetic data."""
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    init_db(db_path)
+    rng = random.Random(seed)
+    now = datetime.datetime.utcnow()
+    conn = register_functions(sqlite3.connect(db_path))
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")  # scratch data; speed over durability
+
+    start = time.perf_counter()
+    n = _insert(conn, (
+        "INSERT INTO courses (title, provider, description, tags, min_cgpa, "
+        "difficulty, duration_weeks, url, source) VALUES (?,?,?,?,?,?,?,?,?)"
+    ), _courses(rng, courses))
+    course_ids = [r[0] for r in conn.execute("SELECT course_id FROM courses")]
+    elective_ids = [(cid,) for cid in course_ids if rng.random() < 0.25]
+    _insert(conn, "INSERT INTO electives (course_id) VALUES (?)", elective_ids)
+    sync_course_tags(conn)
+    log(f"courses: {n} ({len(elective_ids)} electives) in {time.perf_counter() - start:.1f}s")
+
+    start = time.perf_counter()
+    n = _insert(conn, (
+        "INSERT INTO reviews (course_id, user_id, reviewer_name, rating, pros, cons, "
+        "comment, is_senior, created_at) VALUES (?,?,?,?,?,?,?,?,?)"
+    ), _reviews(rng, reviews, course_ids, users, now))
+    log(f"reviews: {n} in {time.perf_counter() - start:.1f}s")
+
+    start = time.perf_counter()
+    n = _insert(conn, (
+        "INSERT INTO interactions (user_id, course_id, event_type, details, created_at) "
+        "VALUES (?,?,?,?,?)"
+    ), _interactions(rng, interactions, course_ids, users, now))
+    log(f"interactions: {n} in {time.perf_counter() - start:.1f}s")
+    conn.close()
+    return db_path
+
+
+def add_arguments(parser):
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--courses", type=int, help="override the scale's course count")
+    parser.add_argument("--reviews", type=int)
+    parser.add_argument("--interactions", type=int)
+    parser.add_argument("--users", type=int)
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def sizes(args):
+    courses, reviews, interactions, users = SCALES[args.scale]
+    return (
+        args.courses if args.courses is not None else courses,
+        args.reviews if args.reviews is not None else reviews,
+        args.interactions if args.interactions is not None else interactions,
+        args.users if args.users is not None else users,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic benchmark database")
+    add_arguments(parser)
+    parser.add_argument("--out", required=True)
+    args = parser.parse_args()
+    generate(args.out, *sizes(args), seed=args.seed)
@@ -0,0 +1,160 @@
+import bisect
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from course_index import interest_set
+
+RESPONSE_CACHE_SIZE = int(os.environ.get("RESPONSE_CACHE_SIZE", "512"))
+RESPONSE_CACHE_TTL = float(os.environ.get("RESPONSE_CACHE_TTL", "60"))  # seconds
+RECOMMEND_CACHE_SIZE = int(os.environ.get("RECOMMEND_CACHE_SIZE", "4096"))
+RECOMMEND_CACHE_DEPTH = int(os.environ.get("RECOMMEND_CACHE_DEPTH", "100"))  # courses kept per entry
+
+
+class CacheEntry:
+    __slots__ = ("body", "etag", "tags", "expires", "variants")
+
+    def __init__(self, body: bytes, tags, expires: float):
+        self.body = body
+        self.variants = {}  # content-coding -> compressed body (payloads.encode_cached)
+        self.etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        self.tags = frozenset(tags)
+        self.expires = expires
+
+
+class ResponseCache:
+    """
+    Size-bounded LRU of serialized responses with a per-entry TTL.
+
+    Entries carry tags (e.g. "courses", "course:42") so a write can drop
+    exactly the responses it affects with invalidate(). A response computed
+    while an invalidation was happening is not stored, so a stale body can
+    never outlive the write that changed it.
+    """
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_SIZE, ttl: float = RESPONSE_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def generation(self):
+        """Pass to put() to detect invalidations that raced with a rebuild."""
+        return self._generation
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.expires < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, body: bytes, tags=(), generation=None):
+        entry = CacheEntry(body, tags, time.monotonic() + self.ttl)
+        if self.max_entries <= 0:
+            return entry
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return entry  # invalidated while building; serve but don't keep
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, *tags):
+        tags = set(tags)
+        with self._lock:
+            self._generation += 1
+            for key in [k for k, e in self._entries.items() if e.tags & tags]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RecommendCache:
+    """
+    LRU of ranked recommend lists keyed on a canonical request.
+
+    Results only depend on the CGPA through the min_cgpa <= cgpa filter, so
+    the CGPA is reduced to its bucket: how many distinct min_cgpa values
+    it clears (set_thresholds). Interests become a lower-cased frozenset.
+    An entry keeps the ranking `depth` courses deep, so any top_k up to
+    that is a slice; a list shorter than its depth is the complete ranking.
+    Any catalog or rating change must call invalidate().
+    """
+
+    def __init__(self, max_entries: int = RECOMMEND_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (ranked list, depth)
+        self._thresholds = []
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def generation(self):
+        return self._generation
+
+    def set_thresholds(self, min_cgpas):
+        """Distinct min_cgpa values of the catalog (NULL counted as 0); clears the cache."""
+        thresholds = sorted({m if m is not None else 0.0 for m in min_cgpas})
+        with self._lock:
+            self._thresholds = thresholds
+            self._generation += 1
+            self._entries.clear()
+
+    def key(self, cgpa: float, interests, *extra):
+        """Canonical key; `extra` distinguishes personalized entries (user, model version...)."""
+        bucket = bisect.bisect_right(self._thresholds, cgpa)
+        return (bucket, interest_set(interests)) + extra
+
+    def get(self, key, top_k: int):
+        """The first top_k courses, or None if the entry is missing or too shallow."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                ranked, depth = entry
+                if top_k <= depth or len(ranked) < depth:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return ranked[:top_k]
+            self.misses += 1
+            return None
+
+    def put(self, key, ranked, depth: int, generation=None):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return  # computed against a catalog that has since changed
+            self._entries[key] = (ranked, depth)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,330 @@
+"""
+Streaming bulk importer for provider course feeds.
+
+Reads CSV or JSONL (optionally .gz) one row at a time and writes chunks of
+rows per transaction with executemany, so memory stays flat however large
+the feed is. Courses are upserted on (provider, title); tags are
+normalized (the courses triggers link them in `tags`/`course_tags`);
+`is_elective` sets the electives flag. Every imported course_id is
+appended to `catalog_changes`, which a running API server polls
+(CatalogWatcher) to refresh its recommender and response cache without a
+restart. /api/review logs kind='rating' rows there too, so every worker
+sees new ratings, not just the one that wrote the review.
+
+Feed columns (extra columns are ignored):
+    title, provider, description, tags, min_cgpa, difficulty,
+    duration_weeks, url, source, is_elective
+`tags` is "AI, ML" in CSV, or a string or list in JSONL.
+
+    python catalog_import.py feed.csv [feed2.jsonl.gz ...] [--db PATH] [--chunk-size 5000]
+"""
+import argparse
+import csv
+import gzip
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from db import DB_PATH, register_functions
+
+CHUNK_SIZE = int(os.environ.get("IMPORT_CHUNK_SIZE", "5000"))
+CATALOG_POLL_SECONDS = float(os.environ.get("CATALOG_POLL_SECONDS", "5"))
+# catalog_changes rows older than this are pruned after each import and by
+# the API server's popularity job; far longer than any running server takes
+# to poll them.
+CATALOG_CHANGES_RETENTION_HOURS = float(os.environ.get("CATALOG_CHANGES_RETENTION_HOURS", "24"))
+
+COURSE_COLUMNS = ("title", "provider", "description", "tags", "min_cgpa",
+                  "difficulty", "duration_weeks", "url", "source")
+
+UPSERT_COURSE = f"""
+    INSERT INTO courses ({", ".join(COURSE_COLUMNS)})
+    VALUES ({", ".join("?" * len(COURSE_COLUMNS))})
+    ON CONFLICT(provider, title) DO UPDATE SET
+    {", ".join(f"{c} = excluded.{c}" for c in COURSE_COLUMNS[2:])}
+"""
+
+
+# ---------- Reading ----------
+
+def _open_text(path):
+    if path.endswith(".gz"):
+        return io.TextIOWrapper(gzip.open(path, "rb"), encoding="utf-8", newline="")
+    return open(path, encoding="utf-8", newline="")
+
+
+def read_feed(path):
+    """
+    Yield raw rows from a .csv or .jsonl/.ndjson file (optionally .gz):
+    dicts for CSV, unparsed lines for JSONL, which parse_row() decodes so
+    one bad line is skipped like any other bad row.
+    """
+    name = path[:-3] if path.endswith(".gz") else path
+    with _open_text(path) as f:
+        if name.endswith(".csv"):
+            yield from csv.DictReader(f)
+        elif name.endswith((".jsonl", ".ndjson")):
+            for line in f:
+                if line.strip():
+                    yield line
+        else:
+            raise ValueError(f"Unsupported feed format: {path} (expected .csv or .jsonl)")
+
+
+def normalize_tags(tags):
+    """'ml,  AI , ml' or ['ml', 'AI'] -> ['ml', 'AI'] (trimmed, case-insensitive dedupe)."""
+    if tags is None:
+        return []
+    if isinstance(tags, str):
+        tags = tags.split(",")
+    seen, result = set(), []
+    for tag in tags:
+        tag = " ".join(str(tag).split())
+        if tag and tag.lower() not in seen:
+            seen.add(tag.lower())
+            result.append(tag)
+    return result
+
+
+def _blank(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def _float(value):
+    return None if _blank(value) else float(value)
+
+
+def _int(value):
+    return None if _blank(value) else int(float(value))
+
+
+def _text(value):
+    return None if _blank(value) else str(value).strip()
+
+
+def _flag(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes", "y")
+    return bool(value)
+
+
+def parse_row(raw):
+    """Feed row (dict or JSON line) -> (course values tuple, tag list, is_elective). Raises ValueError."""
+    if isinstance(raw, str):
+        raw = json.loads(raw)  # JSONDecodeError is a ValueError
+    if not isinstance(raw, dict):
+        raise ValueError(f"expected an object, got {type(raw).__name__}")
+    title = _text(raw.get("title"))
+    if title is None:
+        raise ValueError("missing title")
+    tags = normalize_tags(raw.get("tags"))
+    course = (
+        title,
+        _text(raw.get("provider")) or "",  # NULLs would never match the upsert key
+        _text(raw.get("description")),
+        ", ".join(tags),
+        _float(raw.get("min_cgpa")),
+        _text(raw.get("difficulty")),
+        _int(raw.get("duration_weeks")),
+        _text(raw.get("url")) or "",
+        _text(raw.get("source")),
+    )
+    return course, tags, _flag(raw.get("is_elective"))
+
+
+# ---------- Writing ----------
+
+class CatalogImporter:
+    """Upserts parsed feed rows a chunk (one transaction) at a time."""
+
+    def __init__(self, conn, chunk_size: int = CHUNK_SIZE, log=print):
+        self.conn = conn
+        self.chunk_size = max(1, chunk_size)
+        self.log = log
+        self.rows = 0
+        self.skipped = 0
+        self.duplicates = 0
+        conn.execute(
+            "CREATE TEMP TABLE IF NOT EXISTS import_keys "
+            "(pos INTEGER PRIMARY KEY, provider TEXT, title TEXT)"
+        )
+
+    def import_rows(self, raw_rows, source="feed"):
+        """Import an iterable of raw feed rows (see read_feed); returns the number written."""
+        started = time.perf_counter()
+        written = skipped = read = 0
+        chunk = []
+        for line, raw in enumerate(raw_rows, start=1):
+            try:
+                chunk.append(parse_row(raw))
+            except (ValueError, TypeError) as e:
+                skipped += 1
+                self.log(f"{source}: skipped row {line}: {e}")
+                continue
+            if len(chunk) >= self.chunk_size:
+                read += len(chunk)
+                written += self._write_chunk(chunk)
+                chunk = []
+                rate = read / (time.perf_counter() - started)
+                self.log(f"{source}: {read} rows ({rate:,.0f} rows/s)")
+        if chunk:
+            read += len(chunk)
+            written += self._write_chunk(chunk)
+        elapsed = time.perf_counter() - started
+        self.rows += written
+        self.skipped += skipped
+        self.duplicates += read - written
+        self.log(f"{source}: imported {written} rows in {elapsed:.1f}s "
+                 f"({read / elapsed if elapsed else 0:,.0f} rows/s), skipped {skipped}, "
+                 f"{read - written} repeated within a chunk")
+        return written
+
+    def _write_chunk(self, chunk):
+        # A feed may repeat a course within one chunk; the last row wins.
+        latest = {}
+        for course, tags, elective in chunk:
+            latest[(course[1], course[0])] = (course, tags, elective)
+        rows = list(latest.values())
+
+        conn = self.conn
+        with conn:
+            conn.executemany(UPSERT_COURSE, [course for course, _, _ in rows])
+
+            conn.execute("DELETE FROM import_keys")
+            conn.executemany(
+                "INSERT INTO import_keys (pos, provider, title) VALUES (?,?,?)",
+                [(i, course[1], course[0]) for i, (course, _, _) in enumerate(rows)],
+            )
+            ids = dict(conn.execute(
+                "SELECT k.pos, c.course_id FROM import_keys k "
+                "JOIN courses c ON c.provider = k.provider AND c.title = k.title"
+            ))
+            course_ids = [(ids[i],) for i in range(len(rows))]
+
+            conn.executemany("DELETE FROM electives WHERE course_id = ?", course_ids)
+            conn.executemany(
+                "INSERT INTO electives (course_id) VALUES (?)",
+                [(ids[i],) for i, (_, _, elective) in enumerate(rows) if elective],
+            )
+
+            conn.executemany("INSERT INTO catalog_changes (course_id) VALUES (?)", course_ids)
+        return len(rows)
+
+
+def prune_changes(conn, retention_hours: float = CATALOG_CHANGES_RETENTION_HOURS):
+    """Delete catalog_changes rows older than retention_hours; returns how many."""
+    with conn:
+        return conn.execute(
+            "DELETE FROM catalog_changes WHERE changed_at < datetime('now', ?)",
+            (f"-{retention_hours} hours",),
+        ).rowcount
+
+
+def import_files(paths, db_path: str = DB_PATH, chunk_size: int = CHUNK_SIZE, log=print):
+    """Import feed files into db_path; returns the CatalogImporter with totals."""
+    from seed_db import init_db
+
+    init_db(db_path)
+    conn = register_functions(sqlite3.connect(db_path))
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    try:
+        importer = CatalogImporter(conn, chunk_size, log)
+        for path in paths:
+            importer.import_rows(read_feed(path), source=os.path.basename(path))
+        prune_changes(conn)
+        conn.execute("PRAGMA optimize")  # refresh planner stats for the new rows
+    finally:
+        conn.close()
+    return importer
+
+
+# ---------- Server-side refresh ----------
+
+class CatalogWatcher:
+    """
+    Polls catalog_changes from a running API server and hands the course_ids
+    changed since the last poll to on_change(course_ids), so imports reach
+    the in-memory recommender without a restart. Courses whose only change
+    is a new rating go to on_ratings(course_ids) instead, which needs no
+    re-embedding. If changes it never saw were already pruned, it calls
+    on_change(None): reload everything.
+
+    `read` runs fn(conn) on a reader connection (db.reads.run_sync).
+    """
+
+    def __init__(self, read, on_change, on_ratings=None, poll_seconds: float = CATALOG_POLL_SECONDS):
+        self.read = read
+        self.on_change = on_change
+        self.on_ratings = on_ratings
+        self.poll_seconds = poll_seconds
+        self.watermark = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def mark_current(self, read=None):
+        """Skip every change already logged (the caller just loaded the full catalog)."""
+        # The AUTOINCREMENT counter, not MAX(change_id): the table may have been pruned empty.
+        self.watermark = (read or self.read)(lambda conn: conn.execute(
+            "SELECT COALESCE(MAX(seq), 0) FROM sqlite_sequence WHERE name = 'catalog_changes'"
+        ).fetchone()[0])
+
+    def poll(self) -> int:
+        def changes(conn):
+            rows = conn.execute(
+                "SELECT change_id, course_id, kind FROM catalog_changes WHERE change_id > ? "
+                "ORDER BY change_id",
+                (self.watermark,),
+            ).fetchall()
+            return rows
+
+        rows = self.read(changes)
+        if not rows:
+            return 0
+        # change_ids are AUTOINCREMENT (never reused, no gaps on rollback), so
+        # a gap right after the watermark means prune_changes() deleted rows
+        # this watcher had not seen yet.
+        if rows[0][0] > self.watermark + 1:
+            self.on_change(None)
+            self.watermark = rows[-1][0]
+            return len(rows)
+        course_ids = {cid for _, cid, kind in rows if kind != "rating"}
+        rated = {cid for _, cid, kind in rows if kind == "rating"} - course_ids  # a refresh reads ratings too
+        if course_ids:
+            self.on_change(sorted(course_ids))
+        if rated and self.on_ratings is not None:
+            self.on_ratings(sorted(rated))
+        self.watermark = rows[-1][0]
+        return len(course_ids) + len(rated)
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_seconds):
+            try:
+                self.poll()
+            except Exception as e:
+                print("Catalog refresh failed:", e)
+
+    def start(self):
+        if self._thread is None and self.poll_seconds > 0:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._watch, name="catalog-watch", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("feeds", nargs="+", help=".csv / .jsonl files, optionally gzipped")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+    importer = import_files(args.feeds, args.db, args.chunk_size)
+    print(f"Done: {importer.rows} rows imported, {importer.skipped} skipped.")
@@ -0,0 +1,114 @@
+"""
+Collaborative-filtering scores for /api/recommend, read from the artifacts
+written by train.py.
+
+Factor arrays are opened with numpy memmap, so every uvicorn worker maps
+the same page-cache pages instead of holding a private copy. ModelStore
+watches MODEL_DIR/CURRENT and swaps to a new version in the background;
+requests already holding the previous model finish against it.
+"""
+import json
+import os
+import threading
+
+import numpy as np
+
+MODEL_DIR = os.environ.get("MODEL_DIR", os.path.join(os.path.dirname(__file__), "models"))
+MODEL_POLL_SECONDS = float(os.environ.get("MODEL_POLL_SECONDS", "5"))
+
+
+class CFModel:
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        self.version = self.meta.get("version", os.path.basename(path))
+        with open(os.path.join(path, "user_ids.json")) as f:
+            self.user_index = {u: i for i, u in enumerate(json.load(f))}
+        self.course_ids = np.load(os.path.join(path, "course_ids.npy"), mmap_mode="r")
+        self.course_index = {int(c): i for i, c in enumerate(self.course_ids)}
+        self.user_factors = np.load(os.path.join(path, "user_factors.npy"), mmap_mode="r")
+        self.item_factors = np.load(os.path.join(path, "item_factors.npy"), mmap_mode="r")
+
+    def has_user(self, user_id) -> bool:
+        return user_id in self.user_index
+
+    def user_scores(self, user_id):
+        """Predicted preference for every course in the model (aligned with course_ids)."""
+        return self.item_factors @ self.user_factors[self.user_index[user_id]]
+
+    def score_courses(self, user_id, course_ids):
+        """{course_id: preference} for the given courses; unknown courses score 0."""
+        vec = self.user_factors[self.user_index[user_id]]
+        rows = [self.course_index.get(cid) for cid in course_ids]
+        known = [r for r in rows if r is not None]
+        values = self.item_factors[known] @ vec if known else []
+        scores = dict.fromkeys(course_ids, 0.0)
+        for cid, v in zip((c for c, r in zip(course_ids, rows) if r is not None), values):
+            scores[cid] = float(v)
+        return scores
+
+    def top_courses(self, user_id, n: int):
+        """Best n (course_id, preference) pairs for a user."""
+        scores = self.user_scores(user_id)
+        n = min(n, len(scores))
+        if n <= 0:
+            return []
+        part = np.argpartition(-scores, n - 1)[:n]
+        part = part[np.argsort(-scores[part], kind="stable")]
+        return [(int(self.course_ids[i]), float(scores[i])) for i in part]
+
+
+def read_pointer(model_dir: str = MODEL_DIR):
+    """Version named in model_dir/CURRENT, or None if nothing is trained yet."""
+    try:
+        with open(os.path.join(model_dir, "CURRENT")) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+class ModelStore:
+    """Holds the active CFModel and hot-swaps it when CURRENT changes."""
+
+    def __init__(self, model_dir: str = MODEL_DIR, poll_seconds: float = MODEL_POLL_SECONDS):
+        self.model_dir = model_dir
+        self.poll_seconds = poll_seconds
+        self.current = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def version(self):
+        model = self.current
+        return model.version if model is not None else None
+
+    def refresh(self) -> bool:
+        """Load the version in CURRENT if it differs from the active one."""
+        version = read_pointer(self.model_dir)
+        active = self.current
+        if version is None or (active is not None and os.path.basename(active.path) == version):
+            return False
+        model = CFModel(os.path.join(self.model_dir, version))
+        self.current = model  # single reference swap; readers never see a partial model
+        print(f"Loaded CF model {model.version}")
+        return True
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_seconds):
+            try:
+                self.refresh()
+            except Exception as e:
+                # Keep serving the previous version if the new one is unreadable.
+                print("CF model reload failed:", e)
+
+    def start(self):
+        if self._thread is None and self.poll_seconds > 0:
+            self._thread = threading.Thread(target=self._watch, name="cf-model-watch", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
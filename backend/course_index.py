@@ -0,0 +1,236 @@
+import bisect
+import heapq
+import os
+import threading
+from collections import Counter
+
+from metrics import observe_candidates
+
+
+def normalize_tag(tag: str) -> str:
+    """
+    The one folding rule for tags and interests: trimmed, Unicode
+    lower-case ('  Économie' -> 'économie'). The courses triggers call it
+    too, as the SQL function normalize_tag() (db.register_functions).
+    """
+    return tag.strip().lower()
+
+
+def parse_tags(tags: str | None):
+    """'AI, ML, Data Science' -> {'ai', 'ml', 'data science'}"""
+    return frozenset(t for t in map(normalize_tag, (tags or "").split(",")) if t)
+
+
+def interest_set(interests):
+    """A request's interests, normalized like tags, blanks dropped."""
+    return frozenset(t for t in map(normalize_tag, interests or ()) if t)
+
+
+# Weight of the precomputed popularity_score (0..1, see popularity.py) in
+# recommend scoring; 0 keeps the rating-only ranking.
+POPULARITY_WEIGHT = float(os.environ.get("POPULARITY_WEIGHT", "0"))
+
+
+def rating_boost(avg_rating: float):
+    return (avg_rating - 3.0) * 0.3  # small rating boost
+
+
+def course_boost(course):
+    """Everything but tag overlap: rating boost, plus the popularity term if enabled."""
+    boost = rating_boost(course.get("avg_rating") or 0.0)
+    if POPULARITY_WEIGHT:
+        boost += POPULARITY_WEIGHT * (course.get("popularity_score") or 0.0)
+    return boost
+
+
+def rule_score(course, interests_set):
+    """Rule-based score of one course dict: tag overlap + rating (+ popularity) boost."""
+    overlap = len(interests_set & parse_tags(course.get("tags")))
+    return overlap + course_boost(course)
+
+
+def brute_force_recommend(courses, cgpa: float, interests, top_k: int):
+    """
+    The original rule-based loop: score every eligible course, best first,
+    ties by course_id. Reference for the parity checks; O(catalog).
+    """
+    interests_set = interest_set(interests)
+    scored = [
+        (-rule_score(c, interests_set), c["course_id"], c)
+        for c in courses
+        if (c["min_cgpa"] if c.get("min_cgpa") is not None else 0.0) <= cgpa
+    ]
+    scored.sort(key=lambda x: (x[0], x[1]))
+    return [dict(c) for _, _, c in scored[:max(top_k, 0)]]
+
+
+class CourseIndex:
+    """
+    In-memory copy of the catalog, precomputed for /api/recommend.
+
+    Holds normalized tag sets, an inverted index tag -> course ids, the
+    courses ordered by min_cgpa (for bisect filtering) and by rating boost,
+    so a request only scores courses sharing a tag with the student plus
+    the best-rated eligible courses, instead of re-reading and re-parsing
+    the whole courses table.
+
+    Scores and tie-breaking (lower course_id first) match the original
+    rule-based loop exactly.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.courses = {}        # course_id -> row dict
+        self.tags = {}           # course_id -> frozenset of tags
+        self.min_cgpa = {}       # course_id -> float
+        self.boost = {}          # course_id -> rating boost
+        self.by_tag = {}         # tag -> set of course_ids
+        self._cgpa_keys = []     # sorted min_cgpa values
+        self._cgpa_ids = []      # course_ids aligned with _cgpa_keys
+        self._by_boost = []      # sorted (-boost, course_id)
+
+    def __len__(self):
+        return len(self.courses)
+
+    def get(self, course_id: int):
+        course = self.courses.get(course_id)
+        return dict(course) if course is not None else None
+
+    def tag_set(self, course_id: int):
+        """The course's parsed tags (frozenset), or None if unknown."""
+        return self.tags.get(course_id)
+
+    # ---------- Building / incremental updates ----------
+
+    def build(self, rows):
+        """Rebuild from rows of COURSES_WITH_RATINGS."""
+        with self._lock:
+            self._reset()
+            for r in rows:
+                self._add(dict(r))
+            order = sorted(self.min_cgpa.items(), key=lambda x: (x[1], x[0]))
+            self._cgpa_keys = [m for _, m in order]
+            self._cgpa_ids = [cid for cid, _ in order]
+            self._by_boost = sorted((-b, cid) for cid, b in self.boost.items())
+
+    def _add(self, course):
+        cid = course["course_id"]
+        tags = parse_tags(course.get("tags"))
+        self.courses[cid] = course
+        self.tags[cid] = tags
+        self.min_cgpa[cid] = course["min_cgpa"] if course.get("min_cgpa") is not None else 0.0
+        self.boost[cid] = course_boost(course)
+        for t in tags:
+            self.by_tag.setdefault(t, set()).add(cid)
+
+    def _unlink(self, cid):
+        for t in self.tags.pop(cid, ()):
+            ids = self.by_tag.get(t)
+            if ids is not None:
+                ids.discard(cid)
+                if not ids:
+                    del self.by_tag[t]
+        if cid in self.min_cgpa:
+            _remove_sorted(self._cgpa_keys, self._cgpa_ids, self.min_cgpa.pop(cid), cid)
+        if cid in self.boost:
+            _remove_pair(self._by_boost, (-self.boost.pop(cid), cid))
+        self.courses.pop(cid, None)
+
+    def upsert_course(self, row):
+        """Add or replace one course (row of COURSES_WITH_RATINGS)."""
+        course = dict(row)
+        cid = course["course_id"]
+        with self._lock:
+            self._unlink(cid)
+            self._add(course)
+            m = self.min_cgpa[cid]
+            i = bisect.bisect_right(self._cgpa_keys, m)
+            # keep equal min_cgpa values ordered by course_id
+            while i > 0 and self._cgpa_keys[i - 1] == m and self._cgpa_ids[i - 1] > cid:
+                i -= 1
+            self._cgpa_keys.insert(i, m)
+            self._cgpa_ids.insert(i, cid)
+            bisect.insort(self._by_boost, (-self.boost[cid], cid))
+
+    def remove_course(self, course_id: int):
+        with self._lock:
+            self._unlink(course_id)
+
+    def update_rating(self, course_id: int, avg_rating: float, rating_count: int):
+        """Apply a new rating aggregate for one course after a review write."""
+        with self._lock:
+            course = self.courses.get(course_id)
+            if course is None:
+                return
+            course = dict(course, avg_rating=avg_rating, rating_count=rating_count)
+            self.courses[course_id] = course
+            _remove_pair(self._by_boost, (-self.boost[course_id], course_id))
+            self.boost[course_id] = course_boost(course)
+            bisect.insort(self._by_boost, (-self.boost[course_id], course_id))
+
+    # ---------- Querying ----------
+
+    def recommend(self, cgpa: float, interests, top_k: int):
+        """Top-k course dicts for a student, best first."""
+        if top_k <= 0:
+            return []
+        interests_set = interest_set(interests)
+
+        with self._lock:
+            n_eligible = bisect.bisect_right(self._cgpa_keys, cgpa)
+            if n_eligible == 0:
+                return []
+
+            # Courses sharing at least one tag with the student.
+            overlap = Counter()
+            for tag in interests_set:
+                overlap.update(self.by_tag.get(tag, ()))
+            candidates = [
+                (-(n + self.boost[cid]), cid)
+                for cid, n in overlap.items()
+                if self.min_cgpa[cid] <= cgpa
+            ]
+
+            # Courses with no tag overlap score only their rating boost, so
+            # the best k of them by boost are the only ones that can place.
+            extra = []
+            if n_eligible <= len(self._by_boost) // 4:
+                extra = heapq.nsmallest(
+                    top_k,
+                    ((-self.boost[cid], cid) for cid in self._cgpa_ids[:n_eligible] if cid not in overlap),
+                )
+            else:
+                for neg_boost, cid in self._by_boost:
+                    if cid in overlap or self.min_cgpa[cid] > cgpa:
+                        continue
+                    extra.append((neg_boost, cid))
+                    if len(extra) >= top_k:
+                        break
+
+            observe_candidates(len(candidates) + len(extra))
+            top = heapq.nsmallest(top_k, candidates + extra)
+            return [dict(self.courses[cid]) for _, cid in top]
+
+    def recommend_many(self, requests):
+        """Yield recommend() results for (cgpa, interests, top_k) tuples, in order."""
+        for cgpa, interests, top_k in requests:
+            yield self.recommend(cgpa, interests, top_k)
+
+
+def _remove_pair(sorted_list, item):
+    i = bisect.bisect_left(sorted_list, item)
+    if i < len(sorted_list) and sorted_list[i] == item:
+        del sorted_list[i]
+
+
+def _remove_sorted(keys, ids, key, cid):
+    i = bisect.bisect_left(keys, key)
+    while i < len(keys) and keys[i] == key:
+        if ids[i] == cid:
+            del keys[i]
+            del ids[i]
+            return
+        i += 1
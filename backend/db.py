@@ -0,0 +1,171 @@
+import asyncio
+import contextvars
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+from course_index import normalize_tag
+
+# ---------- Config ----------
+
+DB_PATH = os.environ.get(
+    "COURSE_DB_PATH", os.path.join(os.path.dirname(__file__), "db.sqlite")
+)
+POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "8"))  # concurrent reader connections
+BUSY_TIMEOUT = float(os.environ.get("DB_BUSY_TIMEOUT", "5.0"))  # seconds
+STATEMENT_CACHE_SIZE = int(os.environ.get("DB_STATEMENT_CACHE", "128"))
+
+
+def register_functions(conn):
+    """
+    The SQL functions the schema's triggers call: normalize_tag() keeps
+    course_tags folded exactly like course_index.parse_tags. Any connection
+    that writes courses needs them (a plain sqlite3 shell gets "no such
+    function").
+    """
+    conn.create_function("normalize_tag", 1, _sql_normalize_tag, deterministic=True)
+    return conn
+
+
+def _sql_normalize_tag(tag):
+    return normalize_tag(tag) if isinstance(tag, str) else None
+
+
+def connect(db_path: str = DB_PATH):
+    """Open a connection tuned for a long-lived, shared server process."""
+    conn = sqlite3.connect(
+        db_path,
+        timeout=BUSY_TIMEOUT,
+        check_same_thread=False,  # handed between threadpool workers
+        cached_statements=STATEMENT_CACHE_SIZE,
+        factory=CountingConnection if metrics.METRICS_ENABLED else sqlite3.Connection,
+    )
+    conn.row_factory = sqlite3.Row
+    register_functions(conn)
+    # WAL lets readers proceed while /api/review etc. are writing;
+    # synchronous=NORMAL is durable across app crashes in WAL mode.
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA busy_timeout={int(BUSY_TIMEOUT * 1000)}")
+    metrics.connection_opened()
+    return conn
+
+
+def immediate_transaction(conn, fn):
+    """
+    fn() inside BEGIN IMMEDIATE on an autocommit connection (isolation_level
+    None): the write lock is taken up front, so a read-then-write step
+    never races another writer.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        result = fn()
+        conn.execute("COMMIT")
+        return result
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+
+class CountingConnection(sqlite3.Connection):
+    """Counts statements against the current request (see metrics.RequestStats)."""
+
+    def execute(self, sql, parameters=()):
+        metrics.count_query()
+        return super().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        metrics.count_query()
+        return super().executemany(sql, seq_of_parameters)
+
+
+# ---------- Read lane ----------
+
+class ReadLane:
+    """
+    Dedicated executor for read queries with bounded concurrency.
+
+    `size` threads each own one long-lived connection, so reads never touch
+    Starlette's threadpool and, with WAL, never wait behind a commit. All
+    writes go through the single writer in event_queue.EventWriter.
+
+        rows = await reads.run(lambda conn: conn.execute(sql).fetchall())
+    """
+
+    def __init__(self, db_path: str = DB_PATH, size: int = POOL_SIZE):
+        self.db_path = db_path
+        self.size = max(1, size)
+        self._local = threading.local()
+        self._conns = []
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix="db-read")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = connect(self.db_path)
+            with self._lock:
+                self._conns.append(conn)
+        return conn
+
+    def _call(self, fn, args, submitted=None):
+        conn = self._conn()
+        stats = metrics.current()
+        started = time.perf_counter()
+        try:
+            return fn(conn, *args)
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            if stats is not None:
+                stats.db_seconds += time.perf_counter() - started
+                stats.wait_seconds += started - submitted
+
+    async def run(self, fn, *args):
+        """Run fn(conn, *args) on a reader thread and await its result."""
+        loop = asyncio.get_running_loop()
+        if not metrics.METRICS_ENABLED:
+            return await loop.run_in_executor(self._executor, self._call, fn, args)
+        # Carry the request's metrics.RequestStats over to the reader thread.
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(
+            self._executor, context.run, self._call, fn, args, time.perf_counter()
+        )
+
+    def run_sync(self, fn, *args):
+        """Blocking variant for code that is not on the event loop."""
+        return self.submit(fn, *args).result()
+
+    def submit(self, fn, *args):
+        """Start fn(conn, *args) on a reader thread; returns a concurrent.futures.Future."""
+        if not metrics.METRICS_ENABLED:
+            return self._executor.submit(self._call, fn, args)
+        context = contextvars.copy_context()
+        return self._executor.submit(context.run, self._call, fn, args, time.perf_counter())
+
+    def warm(self, timeout: float = 5.0):
+        """Open every reader connection now rather than on the first requests."""
+        barrier = threading.Barrier(self.size)
+
+        def touch(conn):
+            conn.execute("SELECT 1").fetchone()
+            try:
+                barrier.wait(timeout)  # hold this thread so the next task gets a new one
+            except threading.BrokenBarrierError:
+                pass
+
+        for future in [self.submit(touch) for _ in range(self.size)]:
+            future.result()
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            for conn in self._conns:
+                conn.close()
+            self._conns.clear()
+
+
+reads = ReadLane()
@@ -0,0 +1,619 @@
+"""
+Offline ranking evaluation: replays the interactions log against the recommenders.
+
+Events (interactions plus positive reviews, weighted as in train.py) are
+split at a cutoff time. Everything before it is what the system knew: it
+sets the course ratings and popularity the scorers see, trains the CF
+model, and gives each user a context for recommend(), namely the tags of
+the courses they engaged with as interests. The held-out users are those
+with positive events after the cutoff. Each registered scorer ranks the
+catalog for them, with courses they already engaged with excluded, and is
+graded against what they went on to do:
+
+    precision@k, recall@k, hit_rate@k   per user, averaged
+    ndcg@k                              binary relevance, log2 discount
+    coverage@k                          share of the catalog recommended to anyone
+
+Users are scored a chunk at a time as one (users x courses) matrix, with
+chunks spread over a process pool. Every run writes a JSON report with
+the same keys, so runs can be diffed across commits.
+
+    python evaluate.py [--db PATH] [--test-fraction 0.2 | --cutoff 2026-09-01]
+                       [--k 5,10,20] [--scorers rule,popularity,cf,blend,pipeline]
+                       [--out eval-results.json]
+
+The rule scorer is VectorScorer.batch_scores, the rule stage of
+/api/recommend; cf and blend score the whole catalog. The pipeline scorer
+runs each user through pipeline.Pipeline with the generators and CF score
+term of generators.py (rules, popular, similar, cf), so it grades what
+/api/recommend actually serves, re-rank and diversity included. Stored
+users have no CGPA, so --cgpa (default 10, no filter) applies to everyone.
+"""
+import argparse
+import datetime
+import json
+import math
+import multiprocessing
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from course_index import parse_tags
+from db import DB_PATH
+from generators import CF_WEIGHT, register_generators
+from interaction_store import read_interactions
+from pipeline import Context, Pipeline
+from popularity import EVENTS, POPULARITY_HALF_LIFE_DAYS
+from similar import SimilarityIndex
+from train import EVENT_WEIGHTS, compress, implicit_als, review_weight
+from vector_engine import BATCH_CELLS, VectorScorer
+
+CHUNK_SIZE = 50_000
+
+
+# ---------- Loading ----------
+
+def _julianday(value: str) -> float:
+    day = datetime.datetime.fromisoformat(value)
+    if day.tzinfo is not None:
+        day = day.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return (day - datetime.datetime(1970, 1, 1)).total_seconds() / 86_400 + 2_440_587.5
+
+
+def _iso(julianday: float) -> str:
+    day = datetime.datetime(1970, 1, 1) + datetime.timedelta(days=julianday - 2_440_587.5)
+    return day.isoformat(timespec="seconds")
+
+
+def load_catalog(conn):
+    """Course rows ordered by course_id; column j of every score matrix is rows[j]."""
+    conn.row_factory = sqlite3.Row
+    try:
+        return [dict(r) for r in conn.execute("SELECT * FROM courses ORDER BY course_id")]
+    finally:
+        conn.row_factory = None
+
+
+def load_events(conn, positions, chunk_size=CHUNK_SIZE):
+    """
+    Stream weighted events into arrays (users, cols, days, weights), where
+    cols index the catalog (positions: course_id -> column) and days are
+    Julian days. Returns the user_id list as well.
+    """
+    users = {}
+    parts = []
+
+    def add(chunk):
+        if chunk:
+            parts.append(np.array(chunk, dtype=np.float64))
+
+    def user(u):
+        i = users.get(u)
+        if i is None:
+            i = users[u] = len(users)
+        return i
+
+    def reviews():
+        cur = conn.execute(
+            "SELECT user_id, course_id, rating, julianday(created_at) FROM reviews "
+            "WHERE user_id IS NOT NULL AND rating IS NOT NULL"
+        )
+        while True:
+            rows = cur.fetchmany(chunk_size)
+            if not rows:
+                return
+            yield rows
+
+    def interactions():
+        # Live and archived interactions (interaction_store.py); created_at is
+        # text there, so convert it here rather than with julianday() in SQL.
+        for rows in read_interactions(conn, event_types=EVENT_WEIGHTS,
+                                      columns=("user_id", "course_id", "event_type", "created_at"),
+                                      chunk_size=chunk_size):
+            yield [(u, cid, ev, _julianday(str(at)) if at is not None else None)
+                   for u, cid, ev, at in rows if u is not None and u != "anon"]
+
+    for chunks, weight in ((interactions(), EVENT_WEIGHTS.get), (reviews(), review_weight)):
+        for rows in chunks:
+            chunk = []
+            for u, cid, kind, day in rows:
+                col = positions.get(cid)
+                w = weight(kind)
+                if col is not None and day is not None and w > 0:
+                    chunk.append((user(u), col, day, w))
+            add(chunk)
+
+    if not parts:
+        empty = np.empty(0)
+        return list(users), empty.astype(np.int64), empty.astype(np.int64), empty, empty
+    data = np.concatenate(parts)
+    return (list(users), data[:, 0].astype(np.int64), data[:, 1].astype(np.int64),
+            data[:, 2], data[:, 3])
+
+
+def _pairs(users, cols, weights, n_courses):
+    """Sum duplicate (user, course) pairs -> (users, cols, weights)."""
+    key = users * n_courses + cols
+    uniq, inverse = np.unique(key, return_inverse=True)
+    return uniq // n_courses, uniq % n_courses, np.bincount(inverse, weights=weights)
+
+
+# ---------- Split ----------
+
+class Split:
+    """
+    Everything a scorer may see (train side) and what it is graded on (test side).
+
+    train: CSR over users x catalog columns of summed pre-cutoff weights.
+    test:  CSR of the relevant post-cutoff courses per evaluated user.
+    """
+
+    def __init__(self, rows, user_ids, users, cols, days, weights, cutoff,
+                 min_weight=1.0, exclude_seen=True, n_interests=3, cgpa=10.0,
+                 max_users=None, seed=0):
+        self.cutoff = cutoff
+        self.exclude_seen = exclude_seen
+        n_users, n_courses = len(user_ids), len(rows)
+        self.course_ids = np.array([r["course_id"] for r in rows], dtype=np.int64)
+        before = days < cutoff
+        self.n_train_events = int(before.sum())
+        self.n_test_events = int(len(days) - self.n_train_events)
+
+        tu, tc, tw = _pairs(users[before], cols[before], weights[before], n_courses)
+        self.train_pairs = (tu, tc, tw.astype(np.float32))
+        self.train = compress(tu, tc, tw, n_users)
+
+        vu, vc, vw = _pairs(users[~before], cols[~before], weights[~before], n_courses)
+        keep = vw >= min_weight
+        if exclude_seen:
+            keep &= ~np.isin(vu * n_courses + vc, tu * n_courses + tc)
+        vu, vc = vu[keep], vc[keep]
+
+        # Held-out users: something relevant after the cutoff and some history before it.
+        has_history = np.diff(self.train[0]) > 0
+        candidates = np.unique(vu)
+        candidates = candidates[has_history[candidates]]
+        if max_users and len(candidates) > max_users:
+            candidates = np.sort(np.random.default_rng(seed).choice(candidates, max_users, replace=False))
+        self.users = candidates
+        local = np.full(n_users, -1, dtype=np.int64)
+        local[candidates] = np.arange(len(candidates))
+        keep = local[vu] >= 0
+        self.test = compress(local[vu[keep]], vc[keep], np.ones(int(keep.sum())), len(candidates))
+
+        # What the catalog looked like at the cutoff. decayed_popularity is
+        # course_popularity.popularity then, once set_popularity() has run.
+        self.popularity = np.bincount(tc, weights=tw, minlength=n_courses)
+        self.decayed_popularity = self.popularity
+        self.rows = self._rows_at_cutoff(rows)
+
+        self.cgpas = np.full(len(candidates), cgpa)
+        self.interests = self._interests(rows, n_interests)
+        self.cf_factors = None  # (user, item) ALS factors, fitted once by the first cf scorer
+
+    def _rows_at_cutoff(self, rows):
+        scaled = self._popularity_scores()
+        return [dict(r, avg_rating=0.0, rating_count=0, popularity_score=float(scaled[j]))
+                for j, r in enumerate(rows)]
+
+    def _popularity_scores(self):
+        """popularity_score as popularity.py rescales it: log1p, 0..1."""
+        popularity = self.decayed_popularity
+        top = math.log1p(popularity.max()) if len(popularity) else 0.0
+        return np.log1p(popularity) / (top or 1.0)
+
+    def set_popularity(self, conn):
+        """
+        decayed_popularity (and popularity_score) as popularity.py would
+        have left course_popularity at the cutoff: every interaction before
+        it, anonymous ones too, by event weight with exponential decay.
+        """
+        positions = {cid: j for j, cid in enumerate(self.course_ids.tolist())}
+        decayed = np.zeros(len(self.course_ids))
+        for rows in read_interactions(conn, event_types=EVENTS,
+                                      columns=("course_id", "event_type", "created_at"),
+                                      chunk_size=CHUNK_SIZE):
+            for cid, event_type, at in rows:
+                j = positions.get(cid)
+                if j is None or at is None:
+                    continue
+                age = self.cutoff - _julianday(str(at))
+                if age > 0:
+                    decayed[j] += EVENTS[event_type][0] * 0.5 ** (age / POPULARITY_HALF_LIFE_DAYS)
+        self.decayed_popularity = decayed
+        for row, score in zip(self.rows, self._popularity_scores().tolist()):
+            row["popularity_score"] = score
+
+    def set_ratings(self, conn):
+        """avg_rating/rating_count from reviews written before the cutoff."""
+        positions = {cid: j for j, cid in enumerate(self.course_ids.tolist())}
+        for cid, avg, count in conn.execute(
+            "SELECT course_id, AVG(rating), COUNT(*) FROM reviews "
+            "WHERE rating IS NOT NULL AND julianday(created_at) < ? GROUP BY course_id",
+            (self.cutoff,),
+        ):
+            j = positions.get(cid)
+            if j is not None:
+                self.rows[j].update(avg_rating=float(avg), rating_count=int(count))
+
+    def _interests(self, rows, n):
+        """Each held-out user's n heaviest tags before the cutoff (ties alphabetical)."""
+        vocab = sorted({t for r in rows for t in parse_tags(r.get("tags"))})
+        tag_id = {t: i for i, t in enumerate(vocab)}
+        course_tags = [[tag_id[t] for t in parse_tags(r.get("tags"))] for r in rows]
+        tag_ptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum([len(t) for t in course_tags], out=tag_ptr[1:])
+        tag_idx = np.fromiter((t for tags in course_tags for t in tags), dtype=np.int64,
+                              count=int(tag_ptr[-1]))
+
+        # (user, course, weight) -> (user, tag, weight), summed per (user, tag).
+        indptr, indices, data = self.train
+        lengths = indptr[self.users + 1] - indptr[self.users]
+        pair = np.concatenate([np.arange(indptr[u], indptr[u + 1]) for u in self.users]) \
+            if len(self.users) else np.empty(0, dtype=np.int64)
+        user = np.repeat(np.arange(len(self.users)), lengths)
+        cols = indices[pair]
+        per_course = tag_ptr[cols + 1] - tag_ptr[cols]
+        starts = np.repeat(tag_ptr[cols] - np.cumsum(per_course) + per_course, per_course)
+        tags = tag_idx[starts + np.arange(int(per_course.sum()))]
+        key = np.repeat(user, per_course) * max(1, len(vocab)) + tags
+        uniq, inverse = np.unique(key, return_inverse=True)
+        weight = np.bincount(inverse, weights=np.repeat(data[pair], per_course))
+        user, tags = uniq // max(1, len(vocab)), uniq % max(1, len(vocab))
+
+        order = np.lexsort((tags, -weight, user))
+        user, tags = user[order], tags[order]
+        first = np.searchsorted(user, np.arange(len(self.users)))
+        rank = np.arange(len(user)) - first[user]
+        interests = [[] for _ in self.users]
+        for u, t in zip(user[rank < n].tolist(), tags[rank < n].tolist()):
+            interests[u].append(vocab[t])
+        return interests
+
+    def seen(self, users):
+        """(rows, cols) of the pre-cutoff courses of `users`, rows local to the list."""
+        indptr, indices, _ = self.train
+        lengths = indptr[users + 1] - indptr[users]
+        rows = np.repeat(np.arange(len(users)), lengths)
+        cols = np.concatenate([indices[indptr[u]:indptr[u + 1]] for u in users]) if len(users) else \
+            np.empty(0, dtype=np.int64)
+        return rows, cols
+
+    def relevant(self, local):
+        """Dense (len(local) x courses) relevance matrix for evaluated users local[i]."""
+        indptr, indices, _ = self.test
+        matrix = np.zeros((len(local), len(self.course_ids)), dtype=bool)
+        lengths = indptr[local + 1] - indptr[local]
+        cols = np.concatenate([indices[indptr[i]:indptr[i + 1]] for i in local])
+        matrix[np.repeat(np.arange(len(local)), lengths), cols] = True
+        return matrix, lengths
+
+
+# ---------- Scorers ----------
+
+SCORERS = {}
+
+
+def register_scorer(name):
+    """
+    Register factory(split, args) -> object with scores(local) returning a
+    (len(local) x courses) float matrix, -inf where a course is filtered out.
+    `local` indexes split.users.
+    """
+    def register(factory):
+        SCORERS[name] = factory
+        return factory
+    return register
+
+
+@register_scorer("rule")
+class RuleScorer:
+    """recommend(): tag overlap + rating/popularity boost, CGPA filter."""
+
+    def __init__(self, split, args):
+        self.split = split
+        self.engine = VectorScorer()
+        self.engine.build(split.rows)
+
+    def scores(self, local):
+        return self.engine.batch_scores(self.split.cgpas[local],
+                                        [self.split.interests[i] for i in local])
+
+
+@register_scorer("popularity")
+class PopularityScorer:
+    """Most engaged-with courses before the cutoff, same for everyone."""
+
+    def __init__(self, split, args):
+        self.split = split
+        self.popularity = split.popularity.astype(np.float64)
+        self.min_cgpa = np.array([r["min_cgpa"] if r["min_cgpa"] is not None else 0.0
+                                  for r in split.rows])
+
+    def scores(self, local):
+        score = np.repeat(self.popularity[None, :], len(local), axis=0)
+        score[self.min_cgpa[None, :] > self.split.cgpas[local][:, None]] = -np.inf
+        return score
+
+
+@register_scorer("cf")
+class CFScorer:
+    """Implicit ALS (train.py) fitted on the pre-cutoff events."""
+
+    def __init__(self, split, args):
+        if split.cf_factors is None:
+            rows, cols, values = split.train_pairs
+            user_f, item_f = implicit_als(rows, cols, values, len(split.train[0]) - 1,
+                                          len(split.course_ids), factors=args.factors,
+                                          iterations=args.iterations)
+            split.cf_factors = (user_f[split.users], item_f)
+        self.user_f, self.item_f = split.cf_factors
+
+    def scores(self, local):
+        return (self.user_f[local] @ self.item_f.T).astype(np.float64)
+
+
+@register_scorer("blend")
+class BlendScorer:
+    """rule + CF_WEIGHT * cf over the whole catalog (the pipeline scorer adds CF to a candidate pool)."""
+
+    def __init__(self, split, args):
+        self.rule = RuleScorer(split, args)
+        self.cf = CFScorer(split, args)
+
+    def scores(self, local):
+        return self.rule.scores(local) + CF_WEIGHT * self.cf.scores(local)
+
+
+@register_scorer("pipeline")
+class PipelineScorer:
+    """
+    /api/recommend as served: the generators and CF score term of
+    generators.py on a pipeline.Pipeline, fed the split. The user's
+    pre-cutoff courses, heaviest first, stand in for purchased/completed
+    ones. Generators run inline, so no candidate budget applies. Only the
+    top max(--k) courses get finite scores, in rank order.
+    """
+
+    def __init__(self, split, args):
+        self.split = split
+        self.top_k = max(int(k) for k in args.k.split(",") if k.strip())
+        self.cf = CFScorer(split, args)
+        self.rule = VectorScorer()
+        self.rule.build(split.rows)
+        self.similar = SimilarityIndex.build(split.rows)
+        self.positions = {cid: j for j, cid in enumerate(split.course_ids.tolist())}
+        min_cgpa = [r["min_cgpa"] if r["min_cgpa"] is not None else 0.0 for r in split.rows]
+        ids = split.course_ids.tolist()
+        # popular: decayed popularity, best first, ties by course_id (main.load_popular)
+        order = np.lexsort((split.course_ids, -split.decayed_popularity))
+        popular = [(ids[j], min_cgpa[j]) for j in order.tolist() if split.decayed_popularity[j] > 0]
+
+        def cf_top(ctx, n):
+            n = min(n, len(ids))
+            part = np.argpartition(-ctx.cf_scores, n - 1)[:n]
+            best = part[np.argsort(-ctx.cf_scores[part], kind="stable")]
+            return [(ids[j], float(ctx.cf_scores[j])) for j in best.tolist()]
+
+        def cf_scores(ctx, course_ids):
+            return {cid: float(ctx.cf_scores[self.positions[cid]]) for cid in course_ids}
+
+        self.pipeline = Pipeline(workers=1)
+        self.pipeline.tags = self.rule.tag_set
+        register_generators(
+            self.pipeline,
+            rules=lambda ctx: self.rule.recommend(ctx.cgpa, ctx.interests, ctx.n),
+            popular=lambda: popular,
+            similar_index=lambda: self.similar,
+            course=self.rule.get,
+            cf_top=cf_top,
+            cf_scores=cf_scores,
+            background=False,
+        )
+
+    def scores(self, local):
+        split = self.split
+        indptr, indices, data = split.train
+        cf_scores = self.cf.scores(local)
+        score = np.full((len(local), len(split.course_ids)), -np.inf)
+        for b, i in enumerate(local.tolist()):
+            u = split.users[i]
+            owned = indices[indptr[u]:indptr[u + 1]][np.argsort(-data[indptr[u]:indptr[u + 1]], kind="stable")]
+            # Any truthy user_id turns the personal generators on.
+            ctx = Context(float(split.cgpas[i]), split.interests[i], self.top_k, user_id=int(u) + 1)
+            ctx.owned = split.course_ids[owned].tolist()
+            ctx.cf_scores = cf_scores[b]
+            top = self.pipeline.run(ctx)
+            cols = [self.positions[c["course_id"]] for c in top]
+            score[b, cols] = np.arange(len(cols), 0, -1)
+        return score
+
+
+# ---------- Ranking / metrics ----------
+
+def top_k_rows(score, k):
+    """
+    Column indices of each row's k best scores, best first, ties broken by
+    lower column (= lower course_id) as recommend() does; -1 pads rows with
+    fewer than k finite scores.
+    """
+    k = min(k, score.shape[1])
+    part = np.argpartition(-score, k - 1, axis=1)[:, :k]
+    values = np.take_along_axis(score, part, axis=1)
+    top = np.take_along_axis(part, np.lexsort((part, -values), axis=1), axis=1)
+    # Courses tied with the k-th score may have been left out of the partition.
+    threshold = values.min(axis=1)
+    tied = np.isfinite(threshold) & ((score >= threshold[:, None]).sum(axis=1) > k)
+    for b in np.flatnonzero(tied):
+        cand = np.flatnonzero(score[b] >= threshold[b])
+        top[b] = cand[np.lexsort((cand, -score[b, cand]))[:k]]
+    top[~np.isfinite(np.take_along_axis(score, top, axis=1))] = -1
+    return top
+
+
+_STATE = {}  # set in the parent before the pool forks
+
+
+def _evaluate_chunk(task):
+    """Metric sums over one chunk of held-out users for one scorer."""
+    name, local = task
+    split, scorer, ks = _STATE["split"], _STATE["scorers"][name], _STATE["ks"]
+    score = scorer.scores(local)
+    if split.exclude_seen:
+        score[split.seen(split.users[local])] = -np.inf
+    top = top_k_rows(score, max(ks))
+    relevant, n_relevant = split.relevant(local)
+    hits = np.take_along_axis(relevant, np.maximum(top, 0), axis=1) & (top >= 0)
+    discount = 1.0 / np.log2(np.arange(2, hits.shape[1] + 2))
+    ideal = np.cumsum(discount)
+
+    sums = {}
+    for k in ks:
+        h = hits[:, :k]
+        n_hits = h.sum(axis=1)
+        dcg = (h * discount[:k]).sum(axis=1)
+        idcg = ideal[np.minimum(n_relevant, h.shape[1]) - 1]
+        recommended = np.zeros(len(split.course_ids), dtype=bool)
+        recommended[top[:, :k][top[:, :k] >= 0]] = True
+        sums[k] = {
+            "precision": float((n_hits / k).sum()),
+            "recall": float((n_hits / n_relevant).sum()),
+            "hit_rate": float((n_hits > 0).sum()),
+            "ndcg": float((dcg / idcg).sum()),
+            "recommended": recommended,
+        }
+    return len(local), sums
+
+
+def evaluate(split, scorers, ks, workers=1, log=print):
+    """{scorer: {"precision@k": ..., ..., "seconds": ...}} averaged over split.users."""
+    _STATE.update(split=split, scorers=scorers, ks=ks)
+    n_users = len(split.users)
+    chunk = max(1, min(BATCH_CELLS // max(1, len(split.course_ids)),
+                       math.ceil(n_users / max(1, workers * 4))))
+    chunks = [np.arange(start, min(start + chunk, n_users)) for start in range(0, n_users, chunk)]
+
+    pool = None
+    if workers > 1 and "fork" in multiprocessing.get_all_start_methods():
+        pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("fork"))
+    elif workers > 1:
+        log("No fork() on this platform; evaluating in one process.")
+    try:
+        results = {}
+        for name in scorers:
+            start = time.perf_counter()
+            tasks = [(name, c) for c in chunks]
+            parts = pool.map(_evaluate_chunk, tasks) if pool else map(_evaluate_chunk, tasks)
+            totals = {k: {"precision": 0.0, "recall": 0.0, "hit_rate": 0.0, "ndcg": 0.0,
+                          "recommended": np.zeros(len(split.course_ids), dtype=bool)} for k in ks}
+            for _, sums in parts:
+                for k in ks:
+                    for metric, value in sums[k].items():
+                        totals[k][metric] = totals[k][metric] | value if metric == "recommended" \
+                            else totals[k][metric] + value
+            report = {}
+            for k in ks:
+                for metric in ("precision", "recall", "ndcg", "hit_rate"):
+                    report[f"{metric}@{k}"] = round(totals[k][metric] / n_users, 6) if n_users else 0.0
+                report[f"coverage@{k}"] = round(
+                    float(totals[k]["recommended"].mean()) if len(split.course_ids) else 0.0, 6)
+            report["seconds"] = round(time.perf_counter() - start, 3)
+            results[name] = report
+            log(f"{name:<12}" + "".join(f"{report[f'{m}@{ks[0]}']:>12.4f}"
+                                        for m in ("precision", "recall", "ndcg", "coverage"))
+                + f"{report['seconds']:>10.1f}s")
+        return results
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        _STATE.clear()
+
+
+# ---------- CLI ----------
+
+def run(args, log=print):
+    started = time.perf_counter()
+    conn = sqlite3.connect(args.db)
+    try:
+        rows = load_catalog(conn)
+        positions = {r["course_id"]: j for j, r in enumerate(rows)}
+        user_ids, users, cols, days, weights = load_events(conn, positions)
+        log(f"Loaded {len(days)} events ({len(user_ids)} users, {len(rows)} courses) "
+            f"in {time.perf_counter() - started:.1f}s")
+        if len(days) == 0:
+            raise SystemExit("No interactions to evaluate.")
+        cutoff = _julianday(args.cutoff) if args.cutoff else float(np.quantile(days, 1 - args.test_fraction))
+        split = Split(rows, user_ids, users, cols, days, weights, cutoff,
+                      min_weight=args.min_weight, exclude_seen=not args.include_seen,
+                      n_interests=args.interests, cgpa=args.cgpa,
+                      max_users=args.max_users, seed=args.seed)
+        split.set_ratings(conn)
+        split.set_popularity(conn)
+    finally:
+        conn.close()
+    log(f"Cutoff {_iso(cutoff)}: {split.n_train_events} train / {split.n_test_events} test events, "
+        f"{len(split.users)} held-out users")
+
+    names = [n.strip() for n in args.scorers.split(",") if n.strip()]
+    unknown = set(names) - set(SCORERS)
+    if unknown:
+        raise SystemExit(f"Unknown scorers: {', '.join(sorted(unknown))} (have {', '.join(SCORERS)})")
+    scorers = {name: SCORERS[name](split, args) for name in names}
+
+    ks = sorted({int(k) for k in args.k.split(",") if k.strip()})
+    log(f"{'scorer':<12}" + "".join(f"{m + '@' + str(ks[0]):>12}"
+                                    for m in ("precision", "recall", "ndcg", "coverage")) + f"{'time':>11}")
+    results = evaluate(split, scorers, ks, args.workers, log)
+
+    from bench.run import git_commit
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.datetime.utcnow().isoformat(timespec="seconds") + "Z",
+            "db": args.db,
+            "cutoff": _iso(cutoff),
+            "train_events": split.n_train_events,
+            "test_events": split.n_test_events,
+            "users": len(split.users),
+            "courses": len(split.course_ids),
+            "k": ks,
+            "min_weight": args.min_weight,
+            "exclude_seen": not args.include_seen,
+            "interests": args.interests,
+            "cgpa": args.cgpa,
+            "seconds": round(time.perf_counter() - started, 3),
+        },
+        "scorers": results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--test-fraction", type=float, default=0.2,
+                        help="share of events after the cutoff when --cutoff is not given")
+    parser.add_argument("--cutoff", help="ISO timestamp splitting train from test")
+    parser.add_argument("--k", default="5,10,20")
+    parser.add_argument("--scorers", default="rule,popularity")
+    parser.add_argument("--min-weight", type=float, default=1.0,
+                        help="summed test weight that makes a course relevant (view=1, complete=4)")
+    parser.add_argument("--include-seen", action="store_true",
+                        help="keep courses the user engaged with before the cutoff")
+    parser.add_argument("--interests", type=int, default=3, help="tags taken as each user's interests")
+    parser.add_argument("--cgpa", type=float, default=10.0)
+    parser.add_argument("--max-users", type=int, help="evaluate a random sample of held-out users")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--factors", type=int, default=32, help="cf/blend/pipeline: ALS factors")
+    parser.add_argument("--iterations", type=int, default=10, help="cf/blend/pipeline: ALS iterations")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--out", default="eval-results.json")
+    args = parser.parse_args()
+
+    report = run(args)
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print("Wrote", args.out)
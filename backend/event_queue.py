@@ -0,0 +1,187 @@
+import asyncio
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from db import DB_PATH, connect
+
+log = logging.getLogger(__name__)
+
+# ---------- Config ----------
+
+BATCH_SIZE = int(os.environ.get("EVENT_BATCH_SIZE", "500"))
+FLUSH_INTERVAL = float(os.environ.get("EVENT_FLUSH_MS", "50")) / 1000
+QUEUE_SIZE = int(os.environ.get("EVENT_QUEUE_SIZE", "10000"))
+ENQUEUE_TIMEOUT = float(os.environ.get("EVENT_ENQUEUE_TIMEOUT", "1.0"))  # seconds
+# /api/review waits for its group commit unless DURABLE_REVIEWS=0; other
+# interaction events are always acknowledged as soon as they are queued.
+DURABLE_REVIEWS = os.environ.get("DURABLE_REVIEWS", "1") != "0"
+
+INSERT_INTERACTION = (
+    "INSERT INTO interactions (user_id, course_id, event_type, details, created_at) "
+    "VALUES (?,?,?,?,?)"
+)
+
+
+class QueueFull(Exception):
+    """The write queue stayed full for longer than the enqueue timeout."""
+
+
+class _Item:
+    __slots__ = ("statements", "future", "on_commit")
+
+    def __init__(self, statements, future, on_commit):
+        self.statements = statements
+        self.future = future
+        self.on_commit = on_commit
+
+
+class EventWriter:
+    """
+    Group-commit writer for interaction events (and reviews).
+
+    Requests enqueue their INSERTs and return; a background thread drains
+    the queue and writes up to `batch_size` items per transaction with one
+    executemany per statement, committing at least every `flush_interval`
+    seconds. A full queue blocks producers for up to `enqueue_timeout`
+    seconds and then raises QueueFull, so overload turns into fast 503s
+    instead of unbounded memory growth.
+    """
+
+    def __init__(self, db_path: str = DB_PATH, batch_size: int = BATCH_SIZE,
+                 flush_interval: float = FLUSH_INTERVAL, queue_size: int = QUEUE_SIZE,
+                 enqueue_timeout: float = ENQUEUE_TIMEOUT):
+        self.db_path = db_path
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.enqueue_timeout = enqueue_timeout
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def submit(self, statements, wait: bool = False, on_commit=None):
+        """
+        Enqueue [(sql, params), ...] to be written in one transaction.
+
+        Returns a Future resolved once the batch holding these rows has
+        committed; with wait=True, blocks until then (durable ack).
+        on_commit(conn) runs on the writer thread right after that commit.
+        """
+        future = Future()
+        try:
+            self._queue.put(_Item(statements, future, on_commit), timeout=self.enqueue_timeout)
+        except queue.Full:
+            raise QueueFull("interaction write queue is full")
+        if wait:
+            future.result()
+        return future
+
+    async def asubmit(self, statements, on_commit=None):
+        """
+        submit() for async handlers: returns an awaitable resolved on commit.
+        Only waits off the event loop when the queue is full.
+        """
+        future = Future()
+        item = _Item(statements, future, on_commit)
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            try:
+                await asyncio.to_thread(self._queue.put, item, timeout=self.enqueue_timeout)
+            except queue.Full:
+                raise QueueFull("interaction write queue is full")
+        return asyncio.wrap_future(future)
+
+    def log(self, user_id, course_id, event_type, details, created_at, wait: bool = False):
+        """Shortcut for one interactions row."""
+        return self.submit(
+            [(INSERT_INTERACTION, (user_id, course_id, event_type, details, created_at))],
+            wait=wait,
+        )
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    # ---------- Writer thread ----------
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="event-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Flush everything still queued, then stop the writer thread."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        conn = connect(self.db_path)
+        try:
+            while not (self._stop.is_set() and self._queue.empty()):
+                batch = self._collect()
+                if batch:
+                    self._write(conn, batch)
+        finally:
+            conn.close()
+
+    def _collect(self):
+        try:
+            first = self._queue.get(timeout=self.flush_interval)
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0 or self._stop.is_set():
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, conn, batch):
+        try:
+            self._commit(conn, batch)
+        except Exception:
+            # Isolate the bad rows (e.g. a CHECK failure) so the rest of
+            # the batch still lands.
+            for item in batch:
+                try:
+                    self._commit(conn, [item])
+                except Exception as e:
+                    # Nobody may be waiting on the future (DURABLE_REVIEWS=0)
+                    log.exception("Event writer: dropped write")
+                    item.future.set_exception(e)
+                else:
+                    self._done(conn, item)
+            return
+        for item in batch:
+            self._done(conn, item)
+
+    @staticmethod
+    def _commit(conn, batch):
+        grouped = {}
+        for item in batch:
+            for sql, params in item.statements:
+                grouped.setdefault(sql, []).append(params)
+        with conn:  # one transaction, committed on exit
+            for sql, rows in grouped.items():
+                conn.executemany(sql, rows)
+
+    @staticmethod
+    def _done(conn, item):
+        if item.on_commit is not None:
+            try:
+                item.on_commit(conn)
+            except Exception:
+                log.exception("Event writer: on_commit failed")
+        item.future.set_result(None)
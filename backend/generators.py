@@ -0,0 +1,68 @@
+"""
+The candidate generators and CF score term of /api/recommend, shared by
+main.py (served) and evaluate.py (replayed offline over a split), so the
+offline numbers grade the same rules the API runs. Callers register them
+on a pipeline.Pipeline and supply only data access:
+
+    rules(ctx)            course dicts by rule score, best first
+    popular()             (course_id, min_cgpa) by decayed popularity
+                          (course_popularity.popularity), best first
+    similar_index()       the current similar.SimilarityIndex, or None
+    course(course_id)     the course dict, or None if unknown
+    cf_top(ctx, n)        the user's n best (course_id, preference), or
+                          None when CF does not apply to ctx
+    cf_scores(ctx, ids)   {course_id: preference}, or None likewise
+"""
+import os
+
+# ---------- Config ----------
+
+CF_WEIGHT = float(os.environ.get("CF_WEIGHT", "1.0"))
+
+# Courses the user took seed the "similar" generator, newest first.
+SIMILAR_SEEDS = 5
+
+
+def register_generators(pipeline, rules, popular, similar_index, course, cf_top, cf_scores,
+                        background: bool = True):
+    """
+    Register the rules, popular, similar and cf generators and the CF
+    score term on pipeline. background=False runs similar and cf inline
+    too (no candidate budget), as the offline evaluation does.
+    """
+    def courses_by_id(course_ids):
+        return [c for c in map(course, course_ids) if c is not None]
+
+    @pipeline.generator("rules")
+    def rule_candidates(ctx):
+        """Best courses by rule score."""
+        return rules(ctx)
+
+    @pipeline.generator("popular")
+    def popular_candidates(ctx):
+        """Most popular courses the student is eligible for."""
+        eligible = (cid for cid, min_cgpa in popular() if min_cgpa <= ctx.cgpa)
+        return courses_by_id(cid for _, cid in zip(range(ctx.n), eligible))
+
+    @pipeline.generator("similar", background=background, personal=True)
+    def similar_candidates(ctx):
+        """Courses closest to the ones the user purchased or completed."""
+        index = similar_index()
+        seeds = [cid for cid in ctx.owned if index is not None and cid in index][:SIMILAR_SEEDS]
+        if not seeds:
+            return []
+        per_seed = -(-ctx.n // len(seeds))
+        return courses_by_id(cid for seed in seeds for cid, _ in index.similar(seed, per_seed))
+
+    @pipeline.generator("cf", background=background, personal=True)
+    def cf_candidates(ctx):
+        """The user's best courses under the collaborative-filtering model."""
+        return courses_by_id(cid for cid, _ in cf_top(ctx, ctx.n) or ())
+
+    @pipeline.scorer
+    def cf_score(ctx, course_ids):
+        """CF_WEIGHT * CF preference, where CF applies."""
+        preferences = cf_scores(ctx, course_ids)
+        if preferences is None:
+            return None
+        return {cid: CF_WEIGHT * v for cid, v in preferences.items()}
@@ -0,0 +1,361 @@
+"""
+Time-partitioned storage for the interactions log.
+
+`interactions` stays the hot partition that event_queue appends to. Two
+things keep it small and cheap to scan:
+
+    interaction_daily           per-day, per-course, per-event counts, rolled up
+                                incrementally (watermark in feature_state)
+    ARCHIVE_DIR/interactions-YYYY-MM[-<max id>].npz
+                                calendar months older than ARCHIVE_AFTER_DAYS,
+                                moved out of SQLite as compressed column arrays
+                                and listed in interaction_archives
+
+A month is archived only once rollup() and popularity.py have both folded
+it in, and its rows are deleted in the same transaction that records the
+file. read_interactions() yields rows from the archived months and then
+the live table, so train.py and evaluate.py still see the whole log.
+daily_counts() answers per-course/per-day questions from the rollup.
+
+    python interaction_store.py [--db PATH] [--archive-after-days 90] [--no-archive] [--vacuum]
+"""
+import argparse
+import datetime
+import os
+import time
+
+import numpy as np
+
+from db import DB_PATH, immediate_transaction
+from popularity import JOB_NAME as POPULARITY_JOB
+from popularity import open_conn
+
+# ---------- Config ----------
+
+ARCHIVE_DIR = os.environ.get(
+    "INTERACTION_ARCHIVE_DIR", os.path.join(os.path.dirname(__file__), "archive")
+)
+ARCHIVE_AFTER_DAYS = int(os.environ.get("INTERACTION_ARCHIVE_AFTER_DAYS", "90"))
+CHUNK_SIZE = 50_000
+
+ROLLUP_JOB = "interaction_daily"
+
+COLUMNS = ("interaction_id", "user_id", "course_id", "event_type", "details", "created_at")
+TEXT_COLUMNS = ("user_id", "event_type", "details", "created_at")
+
+ROLLUP_CHUNK = """
+    INSERT INTO interaction_daily (day, course_id, event_type, n)
+    SELECT substr(created_at, 1, 10), course_id, event_type, COUNT(*)
+    FROM interactions
+    WHERE interaction_id > ? AND interaction_id <= ?
+      AND course_id IS NOT NULL AND event_type IS NOT NULL AND created_at IS NOT NULL
+    GROUP BY 1, 2, 3
+    ON CONFLICT(day, course_id, event_type) DO UPDATE SET n = n + excluded.n
+"""
+
+
+def _watermark(conn, name):
+    row = conn.execute(
+        "SELECT last_interaction_id FROM feature_state WHERE name = ?", (name,)
+    ).fetchone()
+    return row[0] if row is not None else None
+
+
+# ---------- Rollups ----------
+
+def rollup(conn, chunk_size: int = CHUNK_SIZE):
+    """
+    Fold interactions newer than the watermark into interaction_daily, one
+    transaction per chunk, on an autocommit connection. Returns the number
+    of interactions read.
+    """
+    def fold_chunk():
+        last_id = _watermark(conn, ROLLUP_JOB) or 0
+        upper = conn.execute(
+            "SELECT MAX(interaction_id) FROM (SELECT interaction_id FROM interactions "
+            "WHERE interaction_id > ? ORDER BY interaction_id LIMIT ?)",
+            (last_id, chunk_size),
+        ).fetchone()[0]
+        if upper is None:
+            return 0
+        conn.execute(ROLLUP_CHUNK, (last_id, upper))
+        conn.execute(
+            "INSERT INTO feature_state (name, last_interaction_id) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET last_interaction_id = excluded.last_interaction_id",
+            (ROLLUP_JOB, upper),
+        )
+        return conn.execute(
+            "SELECT COUNT(*) FROM interactions WHERE interaction_id > ? AND interaction_id <= ?",
+            (last_id, upper),
+        ).fetchone()[0]
+
+    processed = 0
+    while True:
+        n = immediate_transaction(conn, fold_chunk)
+        processed += n
+        if n < chunk_size:
+            return processed
+
+
+def daily_counts(conn, start=None, end=None, course_id=None, event_types=None):
+    """(day, course_id, event_type, n) rows from the rollup, start <= day < end ('YYYY-MM-DD')."""
+    where, params = ["n > 0"], []
+    if start is not None:
+        where.append("day >= ?")
+        params.append(start)
+    if end is not None:
+        where.append("day < ?")
+        params.append(end)
+    if course_id is not None:
+        where.append("course_id = ?")
+        params.append(course_id)
+    if event_types:
+        where.append(f"event_type IN ({','.join('?' * len(event_types))})")
+        params.extend(event_types)
+    return conn.execute(
+        f"SELECT day, course_id, event_type, n FROM interaction_daily WHERE {' AND '.join(where)} "
+        "ORDER BY day, course_id, event_type",
+        params,
+    ).fetchall()
+
+
+# ---------- Columnar archive files ----------
+
+def _encode_text(values):
+    """Dictionary-encode strings: int32 codes (-1 = NULL) plus the vocabulary as UTF-8 bytes + offsets."""
+    vocab = {}
+    codes = np.fromiter(
+        (-1 if v is None else vocab.setdefault(v, len(vocab)) for v in values),
+        dtype=np.int32, count=len(values),
+    )
+    encoded = [v.encode() for v in vocab]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return codes, np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+def _decode_vocab(data, offsets):
+    raw = data.tobytes()
+    return [raw[offsets[i]:offsets[i + 1]].decode() for i in range(len(offsets) - 1)]
+
+
+def write_partition(path, rows):
+    """Write (interaction_id, user_id, course_id, event_type, details, created_at) rows to a .npz file."""
+    columns = list(zip(*rows)) if rows else [()] * len(COLUMNS)
+    arrays = {
+        "interaction_id": np.asarray(columns[0], dtype=np.int64),
+        # course_ids are positive; -1 stands for NULL.
+        "course_id": np.asarray([-1 if c is None else c for c in columns[2]], dtype=np.int64),
+    }
+    for name in TEXT_COLUMNS:
+        codes, data, offsets = _encode_text(columns[COLUMNS.index(name)])
+        arrays[f"{name}_codes"], arrays[f"{name}_data"], arrays[f"{name}_offsets"] = codes, data, offsets
+    tmp = path + ".tmp.npz"
+    np.savez_compressed(tmp, **arrays)
+    with open(tmp, "rb") as f:
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class Partition:
+    """One archived month, loaded column-wise; text columns stay dictionary-encoded until read."""
+
+    def __init__(self, path):
+        with np.load(path, allow_pickle=False) as npz:
+            self.arrays = {name: npz[name] for name in npz.files}
+        self._vocab = {}
+
+    def __len__(self):
+        return len(self.arrays["interaction_id"])
+
+    def vocab(self, name):
+        if name not in self._vocab:
+            self._vocab[name] = _decode_vocab(self.arrays[f"{name}_data"], self.arrays[f"{name}_offsets"])
+        return self._vocab[name]
+
+    def mask(self, start=None, end=None, event_types=None):
+        keep = np.ones(len(self), dtype=bool)
+        if start is not None or end is not None:
+            created = np.array(self.vocab("created_at") + [""])  # code -1 (NULL) -> ""
+            ok = np.ones(len(created), dtype=bool)
+            if start is not None:
+                ok &= created >= start
+            if end is not None:
+                ok &= created < end
+            ok[-1] = False
+            keep &= ok[self.arrays["created_at_codes"]]
+        if event_types is not None:
+            wanted = set(event_types)
+            ok = np.array([v in wanted for v in self.vocab("event_type")] + [False])
+            keep &= ok[self.arrays["event_type_codes"]]
+        return keep
+
+    def column(self, name, index):
+        """Python values of one column at the given row indexes."""
+        if name == "interaction_id":
+            return self.arrays[name][index].tolist()
+        if name == "course_id":
+            return [None if c < 0 else c for c in self.arrays[name][index].tolist()]
+        vocab = self.vocab(name)
+        return [None if c < 0 else vocab[c] for c in self.arrays[f"{name}_codes"][index].tolist()]
+
+    def rows(self, columns=COLUMNS):
+        index = np.arange(len(self))
+        return list(zip(*(self.column(c, index) for c in columns)))
+
+
+# ---------- Archival ----------
+
+def _month_start(month: str):
+    return f"{month}-01"
+
+
+def _next_month(month: str):
+    year, mon = int(month[:4]), int(month[5:7])
+    return f"{year + mon // 12:04d}-{mon % 12 + 1:02d}"
+
+
+def archive_partitions(conn, archive_dir: str = ARCHIVE_DIR, after_days: int = ARCHIVE_AFTER_DAYS,
+                       log=print):
+    """
+    Move every calendar month that ended more than after_days ago out of
+    `interactions` into archive_dir. Runs rollup() first. Returns the
+    number of rows archived.
+    """
+    rollup(conn)
+    # popularity.py only reads the live table: nothing it has not folded in
+    # yet (everything, if it never ran) may leave it.
+    safe_id = min(_watermark(conn, ROLLUP_JOB) or 0, _watermark(conn, POPULARITY_JOB) or 0)
+    cold = (datetime.datetime.utcnow() - datetime.timedelta(days=after_days)).strftime("%Y-%m")
+    months = [r[0] for r in conn.execute(
+        "SELECT DISTINCT substr(created_at, 1, 7) FROM interactions WHERE created_at < ? "
+        "ORDER BY 1",
+        (_month_start(cold),),
+    )]
+    os.makedirs(archive_dir, exist_ok=True)
+
+    archived = 0
+    for month in months:
+        start, end = _month_start(month), _month_start(_next_month(month))
+        newest = conn.execute(
+            "SELECT MAX(interaction_id) FROM interactions WHERE created_at >= ? AND created_at < ?",
+            (start, end),
+        ).fetchone()[0]
+        if newest > safe_id:
+            log(f"{month}: not folded into rollups/popularity yet, skipped")
+            continue
+        started = time.perf_counter()
+        rows = [tuple(r) for r in conn.execute(
+            f"SELECT {', '.join(COLUMNS)} FROM interactions "
+            "WHERE created_at >= ? AND created_at < ? AND interaction_id <= ? ORDER BY interaction_id",
+            (start, end, newest),
+        )]
+        name = f"interactions-{month}.npz"
+        manifest = conn.execute(
+            "SELECT path FROM interaction_archives WHERE partition = ?", (month,)
+        ).fetchone()
+        if manifest is not None:
+            # Late events for a month that is already archived: write the merged
+            # month to a new file, which the manifest points to only once the
+            # live rows are deleted, so no row is ever in both places.
+            rows = sorted(Partition(os.path.join(archive_dir, manifest[0])).rows() + rows)
+            name = f"interactions-{month}-{rows[-1][0]}.npz"
+        path = os.path.join(archive_dir, name)
+        write_partition(path, rows)
+
+        def commit():
+            conn.execute(
+                "INSERT INTO interaction_archives (partition, path, rows, min_id, max_id) "
+                "VALUES (?,?,?,?,?) ON CONFLICT(partition) DO UPDATE SET "
+                "path = excluded.path, rows = excluded.rows, min_id = excluded.min_id, "
+                "max_id = excluded.max_id, archived_at = CURRENT_TIMESTAMP",
+                (month, name, len(rows), rows[0][0], rows[-1][0]),
+            )
+            return conn.execute(
+                "DELETE FROM interactions WHERE created_at >= ? AND created_at < ? "
+                "AND interaction_id <= ?",
+                (start, end, newest),
+            ).rowcount
+
+        try:
+            deleted = immediate_transaction(conn, commit)
+        except BaseException:
+            if manifest is not None:
+                os.remove(path)
+            raise
+        if manifest is not None and manifest[0] != name:
+            os.remove(os.path.join(archive_dir, manifest[0]))
+        archived += deleted
+        log(f"{month}: archived {deleted} interactions to {name} "
+            f"({os.path.getsize(path) / 1e6:.1f} MB, "
+            f"{time.perf_counter() - started:.1f}s)")
+    return archived
+
+
+# ---------- Reading ----------
+
+def read_interactions(conn, start=None, end=None, event_types=None, columns=COLUMNS,
+                      chunk_size: int = CHUNK_SIZE, archive_dir: str = ARCHIVE_DIR):
+    """
+    Yield lists of row tuples (`columns`, start <= created_at < end) from
+    the archived months, oldest first, and then the live table. Rows are in
+    interaction_id order within each partition.
+    """
+    for month, path in conn.execute(
+        "SELECT partition, path FROM interaction_archives ORDER BY partition"
+    ).fetchall():
+        if end is not None and _month_start(month) >= end:
+            continue
+        if start is not None and _month_start(_next_month(month)) <= start:
+            continue
+        part = Partition(os.path.join(archive_dir, path))
+        index = np.flatnonzero(part.mask(start, end, event_types))
+        for lo in range(0, len(index), chunk_size):
+            chunk = index[lo:lo + chunk_size]
+            yield list(zip(*(part.column(c, chunk) for c in columns)))
+
+    where, params = [], []
+    if start is not None:
+        where.append("created_at >= ?")
+        params.append(start)
+    if end is not None:
+        where.append("created_at < ?")
+        params.append(end)
+    if event_types is not None:
+        event_types = list(event_types)
+        where.append(f"event_type IN ({','.join('?' * len(event_types))})")
+        params.extend(event_types)
+    cur = conn.execute(
+        f"SELECT {', '.join(columns)} FROM interactions "
+        f"{'WHERE ' + ' AND '.join(where) if where else ''} ORDER BY interaction_id",
+        params,
+    )
+    while True:
+        rows = cur.fetchmany(chunk_size)
+        if not rows:
+            return
+        yield [tuple(r) for r in rows]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--archive-dir", default=ARCHIVE_DIR)
+    parser.add_argument("--archive-after-days", type=int, default=ARCHIVE_AFTER_DAYS)
+    parser.add_argument("--no-archive", action="store_true", help="only update the daily rollup")
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM afterwards to shrink the file")
+    args = parser.parse_args()
+
+    from seed_db import init_db
+
+    init_db(args.db)
+    conn = open_conn(args.db)
+    start = time.perf_counter()
+    if args.no_archive:
+        print(f"Rolled up {rollup(conn)} interactions in {time.perf_counter() - start:.1f}s")
+    else:
+        n = archive_partitions(conn, args.archive_dir, args.archive_after_days)
+        print(f"Archived {n} interactions in {time.perf_counter() - start:.1f}s")
+    if args.vacuum:
+        conn.execute("VACUUM")
+    conn.close()
@@ -1,13 +1,283 @@
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-import sqlite3
-import os
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field
+from starlette.concurrency import run_in_threadpool
 import datetime
+import gc
+import os
+import re
+import time
+
+from cache import RECOMMEND_CACHE_DEPTH, RecommendCache, ResponseCache
+from catalog_import import CatalogWatcher
+from course_index import POPULARITY_WEIGHT, CourseIndex, normalize_tag
+from db import DB_PATH, connect, reads
+from event_queue import DURABLE_REVIEWS, INSERT_INTERACTION, EventWriter, QueueFull
+from generators import register_generators
+from metrics import METRICS_ENABLED, MetricsMiddleware, registry
+from payloads import CompressionMiddleware, FastJSONResponse, dumps, encode_cached, negotiate
+from pipeline import Context, Pipeline, candidate_depth
+from popularity import PopularityJob
+from seed_db import init_db
+
+app = FastAPI(default_response_class=FastJSONResponse)
+
+# "index" (pure Python CourseIndex), "numpy" (VectorScorer, large catalogs)
+# or "sql" (SqlRecommender, scores in SQLite over course_tags; no memory)
+RECOMMEND_ENGINE = os.environ.get("RECOMMEND_ENGINE", "index")
+
+def make_recommender():
+    if RECOMMEND_ENGINE == "sql":
+        from sql_engine import SqlRecommender
+        return SqlRecommender(reads.run_sync)
+    if RECOMMEND_ENGINE == "numpy":
+        try:
+            from vector_engine import VectorScorer
+            return VectorScorer()
+        except ImportError as e:
+            print("RECOMMEND_ENGINE=numpy unavailable, using CourseIndex:", e)
+    return CourseIndex()
+
+# Precomputed catalog for /api/recommend, refreshed as reviews come in.
+recommender = make_recommender()
+
+# Ranked lists behind /api/recommend keyed on the canonical request (see
+# cache.RecommendCache). Off for the sql engine, whose point is that every
+# worker sees other workers' writes immediately.
+recommend_cache = RecommendCache(0) if RECOMMEND_ENGINE == "sql" else RecommendCache()
+
+# Collaborative-filtering models from train.py (cf_model.ModelStore); stays
+# None when NumPy is not installed.
+model_store = None
+
+def load_cf_model():
+    global model_store
+    try:
+        from cf_model import ModelStore
+    except ImportError as e:
+        print("Collaborative filtering disabled:", e)
+        return
+    model_store = ModelStore()
+    try:
+        model_store.refresh()
+    except Exception as e:
+        print("Could not load CF model:", e)
+
+@app.middleware("http")
+async def model_version_header(request: Request, call_next):
+    response = await call_next(request)
+    if model_store is not None and model_store.version is not None:
+        response.headers["X-Model-Version"] = model_store.version
+    return response
+
+def load_recommender(read=reads.run_sync):
+    """Rebuild the recommender, cache thresholds and popular list; returns the catalog rows."""
+    rows = read(lambda conn: conn.execute(COURSES_WITH_RATINGS).fetchall())
+    recommender.build(rows)
+    recommend_cache.set_thresholds(row["min_cgpa"] for row in rows)
+    load_popular(read)
+    return rows
+
+# Past this many changed courses a full rebuild beats per-course upserts
+# (and refreshes the similarity index's IDF weights).
+CATALOG_REBUILD_THRESHOLD = 1000
+
+def refresh_courses(course_ids):
+    """
+    Apply courses changed by catalog_import.py to the recommender, similarity
+    index and caches; course_ids=None reloads the whole catalog.
+    """
+    if course_ids is None or len(course_ids) > CATALOG_REBUILD_THRESHOLD:
+        rows = load_recommender()
+        load_similar_index(rows, prebuilt=False)
+        response_cache.clear()
+    else:
+        marks = ",".join("?" * len(course_ids))
+        rows = reads.run_sync(lambda conn: conn.execute(
+            COURSES_WITH_RATINGS + f" WHERE c.course_id IN ({marks})", course_ids
+        ).fetchall())
+        found = {row["course_id"] for row in rows}
+        removed = [cid for cid in course_ids if cid not in found]
+        for row in rows:
+            recommender.upsert_course(row)
+        for cid in removed:
+            recommender.remove_course(cid)
+        recommend_cache.set_thresholds(reads.run_sync(
+            lambda conn: [r[0] for r in conn.execute("SELECT DISTINCT min_cgpa FROM courses")]
+        ))
+        update_similar_index(rows, removed)
+        response_cache.invalidate("courses", "trending", *(f"course:{cid}" for cid in course_ids))
+    print(f"Catalog refreshed: {len(course_ids) if course_ids is not None else 'all'} courses changed")
+
+RATING_STATS_SQL = "SELECT course_id, avg_rating, rating_count FROM course_rating_stats WHERE course_id IN ({})"
 
-DB_PATH = os.path.join(os.path.dirname(__file__), "db.sqlite")
+def refresh_ratings(course_ids, read=reads.run_sync):
+    """
+    Apply new rating aggregates (reviews written by any worker) to the
+    recommender and caches; courses without reviews get 0.
+    """
+    if len(course_ids) > CATALOG_REBUILD_THRESHOLD:
+        load_recommender(read)
+    else:
+        stats = read(lambda conn: {r[0]: (float(r[1]), int(r[2])) for r in conn.execute(
+            RATING_STATS_SQL.format(",".join("?" * len(course_ids))), course_ids
+        )})
+        for cid in course_ids:
+            recommender.update_rating(cid, *stats.get(cid, (0.0, 0)))
+        recommend_cache.invalidate()
+    response_cache.invalidate("courses", "trending", *(f"course:{cid}" for cid in course_ids))
+
+# Picks up bulk imports (catalog_import.py) and other workers' reviews while
+# the server is running.
+catalog_watcher = CatalogWatcher(reads.run_sync, refresh_courses, refresh_ratings)
+
+# Content index behind /api/course/{id}/similar (similar.SimilarityIndex);
+# stays None when NumPy is not installed.
+similar_index = None
+
+def load_similar_index(rows, prebuilt=True):
+    """
+    Load the prebuilt index (prebuilt=True and the file exists), or build it
+    from catalog rows (title, description, tags).
+    """
+    global similar_index
+    try:
+        from similar import SIMILAR_INDEX_PATH, SimilarityIndex
+    except ImportError as e:
+        print("Similar-courses index disabled:", e)
+        return
+    if prebuilt and os.path.exists(SIMILAR_INDEX_PATH):
+        # Prebuilt offline with `python similar.py build`.
+        similar_index = SimilarityIndex.load(SIMILAR_INDEX_PATH)
+        return
+    similar_index = SimilarityIndex.build([dict(r) for r in rows])
+
+def update_similar_index(rows, removed=()):
+    """Re-embed changed courses; the index is swapped whole, so lookups never see a half-update."""
+    global similar_index
+    index = similar_index
+    if index is None:
+        return
+    try:
+        similar_index = index.with_courses([dict(r) for r in rows], removed)
+    except ValueError:
+        # Loaded from a file saved without IDF weights: rebuild from the catalog.
+        load_similar_index(
+            reads.run_sync(lambda conn: conn.execute(COURSES_WITH_RATINGS).fetchall()), prebuilt=False
+        )
 
-app = FastAPI()
+def popularity_updated(n_events):
+    """After each popularity.py run: refresh what reads course_popularity."""
+    response_cache.invalidate("trending")
+    if not n_events:
+        return
+    if POPULARITY_WEIGHT:
+        load_recommender()
+    else:
+        load_popular()
+        recommend_cache.invalidate()
+
+# Folds new interactions into course_popularity every POPULARITY_REFRESH_SECONDS.
+popularity_job = PopularityJob(DB_PATH, on_update=popularity_updated)
+
+# Interaction events (and reviews) are group-committed off the request path.
+events = EventWriter()
+
+# ---------- Startup lifecycle ----------
+
+# PRELOAD_ON_IMPORT=1 runs preload() while main is imported (see the end of
+# this file), so a pre-forking server loads everything once in its master
+# and the workers share those pages copy-on-write:
+#
+#   PRELOAD_ON_IMPORT=1 gunicorn main:app --preload -w 4 -k uvicorn.workers.UvicornWorker
+#
+# Otherwise each worker preloads in its startup hook. Either way GET /ready
+# only passes once the worker has also warmed up.
+PRELOAD_ON_IMPORT = os.environ.get("PRELOAD_ON_IMPORT", "0") == "1"
+
+startup_seconds = {}  # phase -> seconds, reported by /ready
+preloaded = False
+ready = False
+
+def timed(phase, fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    startup_seconds[phase] = time.perf_counter() - started
+    return result
+
+def preload():
+    """
+    Everything the request path reads, from one pass over the catalog:
+    schema (and aggregates on databases seeded before them), courses with
+    their rating and popularity aggregates into the recommender, recommend
+    cache thresholds, popular list, similarity index and CF model. Runs on
+    a private connection and starts no threads, so it is safe before fork.
+    """
+    global preloaded
+    started = time.perf_counter()
+    timed("schema", init_db, DB_PATH)
+    conn = connect(DB_PATH)
+    try:
+        read = lambda fn: fn(conn)  # noqa: E731
+        catalog_watcher.mark_current(read)  # before the read, so no import is missed
+        rows = timed("catalog", load_recommender, read)
+    finally:
+        conn.close()
+    timed("similar_index", load_similar_index, rows)
+    timed("cf_model", load_cf_model)
+    startup_seconds["preload"] = time.perf_counter() - started
+    preloaded = True
+    print(f"Preloaded {len(rows)} courses in {startup_seconds['preload']:.2f}s")
+
+def warm_up():
+    """Pay for what the first requests otherwise would: reader connections, the recommend path, CF pages."""
+    reads.warm()
+    req = RecommendReq(cgpa=10.0, interests=[], top_k=10, user_id="warm-up")
+    ranked_pipeline(req, pipeline_context(req))
+    model = model_store.current if model_store is not None else None
+    if model is not None and model.user_index:
+        model.top_courses(next(iter(model.user_index)), 1)
+
+@app.on_event("startup")
+def startup():
+    global ready
+    started = time.perf_counter()
+    if not preloaded:
+        preload()
+    if model_store is not None:
+        model_store.start()
+    catalog_watcher.start()
+    popularity_job.start()
+    events.start()
+    timed("warm_up", warm_up)
+    startup_seconds["startup"] = time.perf_counter() - started
+    ready = True
+
+@app.on_event("shutdown")
+def shutdown():
+    global ready
+    ready = False  # fail readiness first so the load balancer stops routing here
+    if model_store is not None:
+        model_store.stop()
+    catalog_watcher.stop()
+    popularity_job.stop()
+    events.stop()  # flush queued events before connections go away
+    pipeline.close()
+    reads.close()
+
+@app.get("/ready", include_in_schema=False)
+def readiness():
+    """200 once this worker is preloaded and warm, 503 before that and while shutting down."""
+    if not ready:
+        raise HTTPException(status_code=503, detail="Not ready")
+    return {
+        "status": "ready",
+        "pid": os.getpid(),
+        "courses": len(recommender),
+        "model_version": model_store.version if model_store is not None else None,
+        "startup_ms": {phase: round(s * 1000, 1) for phase, s in startup_seconds.items()},
+    }
 
 # Allow frontend to talk to this API
 app.add_middleware(
@@ -16,12 +286,84 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Server-Timing"],  # lib/api.ts revalidates with If-None-Match
 )
 
-def get_conn():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+# gzip/br for everything not served from response_cache (see payloads.py).
+app.add_middleware(CompressionMiddleware)
+
+# Outermost, so latency includes CORS and the other middleware.
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+# ---------- Response cache ----------
+
+# Serialized /api/courses, /api/course/{id} and /api/trending bodies, tagged
+# "courses", "course:<id>" and "trending"; add_review invalidates the tags it
+# affects.
+response_cache = ResponseCache()
+
+def cache_key(request: Request):
+    return request.url.path + "?" + "&".join(
+        f"{k}={v}" for k, v in sorted(request.query_params.multi_items())
+    )
+
+ETAG_ENCODINGS = (None, "gzip", "br")
+
+def encoded_etag(entry, encoding):
+    return entry.etag if encoding is None else f'{entry.etag[:-1]}-{encoding}"'
+
+def not_modified(if_none_match, entry):
+    """
+    If-None-Match against any encoding's ETag of entry: a comma-separated
+    list, "*", or weak W/"..." validators (weak comparison, RFC 9110 13.1.2).
+    """
+    if not if_none_match:
+        return False
+    tags = {t.strip().removeprefix("W/") for t in if_none_match.split(",")}
+    return "*" in tags or any(encoded_etag(entry, e) in tags for e in ETAG_ENCODINGS)
+
+def cached_response(request: Request, entry):
+    """
+    200 with the cached body, or 304 if the client already has it. The body
+    goes out gzip/br-encoded when the client accepts it (compressed once per
+    entry); each encoding gets its own ETag, and any of them revalidates.
+    """
+    encoding = negotiate(request.headers.get("accept-encoding"), len(entry.body))
+    etag = encoded_etag(entry, encoding)
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if not_modified(request.headers.get("if-none-match"), entry):
+        return Response(status_code=304, headers=headers)
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    return Response(encode_cached(entry, encoding), media_type="application/json", headers=headers)
+
+# ---------- Metrics ----------
+
+def collect_runtime():
+    lookups = response_cache.hits + response_cache.misses
+    yield ("response_cache_hits_total", "counter", "Response cache hits.", response_cache.hits)
+    yield ("response_cache_misses_total", "counter", "Response cache misses.", response_cache.misses)
+    yield ("response_cache_hit_ratio", "gauge", "Response cache hits / lookups since start.",
+           response_cache.hits / lookups if lookups else 0.0)
+    yield ("response_cache_entries", "gauge", "Responses currently cached.", len(response_cache))
+    yield ("event_queue_pending", "gauge", "Writes waiting for the event writer.", events.pending())
+    lookups = recommend_cache.hits + recommend_cache.misses
+    yield ("recommend_cache_hits_total", "counter", "Recommend cache hits.", recommend_cache.hits)
+    yield ("recommend_cache_misses_total", "counter", "Recommend cache misses.", recommend_cache.misses)
+    yield ("recommend_cache_hit_ratio", "gauge", "Recommend cache hits / lookups since start.",
+           recommend_cache.hits / lookups if lookups else 0.0)
+    yield ("recommend_cache_entries", "gauge", "Ranked lists currently cached.", len(recommend_cache))
+    yield ("recommender_courses", "gauge", "Courses loaded into the recommender.", len(recommender))
+    yield ("startup_seconds", "gauge", "Time from this worker's startup hook to ready.",
+           startup_seconds.get("startup", 0.0))
+
+registry.add_collector(collect_runtime)
+
+@app.get("/metrics", include_in_schema=False)
+def metrics_endpoint():
+    """Prometheus text format; empty apart from gauges when METRICS_ENABLED=0."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
 
 # ---------- Pydantic models ----------
 
@@ -29,97 +371,529 @@ class RecommendReq(BaseModel):
     cgpa: float
     interests: list[str] = []
     top_k: int = 10
+    user_id: str | None = None  # blends in collaborative-filtering scores
+
+class BatchRecommendReq(BaseModel):
+    requests: list[RecommendReq]
 
 class ReviewReq(BaseModel):
     course_id: int
     user_id: str | None = None
     reviewer_name: str | None = None
-    rating: int
+    rating: int = Field(ge=1, le=5)  # reviews.rating CHECK; 422 instead of a failed write
     pros: str | None = None
     cons: str | None = None
     comment: str | None = None
     is_senior: int = 0
 
-# ---------- Helper to compute avg rating ----------
+# ---------- Rating aggregate ----------
+
+# Courses joined with their precomputed rating stats (see course_rating_stats
+# in schema.sql), so callers never run AVG/COUNT over reviews per course, and
+# the popularity feature maintained by popularity.py.
+COURSES_WITH_RATINGS = """
+    SELECT c.*,
+           COALESCE(s.avg_rating, 0)       AS avg_rating,
+           COALESCE(s.rating_count, 0)     AS rating_count,
+           COALESCE(p.popularity_score, 0) AS popularity_score
+    FROM courses c
+    LEFT JOIN course_rating_stats s ON s.course_id = c.course_id
+    LEFT JOIN course_popularity p ON p.course_id = c.course_id
+"""
+
+# Fields /api/courses can return, and the SQL for each.
+COURSE_LIST_FIELDS = {
+    "course_id": "c.course_id",
+    "title": "c.title",
+    "provider": "c.provider",
+    "description": "c.description",
+    "tags": "c.tags",
+    "min_cgpa": "c.min_cgpa",
+    "difficulty": "c.difficulty",
+    "duration_weeks": "c.duration_weeks",
+    "avg_rating": "CAST(COALESCE(s.avg_rating, 0) AS REAL)",
+    "rating_count": "COALESCE(s.rating_count, 0)",
+}
+MAX_PAGE_SIZE = 500
+
+# Reviews per page on the course detail page / its /reviews endpoint.
+REVIEW_PAGE_SIZE = 20
+MAX_REVIEW_PAGE_SIZE = 100
+
+# Newest first; the cursor is the last review_id of the previous page, and
+# (created_at, review_id) keeps the order total when timestamps collide.
+# Both forms walk idx_reviews_course_created backwards from the cursor.
+REVIEW_PAGE = """
+    SELECT review_id, reviewer_name, rating, pros, cons, comment, is_senior, created_at
+    FROM reviews
+    WHERE course_id = ? {after}
+    ORDER BY created_at DESC, review_id DESC
+    LIMIT ?
+"""
+REVIEWS_AFTER = (
+    "AND (created_at, review_id) < "
+    "(SELECT created_at, review_id FROM reviews WHERE review_id = ? AND course_id = ?)"
+)
 
-def get_avg_rating(course_id: int):
-    conn = get_conn()
-    row = conn.execute(
-        "SELECT AVG(rating) AS avg_rating, COUNT(*) AS cnt FROM reviews WHERE course_id=?",
+# Courses carrying one tag, via the tags(name) and course_tags(tag_id) indexes.
+TAGGED_COURSE_IDS = """c.course_id IN (
+    SELECT ct.course_id FROM course_tags ct
+    JOIN tags t ON t.tag_id = ct.tag_id
+    WHERE t.name = ?
+)"""
+
+# ---------- Full-text search ----------
+
+# bm25() column weights for courses_fts (title, description, tags, provider)
+SEARCH_WEIGHTS = (10.0, 1.0, 5.0, 2.0)
+MAX_SEARCH_RESULTS = 100
+
+def fts_query(q: str):
+    """
+    Turn free text into an FTS5 MATCH expression: every word must match,
+    and the last one as a prefix so results appear while typing.
+    Returns None if q has no searchable words.
+    """
+    words = re.findall(r"\w+", q.lower())
+    if not words:
+        return None
+    terms = [f'"{w}"' for w in words[:-1]] + [f'"{words[-1]}"*']
+    return " ".join(terms)
+
+# ---------- Course reviews ----------
+
+def review_summary(conn, course_id: int):
+    """Rating histogram and senior / non-senior averages from course_review_counts."""
+    histogram = {str(r): 0 for r in range(1, 6)}
+    groups = {0: [0, 0], 1: [0, 0]}  # is_senior -> [rating sum, count]
+    for rating, is_senior, n in conn.execute(
+        "SELECT rating, is_senior, n FROM course_review_counts WHERE course_id = ? AND n > 0",
         (course_id,),
-    ).fetchone()
-    conn.close()
-    avg = row["avg_rating"] if row["avg_rating"] is not None else 0.0
-    cnt = row["cnt"] if row["cnt"] is not None else 0
-    return float(avg), int(cnt)
+    ):
+        histogram[str(rating)] = histogram.get(str(rating), 0) + n
+        groups[1 if is_senior else 0][0] += rating * n
+        groups[1 if is_senior else 0][1] += n
+
+    def average(total, count):
+        return {"avg_rating": total / count if count else 0.0, "rating_count": count}
+
+    total = groups[0][0] + groups[1][0]
+    count = groups[0][1] + groups[1][1]
+    return {
+        **average(total, count),
+        "histogram": histogram,
+        "senior": average(*groups[1]),
+        "non_senior": average(*groups[0]),
+    }
+
+def query_reviews(conn, course_id: int, cursor, limit: int):
+    """One page of reviews plus the cursor for the next (None on the last page)."""
+    if cursor is None:
+        sql, params = REVIEW_PAGE.format(after=""), (course_id, limit)
+    else:
+        sql, params = REVIEW_PAGE.format(after=REVIEWS_AFTER), (course_id, cursor, course_id, limit)
+    reviews = [dict(r) for r in conn.execute(sql, params).fetchall()]
+    next_cursor = reviews[-1]["review_id"] if len(reviews) == limit else None
+    return {"reviews": reviews, "next_cursor": next_cursor}
+
+# ---------- Recommendation cache ----------
+
+def ranked_courses(cgpa: float, interests, top_k: int):
+    """recommender.recommend() through recommend_cache; returns copies."""
+    key = recommend_cache.key(cgpa, interests)
+    ranked = recommend_cache.get(key, top_k)
+    if ranked is None:
+        generation = recommend_cache.generation
+        depth = max(top_k, RECOMMEND_CACHE_DEPTH)
+        ranked = recommender.recommend(cgpa, interests, depth)
+        recommend_cache.put(key, ranked, depth, generation)
+        ranked = ranked[:top_k]
+    return [dict(c) for c in ranked]
+
+def ranked_many(requests):
+    """ranked_courses() for (cgpa, interests, top_k) tuples, in order; misses share one recommend_many pass."""
+    results, misses = [], []
+    for i, (cgpa, interests, top_k) in enumerate(requests):
+        key = recommend_cache.key(cgpa, interests)
+        ranked = recommend_cache.get(key, top_k)
+        results.append(ranked)
+        if ranked is None:
+            misses.append((i, key, (cgpa, interests, max(top_k, RECOMMEND_CACHE_DEPTH))))
+    generation = recommend_cache.generation
+    computed = recommender.recommend_many([query for _, _, query in misses])
+    pending = iter(zip(misses, computed))
+    for i, ranked in enumerate(results):
+        if ranked is None:
+            (_, key, (_, _, depth)), ranked = next(pending)
+            recommend_cache.put(key, ranked, depth, generation)
+        yield [dict(c) for c in ranked[: requests[i][2]]]
+
+# ---------- Recommendation pipeline ----------
+
+# Two-stage recommend (pipeline.py): the generators (generators.py) propose
+# candidates; the re-rank adds CF scores, diversifies and drops courses
+# the user already purchased or completed.
+pipeline = Pipeline()
+
+USER_HISTORY = """
+    SELECT course_id FROM user_courses WHERE user_id = ?
+    ORDER BY MAX(COALESCE(purchased_at, ''), COALESCE(completed_at, '')) DESC, course_id
+"""
+
+def user_history(conn, user_id):
+    return [r[0] for r in conn.execute(USER_HISTORY, (user_id,))]
+
+pipeline.history = lambda user_id: reads.submit(user_history, user_id)
+pipeline.history_async = lambda user_id: reads.run(user_history, user_id)
+pipeline.tags = recommender.tag_set  # tag sets the recommender already parsed
+
+# (course_id, min_cgpa) of the most popular courses, best first, for the
+# "popular" generator; reloaded with the recommender and after
+# popularity.py runs.
+POPULAR_DEPTH = 1000
+popular_courses = []
+
+def load_popular(read=reads.run_sync):
+    global popular_courses
+    popular_courses = read(lambda conn: [tuple(r) for r in conn.execute(
+        "SELECT p.course_id, COALESCE(c.min_cgpa, 0) FROM course_popularity p "
+        "JOIN courses c ON c.course_id = p.course_id WHERE p.popularity > 0 "
+        "ORDER BY p.popularity DESC, p.course_id LIMIT ?",
+        (POPULAR_DEPTH,),
+    )])
+
+def rule_candidates(ctx):
+    """Best courses by rule score: the CGPA/tag inverted index, through recommend_cache."""
+    if ctx.ranked is not None and not ctx.owned:
+        return ctx.ranked  # scored for the whole batch by recommend_batch
+    return ranked_courses(ctx.cgpa, ctx.interests, ctx.n)
+
+def cf_top(ctx, n):
+    return ctx.model.top_courses(ctx.user_id, n) if ctx.model is not None else None
+
+def cf_scores(ctx, course_ids):
+    return ctx.model.score_courses(ctx.user_id, course_ids) if ctx.model is not None else None
+
+register_generators(
+    pipeline,
+    rules=rule_candidates,
+    popular=lambda: popular_courses,
+    similar_index=lambda: similar_index,
+    course=recommender.get,
+    cf_top=cf_top,
+    cf_scores=cf_scores,
+)
+
+def pipeline_context(req: RecommendReq, ranked=None):
+    ctx = Context(req.cgpa, req.interests, req.top_k, req.user_id)
+    model = model_store.current if model_store is not None else None
+    ctx.model = model if req.user_id and model is not None and model.has_user(req.user_id) else None
+    ctx.ranked = ranked
+    return ctx
+
+async def run_pipeline(req: RecommendReq, ranked=None):
+    """
+    (courses, report) for one request: the history lookup is awaited on
+    the reader lane, the scoring runs on the threadpool so the event loop
+    stays free.
+    """
+    ctx = pipeline_context(req, ranked)
+    if req.top_k <= 0:
+        return [], ctx.report()
+    await pipeline.load_history_async(ctx)
+    return await run_in_threadpool(ranked_pipeline, req, ctx)
+
+def ranked_pipeline(req: RecommendReq, ctx):
+    """
+    The blocking part of run_pipeline (warm_up calls it directly; ctx.owned
+    is looked up here if the caller did not). Finished runs are kept in
+    recommend_cache keyed on what they depend on: the rule-cache key plus
+    the CF model version, top_k and the user's purchased/completed
+    courses. Runs where a stage missed its budget are not cached.
+    """
+    owned = pipeline.load_history(ctx)
+
+    key = recommend_cache.key(
+        req.cgpa, req.interests, "pipeline", req.top_k, tuple(owned),
+        (req.user_id, ctx.model.version) if ctx.model is not None else None,
+    )
+    cached = recommend_cache.get(key, req.top_k)
+    if cached is not None:
+        ctx.cached = True
+        return [dict(c) for c in cached], ctx.report()
+    generation = recommend_cache.generation
+    top = pipeline.run(ctx)
+    if not ctx.timed_out:
+        recommend_cache.put(key, top, req.top_k, generation)
+    return [dict(c) for c in top], ctx.report()
 
 # ---------- Endpoints ----------
 
 @app.get("/api/courses")
-def list_courses():
+async def list_courses(
+    request: Request,
+    cursor: int | None = None,
+    limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    fields: str | None = None,
+    provider: str | None = None,
+    difficulty: str | None = None,
+    source: str | None = None,
+    tag: str | None = None,
+    max_min_cgpa: float | None = None,
+    elective: bool | None = None,
+):
     """
-    Return all courses with their average ratings.
+    Return courses with their average ratings, newest course_id first.
+
+    - limit/cursor: keyset pagination; pass the returned next_cursor to get
+      the following page. Without limit every matching course is returned.
+    - fields: comma-separated projection, e.g. fields=title,provider,tags
+      (course_id is always included).
+    - provider/difficulty/source/tag/max_min_cgpa/elective: filters.
+    Responses are cached and carry an ETag (If-None-Match -> 304).
     """
-    conn = get_conn()
-    cur = conn.cursor()
+    key = cache_key(request)
+    entry = response_cache.get(key)
+    if entry is None:
+        generation = response_cache.generation
+        result = await reads.run(query_courses, cursor, limit, fields, provider, difficulty,
+                                 source, tag, max_min_cgpa, elective)
+        entry = response_cache.put(key, dumps(result), ("courses",), generation)
+    return cached_response(request, entry)
+
+def query_courses(conn, cursor, limit, fields, provider, difficulty, source,
+                  tag, max_min_cgpa, elective):
+    if fields:
+        wanted = [f.strip() for f in fields.split(",") if f.strip()]
+        unknown = [f for f in wanted if f not in COURSE_LIST_FIELDS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+        names = ["course_id"] + [f for f in wanted if f != "course_id"]
+    else:
+        names = list(COURSE_LIST_FIELDS)
+
+    where, params = [], []
+    if cursor is not None:
+        where.append("c.course_id < ?")
+        params.append(cursor)
+    for column, value in (("provider", provider), ("difficulty", difficulty), ("source", source)):
+        if value is not None:
+            where.append(f"c.{column} = ?")
+            params.append(value)
+    if tag is not None:
+        where.append(TAGGED_COURSE_IDS)
+        params.append(normalize_tag(tag))
+    if max_min_cgpa is not None:
+        # NULL min_cgpa means no requirement (treated as 0 by recommend)
+        where.append("(c.min_cgpa <= ? OR c.min_cgpa IS NULL)")
+        params.append(max_min_cgpa)
+    if elective is not None:
+        where.append(("" if elective else "NOT ") +
+                     "EXISTS (SELECT 1 FROM electives e WHERE e.course_id = c.course_id)")
+
+    sql = (
+        "SELECT " + ", ".join(f"{COURSE_LIST_FIELDS[n]} AS {n}" for n in names) +
+        " FROM courses c LEFT JOIN course_rating_stats s ON s.course_id = c.course_id" +
+        (" WHERE " + " AND ".join(where) if where else "") +
+        " ORDER BY c.course_id DESC"
+    )
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(limit + 1)  # one extra row tells us whether there is a next page
+
     try:
-        # Use course_id instead of created_at to avoid column issues
-        rows = cur.execute("SELECT * FROM courses ORDER BY course_id DESC").fetchall()
+        rows = conn.execute(sql, params).fetchall()
     except Exception as e:
-        conn.close()
         print("Error in /api/courses:", e)
         raise HTTPException(status_code=500, detail=str(e))
-    conn.close()
-
-    result = []
-    for r in rows:
-        avg, cnt = get_avg_rating(r["course_id"])
-        result.append({
-            "course_id": r["course_id"],
-            "title": r["title"],
-            "provider": r["provider"],
-            "description": r["description"],
-            "tags": r["tags"],
-            "min_cgpa": r["min_cgpa"],
-            "difficulty": r["difficulty"],
-            "duration_weeks": r["duration_weeks"],
-            "avg_rating": avg,
-            "rating_count": cnt,
-        })
-    return {"courses": result}
+
+    next_cursor = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = rows[-1]["course_id"]
+    return {"courses": [dict(r) for r in rows], "next_cursor": next_cursor}
+
+@app.get("/api/search")
+async def search_courses(
+    q: str,
+    cgpa: float | None = None,
+    tag: str | None = None,
+    limit: int = Query(20, ge=1, le=MAX_SEARCH_RESULTS),
+):
+    """
+    Ranked full-text search over title, description, tags and provider.
+    With cgpa, only courses the student is eligible for (min_cgpa <= cgpa)
+    are returned, as in /api/recommend; with tag, only courses carrying
+    that tag. Matches are wrapped in <mark>.
+    """
+    match = fts_query(q)
+    if match is None:
+        return {"results": []}
+
+    sql = f"""
+        SELECT c.course_id, c.title, c.provider, c.tags, c.min_cgpa,
+               c.difficulty, c.duration_weeks,
+               CAST(COALESCE(s.avg_rating, 0) AS REAL) AS avg_rating,
+               COALESCE(s.rating_count, 0)             AS rating_count,
+               highlight(courses_fts, 0, '<mark>', '</mark>')          AS title_highlight,
+               snippet(courses_fts, 1, '<mark>', '</mark>', '…', 16)   AS snippet,
+               bm25(courses_fts, {", ".join(map(str, SEARCH_WEIGHTS))}) AS score
+        FROM courses_fts
+        JOIN courses c ON c.course_id = courses_fts.rowid
+        LEFT JOIN course_rating_stats s ON s.course_id = c.course_id
+        WHERE courses_fts MATCH ?
+    """
+    params = [match]
+    if cgpa is not None:
+        sql += " AND (c.min_cgpa <= ? OR c.min_cgpa IS NULL)"
+        params.append(cgpa)
+    if tag is not None:
+        sql += " AND " + TAGGED_COURSE_IDS
+        params.append(normalize_tag(tag))
+    sql += " ORDER BY score LIMIT ?"
+    params.append(limit)
+
+    try:
+        rows = await reads.run(lambda conn: conn.execute(sql, params).fetchall())
+    except Exception as e:
+        print("Error in /api/search:", e)
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"results": [dict(r) for r in rows]}
+
+@app.get("/api/trending")
+async def trending_courses(
+    request: Request,
+    cgpa: float | None = None,
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+):
+    """
+    Courses with the most recent views, purchases and completions (decayed
+    with TRENDING_HALF_LIFE_DAYS), precomputed by popularity.py. With cgpa,
+    only courses the student is eligible for.
+    """
+    key = cache_key(request)
+    entry = response_cache.get(key)
+    if entry is None:
+        generation = response_cache.generation
+        result = await reads.run(query_trending, cgpa, limit)
+        entry = response_cache.put(key, dumps(result), ("trending",), generation)
+    return cached_response(request, entry)
+
+def query_trending(conn, cgpa, limit):
+    sql = """
+        SELECT c.course_id, c.title, c.provider, c.tags, c.min_cgpa,
+               c.difficulty, c.duration_weeks,
+               CAST(COALESCE(s.avg_rating, 0) AS REAL) AS avg_rating,
+               COALESCE(s.rating_count, 0)             AS rating_count,
+               p.views, p.purchases, p.completions, p.completion_rate,
+               p.trending, p.popularity
+        FROM course_popularity p
+        JOIN courses c ON c.course_id = p.course_id
+        LEFT JOIN course_rating_stats s ON s.course_id = c.course_id
+        WHERE p.trending > 0
+    """
+    params = []
+    if cgpa is not None:
+        sql += " AND (c.min_cgpa <= ? OR c.min_cgpa IS NULL)"
+        params.append(cgpa)
+    sql += " ORDER BY p.trending DESC, c.course_id LIMIT ?"
+    params.append(limit)
+    return {"results": [dict(r) for r in conn.execute(sql, params).fetchall()]}
 
 @app.get("/api/course/{course_id}")
-def get_course(course_id: int):
-    conn = get_conn()
+async def get_course(course_id: int, request: Request):
+    key = cache_key(request)
+    entry = response_cache.get(key)
+    if entry is None:
+        generation = response_cache.generation
+        result = await reads.run(query_course, course_id)
+        entry = response_cache.put(key, dumps(result), (f"course:{course_id}",), generation)
+    return cached_response(request, entry)
+
+def query_course(conn, course_id: int):
     row = conn.execute("SELECT * FROM courses WHERE course_id=?", (course_id,)).fetchone()
     if not row:
-        conn.close()
         raise HTTPException(status_code=404, detail="Course not found")
-    reviews = conn.execute(
-        "SELECT reviewer_name, rating, pros, cons, comment, is_senior, created_at "
-        "FROM reviews WHERE course_id=? ORDER BY created_at DESC",
-        (course_id,),
-    ).fetchall()
-    conn.close()
+    summary = review_summary(conn, course_id)
+    page = query_reviews(conn, course_id, None, REVIEW_PAGE_SIZE)
 
-    avg, cnt = get_avg_rating(course_id)
     return {
         "course": dict(row),
-        "avg_rating": avg,
-        "rating_count": cnt,
-        "reviews": [dict(r) for r in reviews],
+        "avg_rating": summary["avg_rating"],
+        "rating_count": summary["rating_count"],
+        "review_summary": summary,
+        "reviews": page["reviews"],
+        "next_cursor": page["next_cursor"],
     }
 
+@app.get("/api/course/{course_id}/reviews")
+async def get_course_reviews(
+    course_id: int,
+    request: Request,
+    cursor: int | None = None,
+    limit: int = Query(REVIEW_PAGE_SIZE, ge=1, le=MAX_REVIEW_PAGE_SIZE),
+):
+    """
+    A course's reviews, newest first. Pass the next_cursor from
+    /api/course/{id} (or the previous page) to get the following page.
+    """
+    key = cache_key(request)
+    entry = response_cache.get(key)
+    if entry is None:
+        generation = response_cache.generation
+        result = await reads.run(query_course_reviews, course_id, cursor, limit)
+        entry = response_cache.put(key, dumps(result), (f"course:{course_id}",), generation)
+    return cached_response(request, entry)
+
+def query_course_reviews(conn, course_id: int, cursor, limit: int):
+    if conn.execute("SELECT 1 FROM courses WHERE course_id=?", (course_id,)).fetchone() is None:
+        raise HTTPException(status_code=404, detail="Course not found")
+    return query_reviews(conn, course_id, cursor, limit)
+
+MAX_SIMILAR = 50
+
+@app.get("/api/course/{course_id}/similar")
+def similar_courses(course_id: int, k: int = Query(10, ge=1, le=MAX_SIMILAR)):
+    """Courses closest in title/description/tags to the given one."""
+    index = similar_index
+    if index is None:
+        raise HTTPException(status_code=503, detail="Similarity index unavailable")
+    if course_id not in index:
+        raise HTTPException(status_code=404, detail="Course not found")
+
+    results = []
+    for cid, score in index.similar(course_id, k):
+        course = recommender.get(cid)
+        if course is not None:
+            course["similarity"] = score
+            results.append(course)
+    return {"course_id": course_id, "similar": results}
+
+INSERT_REVIEW = """
+    INSERT INTO reviews
+    (course_id, user_id, reviewer_name, rating, pros, cons, comment, is_senior, created_at)
+    VALUES (?,?,?,?,?,?,?,?,?)
+"""
+LOG_RATING_CHANGE = "INSERT INTO catalog_changes (course_id, kind) VALUES (?, 'rating')"
+
+async def queue_writes(statements, on_commit=None):
+    """Hand INSERTs to the writer lane; 503 if its queue is saturated."""
+    try:
+        return await events.asubmit(statements, on_commit=on_commit)
+    except QueueFull:
+        raise HTTPException(status_code=503, detail="Server busy, try again")
+
+async def log_event(user_id, course_id, event_type, details):
+    """Queue one interactions row without waiting for the commit."""
+    await queue_writes([(INSERT_INTERACTION, (
+        user_id, course_id, event_type, details, datetime.datetime.utcnow(),
+    ))])
+
 @app.post("/api/review")
-def add_review(req: ReviewReq):
-    conn = get_conn()
-    conn.execute(
-        """
-        INSERT INTO reviews
-        (course_id, user_id, reviewer_name, rating, pros, cons, comment, is_senior, created_at)
-        VALUES (?,?,?,?,?,?,?,?,?)
-        """,
-        (
+async def add_review(req: ReviewReq):
+    now = datetime.datetime.utcnow()
+    statements = [
+        (INSERT_REVIEW, (
             req.course_id,
             req.user_id,
             req.reviewer_name,
@@ -128,83 +902,81 @@ def add_review(req: ReviewReq):
             req.cons,
             req.comment,
             req.is_senior,
-            datetime.datetime.utcnow(),
-        ),
-    )
-    conn.execute(
-        "INSERT INTO interactions (user_id, course_id, event_type, details, created_at) "
-        "VALUES (?,?,?,?,?)",
-        (req.user_id or "anon", req.course_id, "rating", f"rating={req.rating}", datetime.datetime.utcnow()),
-    )
-    conn.commit()
-    conn.close()
+            now,
+        )),
+        (INSERT_INTERACTION,
+         (req.user_id or "anon", req.course_id, "rating", f"rating={req.rating}", now)),
+        # Other workers' CatalogWatchers apply the new rating from this row.
+        (LOG_RATING_CHANGE, (req.course_id,)),
+    ]
+
+    def refresh_rating(conn):
+        # This worker applies it right away, so its next response has it.
+        refresh_ratings([req.course_id], read=lambda fn: fn(conn))
+
+    committed = await queue_writes(statements, on_commit=refresh_rating)
+    if DURABLE_REVIEWS:
+        await committed
     return {"status": "ok"}
 
 @app.post("/api/complete")
-def mark_complete(payload: dict):
+async def mark_complete(payload: dict):
     user_id = payload.get("user_id", "anon")
     course_id = int(payload.get("course_id"))
-    conn = get_conn()
-    conn.execute(
-        "INSERT INTO interactions (user_id, course_id, event_type, details, created_at) "
-        "VALUES (?,?,?,?,?)",
-        (user_id, course_id, "complete", "user completed course", datetime.datetime.utcnow()),
-    )
-    conn.commit()
-    conn.close()
+    await log_event(user_id, course_id, "complete", "user completed course")
     return {"status": "ok"}
 
 @app.post("/api/recommend")
-def recommend(req: RecommendReq):
+async def recommend(req: RecommendReq):
     """
-    Simple rule-based recommender for now:
-    - Filter by CGPA (min_cgpa <= student cgpa)
-    - Score by overlap between interests and course tags
-    - Add a small boost from avg rating
+    Two-stage recommender (see pipeline.py):
+    - Candidates: courses matching the student's interests by tag, popular
+      courses, and for a known user_id courses similar to the ones they
+      took and their collaborative-filtering picks (see train.py)
+    - Filter by CGPA (min_cgpa <= student cgpa), drop courses the user
+      already purchased or completed
+    - Score by overlap between interests and course tags, plus a small
+      boost from avg rating (and POPULARITY_WEIGHT * popularity score,
+      CF_WEIGHT * CF score)
+    - Pick the top_k spread across providers and difficulty levels
+    "pipeline" in the response has the candidate count and per-stage timings.
     """
-    conn = get_conn()
-    rows = conn.execute("SELECT * FROM courses").fetchall()
-    conn.close()
+    results, report = await run_pipeline(req)
+    return FastJSONResponse({"results": results, "pipeline": report})
 
-    interests = [i.strip().lower() for i in (req.interests or []) if i.strip()]
-    interests_set = set(interests)
-
-    scored = []
-    for r in rows:
-        # CGPA filter
-        min_cg = r["min_cgpa"] if r["min_cgpa"] is not None else 0.0
-        if min_cg > req.cgpa:
-            continue
-
-        # Tag overlap
-        tags = r["tags"] or ""
-        tag_set = set(t.strip().lower() for t in tags.split(",") if t.strip())
-        overlap = len(interests_set & tag_set)
-        score = overlap
-
-        avg_rating, _ = get_avg_rating(r["course_id"])
-        score += (avg_rating - 3.0) * 0.3  # small rating boost
-
-        scored.append((score, r))
+@app.post("/api/recommend/batch")
+async def recommend_batch(batch: BatchRecommendReq, stream: bool = False):
+    """
+    Recommendations for many students in one call (advisor dashboards,
+    nightly jobs). Results come back in request order, with each request's
+    pipeline report alongside. With ?stream=true the response is NDJSON,
+    one {"index", "results", "pipeline"} line per request, written as soon
+    as each chunk is scored.
+    """
+    requests = [(r.cgpa, r.interests, candidate_depth(r.top_k)) for r in batch.requests]
+    # the shared rule pass is CPU-bound: keep it off the event loop
+    rule_ranked = await run_in_threadpool(lambda: list(ranked_many(requests)))
 
-    scored.sort(key=lambda x: x[0], reverse=True)
-    top = [dict(r) for (s, r) in scored[: req.top_k]]
+    if stream:
+        async def lines():
+            for i, (req, ranked) in enumerate(zip(batch.requests, rule_ranked)):
+                top, report = await run_pipeline(req, ranked)
+                yield dumps({"index": i, "results": top, "pipeline": report}) + b"\n"
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
 
-    return {"results": top}
+    results, reports = [], []
+    for req, ranked in zip(batch.requests, rule_ranked):
+        top, report = await run_pipeline(req, ranked)
+        results.append(top)
+        reports.append(report)
+    return FastJSONResponse({"results": results, "pipeline": reports})
 
 @app.post("/api/pay")
-def pay(payload: dict):
+async def pay(payload: dict):
     """Dummy payment: just log and return redirect URL."""
     course_id = payload.get("course_id")
     user_id = payload.get("user_id", "anon")
-    conn = get_conn()
-    conn.execute(
-        "INSERT INTO interactions (user_id, course_id, event_type, details, created_at) "
-        "VALUES (?,?,?,?,?)",
-        (user_id, course_id, "purchase", "fake payment", datetime.datetime.utcnow()),
-    )
-    conn.commit()
-    conn.close()
+    await log_event(user_id, course_id, "purchase", "fake payment")
     return {"redirect": f"/payment_page?course_id={course_id}"}
 
 @app.get("/payment_page")
@@ -227,12 +999,12 @@ def payment_page(course_id: int | None = None):
 async def payment_submit(request: Request):
     form = await request.form()
     course_id = int(form.get("course_id") or -1)
-    conn = get_conn()
-    conn.execute(
-        "INSERT INTO interactions (user_id, course_id, event_type, details, created_at) "
-        "VALUES (?,?,?,?,?)",
-        ("anon", course_id, "purchase", "fake payment submit", datetime.datetime.utcnow()),
-    )
-    conn.commit()
-    conn.close()
+    await log_event("anon", course_id, "purchase", "fake payment submit")
     return "<html><body><h3>Fake payment successful. You can close this tab.</h3></body></html>"
+
+# Last, so everything preload() calls is defined. gc.freeze() keeps the
+# collector from touching (and so copying) the preloaded objects in forked
+# workers.
+if PRELOAD_ON_IMPORT:
+    preload()
+    gc.freeze()
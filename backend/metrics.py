@@ -0,0 +1,235 @@
+import bisect
+import contextvars
+import os
+import threading
+import time
+
+# ---------- Config ----------
+
+# METRICS_ENABLED=0 removes the middleware and every per-query hook.
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") != "0"
+# Adds a Server-Timing header (db time, reader-lane wait, total) to responses.
+SERVER_TIMING = os.environ.get("SERVER_TIMING", "0") == "1"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100)
+CANDIDATE_BUCKETS = (0, 10, 50, 100, 500, 1000, 5000, 10000, 50000, 100000)
+STAGE_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+
+HELP = {
+    "http_requests_total": "HTTP requests by route and status.",
+    "http_request_duration_seconds": "Time from request start to the end of the response body.",
+    "db_queries_per_request": "SQL statements executed per request.",
+    "db_query_seconds_total": "Time spent running read queries, by route.",
+    "db_wait_seconds_total": "Time requests waited for a free reader connection, by route.",
+    "db_connections_opened_total": "SQLite connections opened.",
+    "recommend_candidates": "Courses scored per recommendation query.",
+    "recommend_stage_seconds": "Time spent in each stage of the recommend pipeline.",
+    "recommend_stage_timeouts_total": "Recommend pipeline stages cut off by their latency budget.",
+}
+
+
+# ---------- Per-request stats ----------
+
+class RequestStats:
+    """Counters for the request being served; shared with worker threads via contextvars."""
+    __slots__ = ("queries", "db_seconds", "wait_seconds", "started")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.wait_seconds = 0.0
+        self.started = time.perf_counter()
+
+    def server_timing(self):
+        total = (time.perf_counter() - self.started) * 1000
+        return (
+            f'db;dur={self.db_seconds * 1000:.2f};desc="{self.queries} queries", '
+            f"dbwait;dur={self.wait_seconds * 1000:.2f}, total;dur={total:.2f}"
+        )
+
+
+_current = contextvars.ContextVar("request_stats", default=None)
+
+
+def current():
+    """RequestStats of the request being served, or None outside a request."""
+    return _current.get()
+
+
+def count_query():
+    """One SQL statement executed for the current request (db.CountingConnection)."""
+    stats = _current.get()
+    if stats is not None:
+        stats.queries += 1
+
+
+# ---------- Registry ----------
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class Registry:
+    """
+    Minimal Prometheus registry: labelled counters and histograms updated
+    under one lock, plus collectors called at scrape time for values that
+    already live elsewhere (cache hit counters, queue depth).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._collectors = []
+
+    def inc(self, name, labels=(), value=1.0):
+        key = (name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def observe(self, name, value, buckets, labels=()):
+        key = (name, labels)
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = Histogram(buckets)
+            hist.observe(value)
+
+    def add_collector(self, fn):
+        """fn() -> iterable of (name, type, help, value) sampled on every scrape."""
+        self._collectors.append(fn)
+
+    def render(self):
+        """Everything in Prometheus text exposition format."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(
+                ((key, list(h.buckets), list(h.counts), h.sum) for key, h in self._histograms.items()),
+                key=lambda item: item[0],
+            )
+
+        lines = []
+        last = None
+        for (name, labels), value in counters:
+            if name != last:
+                lines += _header(name, "counter")
+                last = name
+            lines.append(f"{name}{_labels(labels)} {_number(value)}")
+        for (name, labels), buckets, counts, total in histograms:
+            if name != last:
+                lines += _header(name, "histogram")
+                last = name
+            cumulative = 0
+            for bound, count in zip(list(buckets) + ["+Inf"], counts):
+                cumulative += count
+                le = bound if bound == "+Inf" else _number(bound)
+                lines.append(f"{name}_bucket{_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {_number(total)}")
+            lines.append(f"{name}_count{_labels(labels)} {cumulative}")
+        for collect in self._collectors:
+            try:
+                samples = list(collect())
+            except Exception as e:
+                print("Metrics collector failed:", e)
+                continue
+            for name, kind, help_text, value in samples:
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}",
+                          f"{name} {_number(value)}"]
+        return "\n".join(lines) + "\n"
+
+
+def _header(name, kind):
+    return [f"# HELP {name} {HELP.get(name, name)}", f"# TYPE {name} {kind}"]
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"') for _, v in labels)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + "}"
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+registry = Registry()
+
+
+# ---------- Hooks ----------
+
+def connection_opened():
+    if METRICS_ENABLED:
+        registry.inc("db_connections_opened_total")
+
+
+def observe_candidates(n):
+    """Called by the recommenders with the number of courses scored for one query."""
+    if METRICS_ENABLED:
+        registry.observe("recommend_candidates", n, CANDIDATE_BUCKETS)
+
+
+def observe_stage(stage, seconds, timed_out=False):
+    """Called by pipeline.Pipeline for every candidate generator and the re-rank."""
+    if METRICS_ENABLED:
+        labels = (("stage", stage),)
+        registry.observe("recommend_stage_seconds", seconds, STAGE_BUCKETS, labels)
+        if timed_out:
+            registry.inc("recommend_stage_timeouts_total", labels)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording per-route latency, status and SQL activity.
+
+    Routes are labelled by their template (/api/course/{course_id}) so the
+    number of series stays bounded. Installed only when METRICS_ENABLED.
+    """
+
+    def __init__(self, app, server_timing: bool = SERVER_TIMING):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", stats.server_timing().encode()))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            elapsed = time.perf_counter() - stats.started
+            route = scope.get("route")
+            labels = (("method", scope["method"]),
+                      ("route", route.path if route is not None else "unmatched"))
+            registry.inc("http_requests_total", labels + (("status", str(status)),))
+            registry.observe("http_request_duration_seconds", elapsed, LATENCY_BUCKETS, labels)
+            registry.observe("db_queries_per_request", stats.queries, QUERY_COUNT_BUCKETS, labels)
+            if stats.db_seconds:
+                registry.inc("db_query_seconds_total", labels, stats.db_seconds)
+                registry.inc("db_wait_seconds_total", labels, stats.wait_seconds)
@@ -0,0 +1,200 @@
+"""
+Response serialization and compression.
+
+dumps() serializes with orjson when it is installed (several times faster
+than the json module on course lists) and falls back to json with the same
+compact output Starlette produces. CompressionMiddleware gzip- or
+brotli-encodes compressible responses at least COMPRESS_MIN_BYTES long,
+negotiated from Accept-Encoding; brotli needs the optional `brotli`
+package. Cached bodies are compressed once per encoding (encode_cached).
+"""
+import gzip
+import json
+import os
+import zlib
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# ---------- Config ----------
+
+# COMPRESS_MIN_BYTES=0 compresses everything; COMPRESSION=0 turns it off.
+COMPRESSION = os.environ.get("COMPRESSION", "1") != "0"
+COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.environ.get("GZIP_LEVEL", "6"))
+# Per-response brotli quality; cached bodies are compressed once, harder.
+BROTLI_QUALITY = int(os.environ.get("BROTLI_QUALITY", "4"))
+BROTLI_CACHED_QUALITY = int(os.environ.get("BROTLI_CACHED_QUALITY", "9"))
+# JSON_ENCODER=json forces the stdlib encoder (for before/after benchmarks).
+USE_ORJSON = orjson is not None and os.environ.get("JSON_ENCODER", "orjson") != "json"
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+
+# ---------- Serialization ----------
+
+def dumps(obj) -> bytes:
+    """Compact UTF-8 JSON bytes."""
+    if USE_ORJSON:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSONResponse rendered with dumps(). Endpoints that return one directly
+    also skip FastAPI's jsonable_encoder pass over the result.
+    """
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+# ---------- Compression ----------
+
+def negotiate(accept_encoding: str | None, size: int) -> str | None:
+    """"br", "gzip" or None for a body of `size` bytes and an Accept-Encoding header."""
+    if not COMPRESSION or not accept_encoding or size < COMPRESS_MIN_BYTES:
+        return None
+    accepted = set()
+    for part in accept_encoding.split(","):
+        name, *params = part.split(";")
+        q = 1.0
+        for param in params:
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if q > 0:
+            accepted.add(name.strip().lower())
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: str, cached: bool = False) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_CACHED_QUALITY if cached else BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def encode_cached(entry, encoding: str | None) -> bytes:
+    """entry.body in `encoding`, compressed on first use and kept on the cache entry."""
+    if encoding is None:
+        return entry.body
+    body = entry.variants.get(encoding)
+    if body is None:
+        body = entry.variants[encoding] = compress(entry.body, encoding, cached=True)
+    return body
+
+
+class _StreamCompressor:
+    """Incremental encoder; flush() after every chunk so NDJSON lines still stream."""
+
+    def __init__(self, encoding):
+        if encoding == "br":
+            self._br = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._br = None
+            self._gz = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # 31: gzip container
+
+    def chunk(self, data: bytes, last: bool) -> bytes:
+        if self._br is not None:
+            out = self._br.process(data)
+            return out + (self._br.finish() if last else self._br.flush())
+        out = self._gz.compress(data)
+        return out + self._gz.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+
+def _header(headers, name: bytes):
+    for key, value in headers:
+        if key.lower() == name:
+            return value.decode("latin-1")
+    return None
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing JSON/NDJSON/text responses for clients that
+    accept gzip or br. Bodies under COMPRESS_MIN_BYTES go out as they are;
+    longer streamed bodies are compressed chunk by chunk. Responses that
+    already carry a Content-Encoding (cached bodies) pass through.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept = _header(scope["headers"], b"accept-encoding")
+        if negotiate(accept, COMPRESS_MIN_BYTES) is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        pending = b""  # body held back until it is known to reach COMPRESS_MIN_BYTES
+        stream = None  # _StreamCompressor once the body is being encoded
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, pending, stream, passthrough
+            if message["type"] == "http.response.start":
+                start = message
+                headers = start.get("headers", [])
+                content_type = _header(headers, b"content-type") or ""
+                passthrough = (
+                    _header(headers, b"content-encoding") is not None
+                    or not content_type.startswith(COMPRESSIBLE_TYPES)
+                )
+                if passthrough:
+                    await send(start)
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            more = message.get("more_body", False)
+            if stream is not None:
+                await send({"type": "http.response.body",
+                            "body": stream.chunk(message.get("body", b""), not more), "more_body": more})
+                return
+            # Bodies often arrive in several messages (BaseHTTPMiddleware,
+            # StreamingResponse): buffer up to the threshold before deciding.
+            pending += message.get("body", b"")
+            if more and len(pending) < COMPRESS_MIN_BYTES:
+                return
+            body, pending = pending, b""
+            encoding = negotiate(accept, len(body))
+            if encoding is None:
+                passthrough = True
+                await send(start)
+                await send({"type": "http.response.body", "body": body, "more_body": more})
+                return
+            headers = [(k, v) for k, v in start.get("headers", []) if k.lower() != b"content-length"]
+            headers += [(b"content-encoding", encoding.encode()), (b"vary", b"Accept-Encoding")]
+            if not more:
+                body = compress(body, encoding)
+                headers.append((b"content-length", str(len(body)).encode()))
+                await send({**start, "headers": headers})
+                await send({"type": "http.response.body", "body": body})
+                return
+            stream = _StreamCompressor(encoding)
+            await send({**start, "headers": headers})
+            await send({"type": "http.response.body", "body": stream.chunk(body, False), "more_body": True})
+
+        await self.app(scope, receive, send_compressed)
@@ -0,0 +1,292 @@
+"""
+Two-stage recommendation pipeline behind /api/recommend.
+
+Stage 1, candidates: registered generators each propose up to ctx.n
+courses cheaply (generators.py: the CGPA/tag inverted index, popular
+courses, courses similar to ones the user took, the user's CF favourites). The
+lists are merged round-robin, CGPA-filtered, stripped of courses the user
+already purchased or completed, and capped at MAX_CANDIDATES.
+
+Stage 2, re-rank: candidates are scored like rule_score (tag overlap +
+rating boost, + popularity if enabled; tag sets come pre-parsed from the
+`tags` hook) plus any registered score terms, and the top_k is picked
+greedily, docking DIVERSITY_WEIGHT for every already-picked course with
+the same provider and again for every one with the same difficulty.
+DIVERSITY_WEIGHT=0 keeps plain score order.
+
+Budgets: the history lookup and background generators must finish within
+CANDIDATE_BUDGET_MS of the request start or they are dropped; inline
+generators are the fallback and always run. A re-rank past
+RERANK_BUDGET_MS fills the remaining slots by score without the
+diversity pass. Every stage's time lands in ctx.timings.
+"""
+import asyncio
+import contextvars
+import heapq
+import os
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from course_index import course_boost, interest_set, parse_tags
+from metrics import observe_stage
+
+# ---------- Config ----------
+
+CANDIDATE_BUDGET_MS = float(os.environ.get("CANDIDATE_BUDGET_MS", "50"))
+RERANK_BUDGET_MS = float(os.environ.get("RERANK_BUDGET_MS", "20"))
+MAX_CANDIDATES = int(os.environ.get("MAX_CANDIDATES", "500"))
+DIVERSITY_WEIGHT = float(os.environ.get("DIVERSITY_WEIGHT", "0.1"))
+PIPELINE_WORKERS = int(os.environ.get("PIPELINE_WORKERS", "4"))
+
+# Each generator proposes max(top_k * CANDIDATE_MULTIPLIER, MIN_CANDIDATES)
+# courses, plus one per course the user already owns (those get dropped).
+CANDIDATE_MULTIPLIER = 5
+MIN_CANDIDATES = 50
+
+
+def candidate_depth(top_k: int) -> int:
+    return max(top_k * CANDIDATE_MULTIPLIER, MIN_CANDIDATES)
+
+
+class Context:
+    """
+    One recommend request as generators and score terms see it. Callers
+    may hang their own attributes on it (main.py adds the CF model and
+    precomputed rule candidates).
+    """
+
+    def __init__(self, cgpa: float, interests, top_k: int, user_id=None):
+        self.cgpa = cgpa
+        self.interests = interests or []
+        self.interests_set = interest_set(self.interests)
+        self.top_k = top_k
+        self.user_id = user_id
+        self.owned = None  # course ids the user purchased or completed, newest first
+        self.started = time.perf_counter()
+        self.deadline = self.started + CANDIDATE_BUDGET_MS / 1000
+        self.timings = {}  # stage -> seconds
+        self.timed_out = []
+        self.candidates = 0
+        self.cached = False
+
+    @property
+    def n(self):
+        """How many courses each generator proposes."""
+        return candidate_depth(self.top_k) + min(len(self.owned or ()), MAX_CANDIDATES)
+
+    def report(self):
+        """Per-stage timings (ms) and candidate count for the response."""
+        timings = {stage: round(s * 1000, 3) for stage, s in self.timings.items()}
+        timings["total"] = round((time.perf_counter() - self.started) * 1000, 3)
+        return {"candidates": self.candidates, "cached": self.cached,
+                "timings_ms": timings, "timed_out": self.timed_out}
+
+
+def _interleave(lists):
+    iters = [iter(items) for items in lists]
+    while iters:
+        for it in list(iters):
+            try:
+                yield next(it)
+            except StopIteration:
+                iters.remove(it)
+
+
+def _group(value):
+    return value.strip().lower() if isinstance(value, str) and value.strip() else None
+
+
+class Pipeline:
+    """
+    Candidate generators and score terms are registered with decorators:
+
+        @pipeline.generator("popular")
+        def popular(ctx): ...          # -> iterable of course dicts
+
+        @pipeline.scorer
+        def cf(ctx, course_ids): ...   # -> {course_id: added score} or None
+
+    `history` is fn(user_id) -> Future of the user's owned course ids and
+    `history_async` the same as an awaitable, for load_history_async();
+    `tags` is fn(course_id) -> the course's parsed tag frozenset (None if
+    unknown), so re-ranking does not re-parse courses.tags per request.
+    """
+
+    def __init__(self, workers: int = PIPELINE_WORKERS):
+        self.generators = []  # (name, fn, background, personal)
+        self.scorers = []
+        self.history = None
+        self.history_async = None
+        self.tags = None
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="recommend")
+
+    def generator(self, name: str, background: bool = False, personal: bool = False):
+        """
+        Register fn(ctx) as a candidate generator. background=True runs it
+        on the worker pool under the candidate budget; personal=True skips
+        it for requests without a user_id.
+        """
+        def register(fn):
+            self.generators.append((name, fn, background, personal))
+            return fn
+        return register
+
+    def scorer(self, fn):
+        self.scorers.append(fn)
+        return fn
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    # ---------- Stages ----------
+
+    def _record(self, ctx, stage, seconds, timed_out=False):
+        ctx.timings[stage] = seconds
+        if timed_out:
+            ctx.timed_out.append(stage)
+        observe_stage(stage, seconds, timed_out)
+
+    def _wait(self, ctx, stage, future, started):
+        """future.result() until ctx.deadline; None if it is late (recorded as a timeout) or fails."""
+        try:
+            return future.result(timeout=max(ctx.deadline - time.perf_counter(), 0))
+        except TimeoutError:
+            future.cancel()
+            self._record(ctx, stage, time.perf_counter() - started, timed_out=True)
+        except Exception as e:
+            print(f"Recommend stage {stage} failed:", e)
+            self._record(ctx, stage, time.perf_counter() - started)
+        return None
+
+    def load_history(self, ctx):
+        """Fill ctx.owned (empty for anonymous users or a late lookup) and return it."""
+        if ctx.owned is None:
+            ctx.owned = []
+            if ctx.user_id and self.history is not None:
+                started = time.perf_counter()
+                owned = self._wait(ctx, "history", self.history(ctx.user_id), started)
+                if owned is not None:
+                    ctx.owned = owned
+                    self._record(ctx, "history", time.perf_counter() - started)
+        return ctx.owned
+
+    async def load_history_async(self, ctx):
+        """load_history() for callers on the event loop: awaits history_async rather than blocking a thread."""
+        if ctx.owned is None:
+            ctx.owned = []
+            if ctx.user_id and self.history_async is not None:
+                started = time.perf_counter()
+                try:
+                    owned = await asyncio.wait_for(
+                        self.history_async(ctx.user_id), max(ctx.deadline - started, 0)
+                    )
+                except asyncio.TimeoutError:
+                    self._record(ctx, "history", time.perf_counter() - started, timed_out=True)
+                except Exception as e:
+                    print("Recommend stage history failed:", e)
+                    self._record(ctx, "history", time.perf_counter() - started)
+                else:
+                    ctx.owned = owned
+                    self._record(ctx, "history", time.perf_counter() - started)
+        return ctx.owned
+
+    def _submit(self, fn, ctx):
+        """Future of (proposals, seconds spent in fn) from the worker pool."""
+        def call():
+            started = time.perf_counter()
+            return list(fn(ctx)), time.perf_counter() - started
+
+        context = contextvars.copy_context()  # keeps the request's metrics.RequestStats
+        return self._executor.submit(context.run, call)
+
+    def candidates(self, ctx):
+        """Stage 1: {course_id: course dict}, at most max(MAX_CANDIDATES, top_k)."""
+        self.load_history(ctx)
+        active = [g for g in self.generators if ctx.user_id or not g[3]]
+        started = time.perf_counter()
+        pending = {name: self._submit(fn, ctx) for name, fn, background, _ in active if background}
+        proposals = {}
+        for name, fn, background, _ in active:
+            if not background:
+                t = time.perf_counter()
+                proposals[name] = list(fn(ctx))
+                self._record(ctx, name, time.perf_counter() - t)
+        for name, future in pending.items():
+            done = self._wait(ctx, name, future, started)
+            proposals[name] = done[0] if done is not None else []
+            if done is not None:
+                self._record(ctx, name, done[1])
+
+        owned = set(ctx.owned)
+        limit = max(MAX_CANDIDATES, ctx.top_k)
+        merged = {}
+        for course in _interleave(proposals[name] for name, *_ in active):
+            cid = course["course_id"]
+            if cid in merged or cid in owned:
+                continue
+            if (course.get("min_cgpa") or 0.0) > ctx.cgpa:
+                continue
+            merged[cid] = course
+            if len(merged) >= limit:
+                break
+        ctx.candidates = len(merged)
+        return merged
+
+    def _tag_set(self, cid, course):
+        tags = self.tags(cid) if self.tags is not None else None
+        return tags if tags is not None else parse_tags(course.get("tags"))
+
+    def rerank(self, ctx, candidates):
+        """Stage 2: the top_k candidates, best first."""
+        started = time.perf_counter()
+        deadline = started + RERANK_BUDGET_MS / 1000
+        score = {cid: len(ctx.interests_set & self._tag_set(cid, c)) + course_boost(c)
+                 for cid, c in candidates.items()}
+        for term in self.scorers:
+            for cid, extra in (term(ctx, list(score)) or {}).items():
+                if cid in score:
+                    score[cid] += extra
+
+        timed_out = False
+        if DIVERSITY_WEIGHT:
+            groups = {cid: (_group(c.get("provider")), _group(c.get("difficulty")))
+                      for cid, c in candidates.items()}
+            providers, difficulties = Counter(), Counter()
+            # Penalties only grow, so a popped entry whose counts are still
+            # current beats everything left; stale ones are re-pushed.
+            heap = [(-s, cid, 0, 0) for cid, s in score.items()]
+            heapq.heapify(heap)
+            picked = []
+            while heap and len(picked) < ctx.top_k:
+                if time.perf_counter() > deadline:
+                    timed_out = True
+                    rest = ((-score[cid], cid) for _, cid, _, _ in heap)
+                    picked += [cid for _, cid in heapq.nsmallest(ctx.top_k - len(picked), rest)]
+                    break
+                _, cid, seen_p, seen_d = heapq.heappop(heap)
+                provider, difficulty = groups[cid]
+                same_p = providers[provider] if provider else 0
+                same_d = difficulties[difficulty] if difficulty else 0
+                if (same_p, same_d) != (seen_p, seen_d):
+                    adjusted = score[cid] - DIVERSITY_WEIGHT * (same_p + same_d)
+                    heapq.heappush(heap, (-adjusted, cid, same_p, same_d))
+                    continue
+                picked.append(cid)
+                if provider:
+                    providers[provider] += 1
+                if difficulty:
+                    difficulties[difficulty] += 1
+        else:
+            picked = [cid for _, cid in heapq.nsmallest(ctx.top_k, ((-s, cid) for cid, s in score.items()))]
+
+        self._record(ctx, "rerank", time.perf_counter() - started, timed_out)
+        return [candidates[cid] for cid in picked]
+
+    def run(self, ctx):
+        """Both stages; ranked course dicts for ctx, best first."""
+        if ctx.top_k <= 0:
+            return []
+        candidates = self.candidates(ctx)
+        ctx.timings["candidates"] = time.perf_counter() - ctx.started
+        return self.rerank(ctx, candidates)
@@ -0,0 +1,219 @@
+"""
+Incremental popularity / trending features from the interactions log.
+
+Each run folds only the interactions newer than the stored watermark
+(feature_state.last_interaction_id) into course_popularity:
+
+    views, purchases, completions   all-time counts
+    completion_rate                 completions / max(purchases, completions)
+    popularity, trending            event-weighted counts with exponential
+                                    time decay (long / short half-life)
+    popularity_score                log-scaled popularity in 0..1, the term
+                                    recommend adds with POPULARITY_WEIGHT
+
+Decayed scores are kept "as of" feature_state.decayed_to: a run first
+multiplies every row by the decay since then, then adds new events
+weighted by their own age. Every step is a BEGIN IMMEDIATE transaction
+that re-reads the watermark, so overlapping runs (several API workers, a
+cron job) never count an event twice.
+
+The API server runs this every POPULARITY_REFRESH_SECONDS; it can also be
+scheduled externally:
+
+    python popularity.py [--db PATH] [--every SECONDS]
+"""
+import argparse
+import math
+import os
+import threading
+import time
+
+from catalog_import import prune_changes
+from db import DB_PATH, connect, immediate_transaction
+
+# ---------- Config ----------
+
+POPULARITY_HALF_LIFE_DAYS = float(os.environ.get("POPULARITY_HALF_LIFE_DAYS", "30"))
+TRENDING_HALF_LIFE_DAYS = float(os.environ.get("TRENDING_HALF_LIFE_DAYS", "3"))
+POPULARITY_REFRESH_SECONDS = float(os.environ.get("POPULARITY_REFRESH_SECONDS", "300"))
+CHUNK_SIZE = 50_000
+
+JOB_NAME = "popularity"
+
+# event_type -> (weight, count column)
+EVENTS = {
+    "view": (1.0, 0),
+    "purchase": (3.0, 1),
+    "complete": (4.0, 2),
+}
+
+UPSERT_POPULARITY = """
+    INSERT INTO course_popularity
+        (course_id, views, purchases, completions, completion_rate, popularity, trending)
+    VALUES (?,?,?,?,?,?,?)
+    ON CONFLICT(course_id) DO UPDATE SET
+        views           = views + excluded.views,
+        purchases       = purchases + excluded.purchases,
+        completions     = completions + excluded.completions,
+        completion_rate = CAST(completions + excluded.completions AS REAL)
+                          / NULLIF(MAX(purchases + excluded.purchases,
+                                       completions + excluded.completions), 0),
+        popularity      = popularity + excluded.popularity,
+        trending        = trending + excluded.trending
+"""
+
+
+def _decay(days, half_life):
+    return 0.5 ** (max(days, 0.0) / half_life)
+
+
+def _state(conn):
+    row = conn.execute(
+        "SELECT last_interaction_id, decayed_to FROM feature_state WHERE name = ?", (JOB_NAME,)
+    ).fetchone()
+    return (row[0], row[1]) if row is not None else (0, None)
+
+
+def refresh_features(conn, chunk_size: int = CHUNK_SIZE):
+    """
+    One incremental run on an autocommit connection (isolation_level=None).
+    Returns the number of interactions folded in.
+    """
+    def decay_to_now():
+        now = conn.execute("SELECT julianday('now')").fetchone()[0]
+        last_id, decayed_to = _state(conn)
+        if decayed_to is not None and now > decayed_to:
+            conn.execute(
+                "UPDATE course_popularity SET popularity = popularity * ?, trending = trending * ?",
+                (_decay(now - decayed_to, POPULARITY_HALF_LIFE_DAYS),
+                 _decay(now - decayed_to, TRENDING_HALF_LIFE_DAYS)),
+            )
+        conn.execute(
+            "INSERT INTO feature_state (name, last_interaction_id, decayed_to) VALUES (?,?,?) "
+            "ON CONFLICT(name) DO UPDATE SET decayed_to = excluded.decayed_to",
+            (JOB_NAME, last_id, now),
+        )
+
+    def fold_chunk():
+        last_id, now = _state(conn)
+        rows = conn.execute(
+            "SELECT interaction_id, course_id, event_type, julianday(created_at) "
+            "FROM interactions WHERE interaction_id > ? ORDER BY interaction_id LIMIT ?",
+            (last_id, chunk_size),
+        ).fetchall()
+        if not rows:
+            return 0
+
+        totals = {}  # course_id -> [views, purchases, completions, popularity, trending]
+        for _, course_id, event_type, created in rows:
+            event = EVENTS.get(event_type)
+            if event is None or course_id is None:
+                continue
+            weight, column = event
+            age = now - created if created is not None else 0.0
+            t = totals.setdefault(course_id, [0, 0, 0, 0.0, 0.0])
+            t[column] += 1
+            t[3] += weight * _decay(age, POPULARITY_HALF_LIFE_DAYS)
+            t[4] += weight * _decay(age, TRENDING_HALF_LIFE_DAYS)
+
+        conn.executemany(UPSERT_POPULARITY, [
+            (cid, v, p, c, c / max(p, c) if max(p, c) else None, pop, trend)
+            for cid, (v, p, c, pop, trend) in totals.items()
+        ])
+        conn.execute(
+            "UPDATE feature_state SET last_interaction_id = ? WHERE name = ?",
+            (rows[-1][0], JOB_NAME),
+        )
+        return len(rows)
+
+    def rescale():
+        # log1p keeps a few blockbuster courses from flattening everyone else.
+        top = conn.execute("SELECT MAX(popularity) FROM course_popularity").fetchone()[0] or 0.0
+        scale = math.log1p(top) or 1.0
+        conn.executemany(
+            "UPDATE course_popularity SET popularity_score = ? WHERE course_id = ?",
+            [(math.log1p(p) / scale, cid)
+             for cid, p in conn.execute("SELECT course_id, popularity FROM course_popularity")],
+        )
+
+    immediate_transaction(conn, decay_to_now)
+    processed = 0
+    while True:
+        n = immediate_transaction(conn, fold_chunk)
+        processed += n
+        if n < chunk_size:
+            break
+    immediate_transaction(conn, rescale)
+    return processed
+
+
+def open_conn(db_path: str = DB_PATH):
+    conn = connect(db_path)
+    conn.isolation_level = None  # transactions are managed explicitly
+    return conn
+
+
+class PopularityJob:
+    """
+    Runs refresh_features() on a background thread every `interval` seconds
+    (first run right away) and calls on_update(n_events) after each run.
+    Each run also prunes catalog_changes, which reviews keep appending to
+    between imports.
+    """
+
+    def __init__(self, db_path: str = DB_PATH, interval: float = POPULARITY_REFRESH_SECONDS,
+                 on_update=None):
+        self.db_path = db_path
+        self.interval = interval
+        self.on_update = on_update
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        conn = open_conn(self.db_path)
+        try:
+            while not self._stop.is_set():
+                try:
+                    n = refresh_features(conn)
+                    prune_changes(conn)
+                    if self.on_update is not None:
+                        self.on_update(n)
+                except Exception as e:
+                    print("Popularity refresh failed:", e)
+                self._stop.wait(self.interval)
+        finally:
+            conn.close()
+
+    def start(self):
+        if self._thread is None and self.interval > 0:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="popularity", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--every", type=float, default=0, help="repeat every N seconds")
+    args = parser.parse_args()
+
+    from seed_db import init_db
+
+    init_db(args.db)
+    conn = open_conn(args.db)
+    while True:
+        start = time.perf_counter()
+        n = refresh_features(conn)
+        elapsed = time.perf_counter() - start
+        print(f"Folded {n} interactions in {elapsed:.2f}s"
+              + (f" ({n / elapsed:,.0f}/s)" if n and elapsed else ""))
+        if args.every <= 0:
+            break
+        time.sleep(args.every)
+    conn.close()
@@ -44,4 +44,288 @@ CREATE TABLE IF NOT EXISTS interactions (
   FOREIGN KEY(course_id) REFERENCES courses(course_id)
 );
 
+-- Filters on /api/courses; each index also carries the rowid (course_id),
+-- so keyset pagination by course_id stays an index range scan.
+CREATE INDEX IF NOT EXISTS idx_courses_provider   ON courses(provider);
+CREATE INDEX IF NOT EXISTS idx_courses_difficulty ON courses(difficulty);
+CREATE INDEX IF NOT EXISTS idx_courses_source     ON courses(source);
+CREATE INDEX IF NOT EXISTS idx_courses_min_cgpa   ON courses(min_cgpa);
+CREATE INDEX IF NOT EXISTS idx_electives_course   ON electives(course_id);
+
+-- Full-text search over courses (/api/search), external-content FTS5
+-- table kept in sync with courses by triggers.
+CREATE VIRTUAL TABLE IF NOT EXISTS courses_fts USING fts5(
+  title, description, tags, provider,
+  content='courses', content_rowid='course_id',
+  tokenize='unicode61 remove_diacritics 2',
+  prefix='2 3'
+);
+
+CREATE TRIGGER IF NOT EXISTS courses_fts_insert AFTER INSERT ON courses
+BEGIN
+  INSERT INTO courses_fts (rowid, title, description, tags, provider)
+  VALUES (NEW.course_id, NEW.title, NEW.description, NEW.tags, NEW.provider);
+END;
+
+CREATE TRIGGER IF NOT EXISTS courses_fts_delete AFTER DELETE ON courses
+BEGIN
+  INSERT INTO courses_fts (courses_fts, rowid, title, description, tags, provider)
+  VALUES ('delete', OLD.course_id, OLD.title, OLD.description, OLD.tags, OLD.provider);
+END;
+
+CREATE TRIGGER IF NOT EXISTS courses_fts_update AFTER UPDATE ON courses
+BEGIN
+  INSERT INTO courses_fts (courses_fts, rowid, title, description, tags, provider)
+  VALUES ('delete', OLD.course_id, OLD.title, OLD.description, OLD.tags, OLD.provider);
+  INSERT INTO courses_fts (rowid, title, description, tags, provider)
+  VALUES (NEW.course_id, NEW.title, NEW.description, NEW.tags, NEW.provider);
+END;
+
+-- Per-course rating aggregate, kept current by the triggers below so the
+-- API can read avg_rating/rating_count with a single JOIN.
+CREATE TABLE IF NOT EXISTS course_rating_stats (
+  course_id     INTEGER PRIMARY KEY,
+  rating_sum    INTEGER NOT NULL DEFAULT 0,
+  rating_count  INTEGER NOT NULL DEFAULT 0,
+  avg_rating    REAL NOT NULL DEFAULT 0,
+  FOREIGN KEY(course_id) REFERENCES courses(course_id)
+);
+
+CREATE TRIGGER IF NOT EXISTS reviews_stats_insert
+AFTER INSERT ON reviews WHEN NEW.rating IS NOT NULL
+BEGIN
+  INSERT INTO course_rating_stats (course_id, rating_sum, rating_count, avg_rating)
+  VALUES (NEW.course_id, NEW.rating, 1, NEW.rating)
+  ON CONFLICT(course_id) DO UPDATE SET
+    rating_sum   = rating_sum + NEW.rating,
+    rating_count = rating_count + 1,
+    avg_rating   = CAST(rating_sum + NEW.rating AS REAL) / (rating_count + 1);
+END;
+
+CREATE TRIGGER IF NOT EXISTS reviews_stats_delete
+AFTER DELETE ON reviews WHEN OLD.rating IS NOT NULL
+BEGIN
+  UPDATE course_rating_stats SET
+    rating_sum   = rating_sum - OLD.rating,
+    rating_count = rating_count - 1,
+    avg_rating   = CASE WHEN rating_count > 1
+                        THEN CAST(rating_sum - OLD.rating AS REAL) / (rating_count - 1)
+                        ELSE 0 END
+  WHERE course_id = OLD.course_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS reviews_stats_update
+AFTER UPDATE OF course_id, rating ON reviews
+BEGIN
+  UPDATE course_rating_stats SET
+    rating_sum   = rating_sum - OLD.rating,
+    rating_count = rating_count - 1,
+    avg_rating   = CASE WHEN rating_count > 1
+                        THEN CAST(rating_sum - OLD.rating AS REAL) / (rating_count - 1)
+                        ELSE 0 END
+  WHERE course_id = OLD.course_id AND OLD.rating IS NOT NULL;
+  INSERT INTO course_rating_stats (course_id, rating_sum, rating_count, avg_rating)
+  SELECT NEW.course_id, NEW.rating, 1, NEW.rating WHERE NEW.rating IS NOT NULL
+  ON CONFLICT(course_id) DO UPDATE SET
+    rating_sum   = rating_sum + NEW.rating,
+    rating_count = rating_count + 1,
+    avg_rating   = CAST(rating_sum + NEW.rating AS REAL) / (rating_count + 1);
+END;
+
 COMMIT;
+
+-- Normalized tags and bulk catalog import (catalog_import.py): courses are
+-- upserted on (provider, title), tags live in tags/course_tags for indexed
+-- lookups, and every imported course_id is logged so running servers
+-- refresh their indexes.
+CREATE UNIQUE INDEX IF NOT EXISTS idx_courses_provider_title ON courses(provider, title);
+
+CREATE TABLE IF NOT EXISTS tags (
+  tag_id INTEGER PRIMARY KEY AUTOINCREMENT,
+  name   TEXT NOT NULL UNIQUE   -- lower-cased, as matched by recommend
+);
+
+CREATE TABLE IF NOT EXISTS course_tags (
+  course_id INTEGER NOT NULL,
+  tag_id    INTEGER NOT NULL,
+  PRIMARY KEY (course_id, tag_id),
+  FOREIGN KEY(course_id) REFERENCES courses(course_id),
+  FOREIGN KEY(tag_id) REFERENCES tags(tag_id)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_course_tags_tag ON course_tags(tag_id, course_id);
+
+-- course_tags mirrors courses.tags (the string the API still returns) on
+-- every write: the string is split on commas (as a JSON array through
+-- json_each), each tag folded by normalize_tag() and linked. normalize_tag
+-- is course_index.normalize_tag (trim + Unicode lower-case), registered on
+-- each connection by db.register_functions; connections without it cannot
+-- write courses. seed_db.sync_course_tags() derives rows for courses
+-- written before these triggers existed.
+CREATE TRIGGER IF NOT EXISTS course_tags_course_insert AFTER INSERT ON courses
+BEGIN
+  INSERT INTO tags (name)
+  SELECT name FROM (
+    SELECT DISTINCT normalize_tag(value) AS name FROM json_each(
+      '[' || replace(json_quote(NEW.tags), ',', '","') || ']')
+    WHERE normalize_tag(value) != '') AS t
+  WHERE NOT EXISTS (SELECT 1 FROM tags WHERE tags.name = t.name);
+  INSERT INTO course_tags (course_id, tag_id)
+  SELECT NEW.course_id, tag_id FROM tags WHERE name IN (
+    SELECT DISTINCT normalize_tag(value) AS name FROM json_each(
+      '[' || replace(json_quote(NEW.tags), ',', '","') || ']')
+    WHERE normalize_tag(value) != '')
+    AND NOT EXISTS (SELECT 1 FROM course_tags ct
+                    WHERE ct.course_id = NEW.course_id AND ct.tag_id = tags.tag_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS course_tags_course_update
+AFTER UPDATE OF tags ON courses WHEN NEW.tags IS NOT OLD.tags
+BEGIN
+  DELETE FROM course_tags WHERE course_id = OLD.course_id;
+  INSERT INTO tags (name)
+  SELECT name FROM (
+    SELECT DISTINCT normalize_tag(value) AS name FROM json_each(
+      '[' || replace(json_quote(NEW.tags), ',', '","') || ']')
+    WHERE normalize_tag(value) != '') AS t
+  WHERE NOT EXISTS (SELECT 1 FROM tags WHERE tags.name = t.name);
+  INSERT INTO course_tags (course_id, tag_id)
+  SELECT NEW.course_id, tag_id FROM tags WHERE name IN (
+    SELECT DISTINCT normalize_tag(value) AS name FROM json_each(
+      '[' || replace(json_quote(NEW.tags), ',', '","') || ']')
+    WHERE normalize_tag(value) != '')
+    AND NOT EXISTS (SELECT 1 FROM course_tags ct
+                    WHERE ct.course_id = NEW.course_id AND ct.tag_id = tags.tag_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS course_tags_course_delete AFTER DELETE ON courses
+BEGIN
+  DELETE FROM course_tags WHERE course_id = OLD.course_id;
+END;
+
+CREATE TABLE IF NOT EXISTS catalog_changes (
+  change_id  INTEGER PRIMARY KEY AUTOINCREMENT,
+  course_id  INTEGER NOT NULL,
+  changed_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+  kind       TEXT NOT NULL DEFAULT 'course'  -- 'course' (import) or 'rating' (review)
+);
+
+-- Interaction features, maintained incrementally by popularity.py from the
+-- interactions log. popularity/trending are event-weighted counts decayed
+-- with a long/short half-life to feature_state.decayed_to (a julianday);
+-- popularity_score is popularity scaled to 0..1 for recommend scoring.
+CREATE TABLE IF NOT EXISTS course_popularity (
+  course_id        INTEGER PRIMARY KEY,
+  views            INTEGER NOT NULL DEFAULT 0,
+  purchases        INTEGER NOT NULL DEFAULT 0,
+  completions      INTEGER NOT NULL DEFAULT 0,
+  completion_rate  REAL,
+  popularity       REAL NOT NULL DEFAULT 0,
+  trending         REAL NOT NULL DEFAULT 0,
+  popularity_score REAL NOT NULL DEFAULT 0,
+  FOREIGN KEY(course_id) REFERENCES courses(course_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_course_popularity_trending ON course_popularity(trending);
+
+-- Watermark per incremental job: last interaction_id folded in.
+CREATE TABLE IF NOT EXISTS feature_state (
+  name                TEXT PRIMARY KEY,
+  last_interaction_id INTEGER NOT NULL DEFAULT 0,
+  decayed_to          REAL
+);
+
+-- Course detail page: review counts per (course, rating, is_senior), kept
+-- current by triggers like course_rating_stats, so the rating histogram and
+-- senior vs. non-senior averages come from a few rows instead of a scan
+-- over every review of a popular course.
+CREATE TABLE IF NOT EXISTS course_review_counts (
+  course_id INTEGER NOT NULL,
+  rating    INTEGER NOT NULL,
+  is_senior INTEGER NOT NULL,   -- 0/1
+  n         INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (course_id, rating, is_senior)
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS reviews_counts_insert
+AFTER INSERT ON reviews WHEN NEW.rating IS NOT NULL
+BEGIN
+  INSERT INTO course_review_counts (course_id, rating, is_senior, n)
+  VALUES (NEW.course_id, NEW.rating, COALESCE(NEW.is_senior, 0) != 0, 1)
+  ON CONFLICT(course_id, rating, is_senior) DO UPDATE SET n = n + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS reviews_counts_delete
+AFTER DELETE ON reviews WHEN OLD.rating IS NOT NULL
+BEGIN
+  UPDATE course_review_counts SET n = n - 1
+  WHERE course_id = OLD.course_id AND rating = OLD.rating
+    AND is_senior = (COALESCE(OLD.is_senior, 0) != 0);
+END;
+
+CREATE TRIGGER IF NOT EXISTS reviews_counts_update
+AFTER UPDATE OF course_id, rating, is_senior ON reviews
+BEGIN
+  UPDATE course_review_counts SET n = n - 1
+  WHERE OLD.rating IS NOT NULL AND course_id = OLD.course_id AND rating = OLD.rating
+    AND is_senior = (COALESCE(OLD.is_senior, 0) != 0);
+  INSERT INTO course_review_counts (course_id, rating, is_senior, n)
+  SELECT NEW.course_id, NEW.rating, COALESCE(NEW.is_senior, 0) != 0, 1
+  WHERE NEW.rating IS NOT NULL
+  ON CONFLICT(course_id, rating, is_senior) DO UPDATE SET n = n + 1;
+END;
+
+-- Keyset pagination of a course's reviews, newest first: the index holds
+-- (course_id, created_at, review_id), so a page is a backwards range scan
+-- from the cursor plus one lookup per returned row.
+CREATE INDEX IF NOT EXISTS idx_reviews_course_created ON reviews(course_id, created_at);
+
+-- Interactions storage (interaction_store.py). `interactions` is the hot
+-- partition; months older than INTERACTION_ARCHIVE_AFTER_DAYS are moved to
+-- compressed column files listed in interaction_archives, after being
+-- rolled up into per-day counts.
+CREATE INDEX IF NOT EXISTS idx_interactions_created ON interactions(created_at);
+
+CREATE TABLE IF NOT EXISTS interaction_daily (
+  day        TEXT NOT NULL,      -- YYYY-MM-DD
+  course_id  INTEGER NOT NULL,
+  event_type TEXT NOT NULL,
+  n          INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (day, course_id, event_type)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_interaction_daily_course ON interaction_daily(course_id, day);
+
+CREATE TABLE IF NOT EXISTS interaction_archives (
+  partition   TEXT PRIMARY KEY,  -- YYYY-MM
+  path        TEXT NOT NULL,     -- file name under INTERACTION_ARCHIVE_DIR
+  rows        INTEGER NOT NULL,
+  min_id      INTEGER,
+  max_id      INTEGER,
+  archived_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Courses each user purchased or completed, for the recommend pipeline's
+-- exclusions and "similar to what you took" candidates. Kept by a trigger
+-- on interactions; rows stay when their interactions are archived.
+CREATE TABLE IF NOT EXISTS user_courses (
+  user_id      TEXT NOT NULL,
+  course_id    INTEGER NOT NULL,
+  purchased_at DATETIME,          -- first purchase
+  completed_at DATETIME,          -- first completion
+  PRIMARY KEY (user_id, course_id)
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS interactions_user_courses
+AFTER INSERT ON interactions
+WHEN NEW.event_type IN ('purchase', 'complete') AND NEW.user_id IS NOT NULL
+     AND NEW.user_id != 'anon' AND NEW.course_id IS NOT NULL
+BEGIN
+  INSERT INTO user_courses (user_id, course_id, purchased_at, completed_at)
+  VALUES (NEW.user_id, NEW.course_id,
+          CASE WHEN NEW.event_type = 'purchase' THEN NEW.created_at END,
+          CASE WHEN NEW.event_type = 'complete' THEN NEW.created_at END)
+  ON CONFLICT(user_id, course_id) DO UPDATE SET
+    purchased_at = COALESCE(purchased_at, excluded.purchased_at),
+    completed_at = COALESCE(completed_at, excluded.completed_at);
+END;
@@ -1,8 +1,9 @@
 import sqlite3
-import os
+import sys
 import datetime
 
-DB_PATH = os.path.join(os.path.dirname(__file__), "db.sqlite")
+from course_index import normalize_tag, parse_tags
+from db import DB_PATH, register_functions
 
 # ---------- COURSES TO SEED ----------
 SEED_COURSES = [
@@ -288,9 +289,344 @@ SEED_COURSES = [
 ]
 
 
-def init_db():
+COURSE_FILTER_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_courses_provider   ON courses(provider);
+CREATE INDEX IF NOT EXISTS idx_courses_difficulty ON courses(difficulty);
+CREATE INDEX IF NOT EXISTS idx_courses_source     ON courses(source);
+CREATE INDEX IF NOT EXISTS idx_courses_min_cgpa   ON courses(min_cgpa);
+CREATE INDEX IF NOT EXISTS idx_electives_course   ON electives(course_id);
+"""
+
+# Full-text index over courses for /api/search, kept in sync by triggers.
+# prefix='2 3' adds prefix indexes so "mach*" style queries stay fast.
+COURSES_FTS_TABLE = """
+CREATE VIRTUAL TABLE IF NOT EXISTS courses_fts USING fts5(
+    title, description, tags, provider,
+    content='courses', content_rowid='course_id',
+    tokenize='unicode61 remove_diacritics 2',
+    prefix='2 3'
+);
+"""
+
+COURSES_FTS_TRIGGERS = """
+CREATE TRIGGER IF NOT EXISTS courses_fts_insert AFTER INSERT ON courses
+BEGIN
+    INSERT INTO courses_fts (rowid, title, description, tags, provider)
+    VALUES (NEW.course_id, NEW.title, NEW.description, NEW.tags, NEW.provider);
+END;
+
+CREATE TRIGGER IF NOT EXISTS courses_fts_delete AFTER DELETE ON courses
+BEGIN
+    INSERT INTO courses_fts (courses_fts, rowid, title, description, tags, provider)
+    VALUES ('delete', OLD.course_id, OLD.title, OLD.description, OLD.tags, OLD.provider);
+END;
+
+CREATE TRIGGER IF NOT EXISTS courses_fts_update AFTER UPDATE ON courses
+BEGIN
+    INSERT INTO courses_fts (courses_fts, rowid, title, description, tags, provider)
+    VALUES ('delete', OLD.course_id, OLD.title, OLD.description, OLD.tags, OLD.provider);
+    INSERT INTO courses_fts (rowid, title, description, tags, provider)
+    VALUES (NEW.course_id, NEW.title, NEW.description, NEW.tags, NEW.provider);
+END;
+"""
+
+RATING_STATS_TABLE = """
+CREATE TABLE IF NOT EXISTS course_rating_stats (
+    course_id    INTEGER PRIMARY KEY,
+    rating_sum   INTEGER NOT NULL DEFAULT 0,
+    rating_count INTEGER NOT NULL DEFAULT 0,
+    avg_rating   REAL NOT NULL DEFAULT 0,
+    FOREIGN KEY(course_id) REFERENCES courses(course_id)
+);
+"""
+
+# Aggregates from the reviews table for courses that have no row yet.
+RATING_STATS_BACKFILL = """
+    INSERT OR IGNORE INTO course_rating_stats (course_id, rating_sum, rating_count, avg_rating)
+    SELECT course_id, SUM(rating), COUNT(rating), AVG(rating)
+    FROM reviews
+    WHERE rating IS NOT NULL
+    GROUP BY course_id
+"""
+
+# Keep course_rating_stats in sync with every write to reviews.
+RATING_STATS_TRIGGERS = """
+CREATE TRIGGER IF NOT EXISTS reviews_stats_insert
+AFTER INSERT ON reviews WHEN NEW.rating IS NOT NULL
+BEGIN
+    INSERT INTO course_rating_stats (course_id, rating_sum, rating_count, avg_rating)
+    VALUES (NEW.course_id, NEW.rating, 1, NEW.rating)
+    ON CONFLICT(course_id) DO UPDATE SET
+        rating_sum   = rating_sum + NEW.rating,
+        rating_count = rating_count + 1,
+        avg_rating   = CAST(rating_sum + NEW.rating AS REAL) / (rating_count + 1);
+END;
+
+CREATE TRIGGER IF NOT EXISTS reviews_stats_delete
+AFTER DELETE ON reviews WHEN OLD.rating IS NOT NULL
+BEGIN
+    UPDATE course_rating_stats SET
+        rating_sum   = rating_sum - OLD.rating,
+        rating_count = rating_count - 1,
+        avg_rating   = CASE WHEN rating_count > 1
+                            THEN CAST(rating_sum - OLD.rating AS REAL) / (rating_count - 1)
+                            ELSE 0 END
+    WHERE course_id = OLD.course_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS reviews_stats_update
+AFTER UPDATE OF course_id, rating ON reviews
+BEGIN
+    UPDATE course_rating_stats SET
+        rating_sum   = rating_sum - OLD.rating,
+        rating_count = rating_count - 1,
+        avg_rating   = CASE WHEN rating_count > 1
+                            THEN CAST(rating_sum - OLD.rating AS REAL) / (rating_count - 1)
+                            ELSE 0 END
+    WHERE course_id = OLD.course_id AND OLD.rating IS NOT NULL;
+    INSERT INTO course_rating_stats (course_id, rating_sum, rating_count, avg_rating)
+    SELECT NEW.course_id, NEW.rating, 1, NEW.rating WHERE NEW.rating IS NOT NULL
+    ON CONFLICT(course_id) DO UPDATE SET
+        rating_sum   = rating_sum + NEW.rating,
+        rating_count = rating_count + 1,
+        avg_rating   = CAST(rating_sum + NEW.rating AS REAL) / (rating_count + 1);
+END;
+"""
+
+# Normalized tags (indexed lookups instead of parsing courses.tags), and a
+# change log the API server polls to refresh its in-memory indexes after a
+# catalog_import.py run.
+CATALOG_TABLES = """
+CREATE TABLE IF NOT EXISTS tags (
+    tag_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name   TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS course_tags (
+    course_id INTEGER NOT NULL,
+    tag_id    INTEGER NOT NULL,
+    PRIMARY KEY (course_id, tag_id),
+    FOREIGN KEY(course_id) REFERENCES courses(course_id),
+    FOREIGN KEY(tag_id) REFERENCES tags(tag_id)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_course_tags_tag ON course_tags(tag_id, course_id);
+
+CREATE TABLE IF NOT EXISTS catalog_changes (
+    change_id  INTEGER PRIMARY KEY AUTOINCREMENT,
+    course_id  INTEGER NOT NULL,
+    changed_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    kind       TEXT NOT NULL DEFAULT 'course'  -- 'course' (import) or 'rating' (review)
+);
+"""
+
+# course_tags mirrors courses.tags on every write path: the triggers split
+# the string on commas (a JSON array via json_each), fold each tag with
+# normalize_tag() -- course_index.normalize_tag, registered on the
+# connection by db.register_functions, so SQL and parse_tags() agree on
+# non-ASCII tags -- and link it. sync_course_tags() covers rows written
+# before the triggers existed.
+# The inserts skip existing rows with NOT EXISTS rather than OR IGNORE: an
+# upsert (catalog_import.py) imposes its own ABORT policy on trigger
+# statements, so OR IGNORE would fail on a tag that is already there.
+_TAG_NAMES = (
+    "SELECT DISTINCT normalize_tag(value) AS name FROM json_each("
+    "'[' || replace(json_quote(NEW.tags), ',', '\",\"') || ']') "
+    "WHERE normalize_tag(value) != ''"
+)
+_LINK_TAGS = f"""
+    INSERT INTO tags (name)
+    SELECT name FROM ({_TAG_NAMES}) AS t
+    WHERE NOT EXISTS (SELECT 1 FROM tags WHERE tags.name = t.name);
+    INSERT INTO course_tags (course_id, tag_id)
+    SELECT NEW.course_id, tag_id FROM tags WHERE name IN ({_TAG_NAMES})
+      AND NOT EXISTS (SELECT 1 FROM course_tags ct
+                      WHERE ct.course_id = NEW.course_id AND ct.tag_id = tags.tag_id);
+"""
+COURSE_TAGS_TRIGGERS = f"""
+-- replaced on every start, so databases keep no older version
+DROP TRIGGER IF EXISTS course_tags_course_insert;
+DROP TRIGGER IF EXISTS course_tags_course_update;
+
+CREATE TRIGGER course_tags_course_insert AFTER INSERT ON courses
+BEGIN{_LINK_TAGS}END;
+
+CREATE TRIGGER course_tags_course_update
+AFTER UPDATE OF tags ON courses WHEN NEW.tags IS NOT OLD.tags
+BEGIN
+    DELETE FROM course_tags WHERE course_id = OLD.course_id;{_LINK_TAGS}END;
+
+CREATE TRIGGER IF NOT EXISTS course_tags_course_delete AFTER DELETE ON courses
+BEGIN
+    DELETE FROM course_tags WHERE course_id = OLD.course_id;
+END;
+"""
+
+# Interaction features maintained incrementally by popularity.py.
+POPULARITY_TABLES = """
+CREATE TABLE IF NOT EXISTS course_popularity (
+    course_id        INTEGER PRIMARY KEY,
+    views            INTEGER NOT NULL DEFAULT 0,
+    purchases        INTEGER NOT NULL DEFAULT 0,
+    completions      INTEGER NOT NULL DEFAULT 0,
+    completion_rate  REAL,
+    popularity       REAL NOT NULL DEFAULT 0,
+    trending         REAL NOT NULL DEFAULT 0,
+    popularity_score REAL NOT NULL DEFAULT 0,
+    FOREIGN KEY(course_id) REFERENCES courses(course_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_course_popularity_trending ON course_popularity(trending);
+
+CREATE TABLE IF NOT EXISTS feature_state (
+    name                TEXT PRIMARY KEY,
+    last_interaction_id INTEGER NOT NULL DEFAULT 0,
+    decayed_to          REAL
+);
+"""
+
+# Course detail: review counts per (course, rating, is_senior) kept by
+# triggers, so the rating histogram and senior/non-senior averages are a
+# handful of rows, and the index behind keyset-paginated reviews (newest
+# first; the rowid review_id breaks created_at ties).
+REVIEW_SUMMARY = """
+CREATE TABLE IF NOT EXISTS course_review_counts (
+    course_id INTEGER NOT NULL,
+    rating    INTEGER NOT NULL,
+    is_senior INTEGER NOT NULL,
+    n         INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (course_id, rating, is_senior)
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS reviews_counts_insert
+AFTER INSERT ON reviews WHEN NEW.rating IS NOT NULL
+BEGIN
+    INSERT INTO course_review_counts (course_id, rating, is_senior, n)
+    VALUES (NEW.course_id, NEW.rating, COALESCE(NEW.is_senior, 0) != 0, 1)
+    ON CONFLICT(course_id, rating, is_senior) DO UPDATE SET n = n + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS reviews_counts_delete
+AFTER DELETE ON reviews WHEN OLD.rating IS NOT NULL
+BEGIN
+    UPDATE course_review_counts SET n = n - 1
+    WHERE course_id = OLD.course_id AND rating = OLD.rating
+      AND is_senior = (COALESCE(OLD.is_senior, 0) != 0);
+END;
+
+CREATE TRIGGER IF NOT EXISTS reviews_counts_update
+AFTER UPDATE OF course_id, rating, is_senior ON reviews
+BEGIN
+    UPDATE course_review_counts SET n = n - 1
+    WHERE OLD.rating IS NOT NULL AND course_id = OLD.course_id AND rating = OLD.rating
+      AND is_senior = (COALESCE(OLD.is_senior, 0) != 0);
+    INSERT INTO course_review_counts (course_id, rating, is_senior, n)
+    SELECT NEW.course_id, NEW.rating, COALESCE(NEW.is_senior, 0) != 0, 1
+    WHERE NEW.rating IS NOT NULL
+    ON CONFLICT(course_id, rating, is_senior) DO UPDATE SET n = n + 1;
+END;
+
+CREATE INDEX IF NOT EXISTS idx_reviews_course_created ON reviews(course_id, created_at);
+"""
+
+# Counts for reviews written before the triggers; a no-op once the table
+# has rows (the triggers never delete any).
+REVIEW_COUNTS_BACKFILL = """
+    INSERT INTO course_review_counts (course_id, rating, is_senior, n)
+    SELECT course_id, rating, COALESCE(is_senior, 0) != 0, COUNT(*)
+    FROM reviews
+    WHERE rating IS NOT NULL AND NOT EXISTS (SELECT 1 FROM course_review_counts)
+    GROUP BY 1, 2, 3
+"""
+
+# Interactions storage (interaction_store.py): a created_at index for
+# range scans and archival, per-day rollups, and the archived-month manifest.
+INTERACTION_TABLES = """
+CREATE INDEX IF NOT EXISTS idx_interactions_created ON interactions(created_at);
+
+CREATE TABLE IF NOT EXISTS interaction_daily (
+    day        TEXT NOT NULL,
+    course_id  INTEGER NOT NULL,
+    event_type TEXT NOT NULL,
+    n          INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, course_id, event_type)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_interaction_daily_course ON interaction_daily(course_id, day);
+
+CREATE TABLE IF NOT EXISTS interaction_archives (
+    partition   TEXT PRIMARY KEY,
+    path        TEXT NOT NULL,
+    rows        INTEGER NOT NULL,
+    min_id      INTEGER,
+    max_id      INTEGER,
+    archived_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+# Courses each user purchased or completed, kept by a trigger on
+# interactions so the recommend pipeline can exclude them with one primary
+# key lookup. There is no delete trigger: history outlives archival.
+USER_COURSES = """
+CREATE TABLE IF NOT EXISTS user_courses (
+    user_id      TEXT NOT NULL,
+    course_id    INTEGER NOT NULL,
+    purchased_at DATETIME,
+    completed_at DATETIME,
+    PRIMARY KEY (user_id, course_id)
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS interactions_user_courses
+AFTER INSERT ON interactions
+WHEN NEW.event_type IN ('purchase', 'complete') AND NEW.user_id IS NOT NULL
+     AND NEW.user_id != 'anon' AND NEW.course_id IS NOT NULL
+BEGIN
+    INSERT INTO user_courses (user_id, course_id, purchased_at, completed_at)
+    VALUES (NEW.user_id, NEW.course_id,
+            CASE WHEN NEW.event_type = 'purchase' THEN NEW.created_at END,
+            CASE WHEN NEW.event_type = 'complete' THEN NEW.created_at END)
+    ON CONFLICT(user_id, course_id) DO UPDATE SET
+        purchased_at = COALESCE(purchased_at, excluded.purchased_at),
+        completed_at = COALESCE(completed_at, excluded.completed_at);
+END;
+"""
+
+# No-op once user_courses has rows; init_db runs it with USER_COURSES.
+USER_COURSES_BACKFILL = """
+    INSERT INTO user_courses (user_id, course_id, purchased_at, completed_at)
+    SELECT user_id, course_id,
+           MIN(CASE WHEN event_type = 'purchase' THEN created_at END),
+           MIN(CASE WHEN event_type = 'complete' THEN created_at END)
+    FROM interactions
+    WHERE event_type IN ('purchase', 'complete') AND user_id IS NOT NULL
+      AND user_id != 'anon' AND course_id IS NOT NULL
+      AND NOT EXISTS (SELECT 1 FROM user_courses)
+    GROUP BY user_id, course_id
+"""
+
+# Natural key the importer upserts on.
+COURSE_NATURAL_KEY = (
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_courses_provider_title ON courses(provider, title)"
+)
+
+
+def _run_immediate(conn, script):
+    """
+    Run a multi-statement script as one BEGIN IMMEDIATE transaction, so a
+    table, its triggers and their backfill land together and concurrently
+    starting workers take turns. (executescript() would commit between.)
+    """
+    try:
+        conn.executescript("BEGIN IMMEDIATE;" + script + ";COMMIT;")
+    except sqlite3.Error:
+        if conn.in_transaction:
+            conn.rollback()
+        raise
+
+
+def init_db(db_path=DB_PATH):
     """Create tables if they don't exist."""
-    conn = sqlite3.connect(DB_PATH)
+    conn = register_functions(sqlite3.connect(db_path))
     cur = conn.cursor()
 
     # courses table
@@ -356,19 +692,136 @@ def init_db():
         """
     )
 
+    # full-text search index; populate it from existing rows the first time
+    fts_exists = cur.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='courses_fts'"
+    ).fetchone()
+    cur.execute(COURSES_FTS_TABLE)
+    cur.executescript(COURSES_FTS_TRIGGERS)
+    if not fts_exists:
+        cur.execute("INSERT INTO courses_fts (courses_fts) VALUES ('rebuild')")
+
+    # indexes behind the /api/courses filters
+    cur.executescript(COURSE_FILTER_INDEXES)
+
+    # rating aggregate per course, maintained by triggers on reviews. Courses
+    # reviewed before the triggers existed are backfilled in the same write
+    # transaction, so a review committed in between is counted exactly once.
+    # Rows the triggers maintain are left alone; use rebuild_rating_stats()
+    # to recompute everything from scratch.
+    _run_immediate(conn, RATING_STATS_TABLE + RATING_STATS_TRIGGERS + RATING_STATS_BACKFILL)
+
+    # bulk import support; the tag triggers are replaced in one transaction
+    # so no write slips through between DROP and CREATE
+    cur.executescript(CATALOG_TABLES)
+    _run_immediate(conn, COURSE_TAGS_TRIGGERS)
+    # catalog_changes.kind came later; the check and ALTER share one write
+    # lock so concurrently starting workers add it once
+    try:
+        cur.execute("BEGIN IMMEDIATE")
+        columns = {r[1] for r in cur.execute("PRAGMA table_info(catalog_changes)")}
+        if "kind" not in columns:
+            cur.execute("ALTER TABLE catalog_changes ADD COLUMN kind TEXT NOT NULL DEFAULT 'course'")
+        conn.commit()
+    except sqlite3.Error:
+        if conn.in_transaction:
+            conn.rollback()
+        raise
+    try:
+        cur.execute(COURSE_NATURAL_KEY)
+    except sqlite3.IntegrityError as e:
+        print("Duplicate (provider, title) courses; catalog import disabled:", e)
+
+    # popularity / trending features
+    cur.executescript(POPULARITY_TABLES)
+
+    # interactions rollups and archive manifest
+    cur.executescript(INTERACTION_TABLES)
+
+    # purchased/completed courses per user; filled from the log in the
+    # transaction that adds the trigger, so no purchase is missed or doubled
+    _run_immediate(conn, USER_COURSES + USER_COURSES_BACKFILL)
+
+    # review summary + pagination index for the course detail page; the
+    # existing reviews are counted in the same transaction that adds the
+    # triggers, so a review committed meanwhile is counted exactly once
+    _run_immediate(conn, REVIEW_SUMMARY + REVIEW_COUNTS_BACKFILL)
+
+    # Derive course_tags for courses that predate it (or changed tags). Names
+    # the old ASCII-only triggers stored ("Économie") mean a full re-derive.
+    stale = [(tag_id,) for tag_id, name in cur.execute("SELECT tag_id, name FROM tags")
+             if normalize_tag(name) != name]
+    sync_course_tags(conn, rebuild=bool(stale))
+    cur.executemany("DELETE FROM tags WHERE tag_id = ?", stale)
+
+    conn.commit()
+    conn.close()
+
+
+def rebuild_rating_stats(db_path=DB_PATH):
+    """Recompute course_rating_stats and course_review_counts from the reviews table."""
+    conn = sqlite3.connect(db_path)
+    cur = conn.cursor()
+    cur.execute("DELETE FROM course_review_counts")
+    cur.execute(REVIEW_COUNTS_BACKFILL)
+    cur.execute("DELETE FROM course_rating_stats")
+    cur.execute(RATING_STATS_BACKFILL)
+    count = cur.execute("SELECT COUNT(*) FROM course_rating_stats").fetchone()[0]
     conn.commit()
     conn.close()
+    return count
+
+
+def sync_course_tags(conn, rebuild=False, chunk_size=10_000):
+    """
+    Fill tags/course_tags from the courses.tags strings. By default only
+    courses with no course_tags rows yet are parsed; rebuild=True clears
+    and re-derives everything. Returns the number of courses parsed.
+    """
+    cur = conn.cursor()
+    if rebuild:
+        cur.execute("DELETE FROM course_tags")
+    tag_ids = dict(cur.execute("SELECT name, tag_id FROM tags"))
+    rows = cur.execute(
+        """
+        SELECT course_id, tags FROM courses
+        WHERE tags IS NOT NULL AND TRIM(tags) != ''
+          AND course_id NOT IN (SELECT course_id FROM course_tags)
+        """
+    ).fetchall()
+    for start in range(0, len(rows), chunk_size):
+        links = []
+        for course_id, tags in rows[start:start + chunk_size]:
+            for tag in parse_tags(tags):
+                if tag not in tag_ids:
+                    cur.execute("INSERT OR IGNORE INTO tags (name) VALUES (?)", (tag,))
+                    tag_ids[tag] = cur.execute(
+                        "SELECT tag_id FROM tags WHERE name = ?", (tag,)
+                    ).fetchone()[0]
+                links.append((course_id, tag_ids[tag]))
+        cur.executemany(
+            "INSERT OR IGNORE INTO course_tags (course_id, tag_id) VALUES (?,?)", links
+        )
+    conn.commit()
+    return len(rows)
 
 
-def seed_courses():
+def seed_courses(db_path=DB_PATH):
     """Clear existing data and insert seed courses."""
-    conn = sqlite3.connect(DB_PATH)
+    conn = register_functions(sqlite3.connect(db_path))
     cur = conn.cursor()
 
     # Clear tables while developing
     cur.execute("DELETE FROM electives")
     cur.execute("DELETE FROM reviews")
+    cur.execute("DELETE FROM course_rating_stats")
+    cur.execute("DELETE FROM course_review_counts")
     cur.execute("DELETE FROM interactions")
+    cur.execute("DELETE FROM interaction_daily")
+    cur.execute("DELETE FROM interaction_archives")
+    cur.execute("DELETE FROM user_courses")
+    cur.execute("DELETE FROM course_popularity")
+    cur.execute("DELETE FROM feature_state")
     cur.execute("DELETE FROM courses")
 
     for course in SEED_COURSES:
@@ -399,6 +852,7 @@ def seed_courses():
                 (course_id,),
             )
 
+    sync_course_tags(conn)
     conn.commit()
     conn.close()
 
@@ -406,6 +860,17 @@ def seed_courses():
 if __name__ == "__main__":
     print(f"Using DB at: {DB_PATH}")
     init_db()
+    if "--rebuild-ratings" in sys.argv[1:]:
+        # Existing database: refresh the rating aggregate, keep the data.
+        n = rebuild_rating_stats()
+        print(f"Rebuilt rating stats for {n} courses.")
+        sys.exit(0)
+    if "--rebuild-tags" in sys.argv[1:]:
+        conn = sqlite3.connect(DB_PATH)
+        n = sync_course_tags(conn, rebuild=True)
+        conn.close()
+        print(f"Rebuilt tags for {n} courses.")
+        sys.exit(0)
     print("Tables created (if not exist).")
     seed_courses()
     print(f"Seeded {len(SEED_COURSES)} courses.")
@@ -0,0 +1,246 @@
+"""
+Content index for "courses like this one" (/api/course/{id}/similar).
+
+Each course's title, description and tags are feature-hashed into a TF-IDF
+vector, reduced to a small dense embedding with a fixed random projection
+and L2-normalized, so cosine similarity is a dot product. Lookups go
+through random-hyperplane LSH tables (a handful of candidate courses per
+query) and fall back to an exact brute-force scan when the buckets come up
+short.
+
+    python similar.py build [--out PATH]   # offline build from the courses table
+    python similar.py bench [N]            # LSH recall@10 and latency vs brute force
+
+tests/test_similar.py fails if recall@10 regresses.
+"""
+import os
+import re
+import sqlite3
+import sys
+import time
+import zlib
+
+import numpy as np
+
+from cf_model import MODEL_DIR
+from course_index import parse_tags
+from db import DB_PATH
+
+SIMILAR_INDEX_PATH = os.environ.get("SIMILAR_INDEX_PATH", os.path.join(MODEL_DIR, "similar.npz"))
+
+HASH_DIMS = 1 << 14
+EMBED_DIMS = 128
+LSH_TABLES = 8
+LSH_BITS = 10
+TAG_WEIGHT = 2  # tags count as much as two words of title/description
+CHUNK = 1024
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def course_tokens(course):
+    text = f"{course.get('title') or ''} {course.get('description') or ''}".lower()
+    words = _WORD.findall(text)
+    tags = [f"tag:{t}" for t in parse_tags(course.get("tags"))]
+    return words + tags * TAG_WEIGHT
+
+
+def _hash(token):
+    return zlib.crc32(token.encode("utf-8")) % HASH_DIMS
+
+
+def _documents(rows):
+    return [np.fromiter((_hash(t) for t in course_tokens(r)), dtype=np.int64) for r in rows]
+
+
+def idf_weights(docs):
+    n = len(docs)
+    df = np.zeros(HASH_DIMS, dtype=np.int64)
+    for d in docs:
+        df[np.unique(d)] += 1
+    return (np.log((1 + n) / (1 + df)) + 1).astype(np.float32)
+
+
+def embed(rows, seed=0, idf=None):
+    """
+    L2-normalized (n x EMBED_DIMS) float32 embeddings of hashed TF-IDF
+    vectors. `idf` defaults to the weights of `rows` themselves.
+    """
+    docs = _documents(rows)
+    return _embed_documents(docs, idf if idf is not None else idf_weights(docs), seed)
+
+
+def _embed_documents(docs, idf, seed):
+    n = len(docs)
+    projection = np.random.default_rng(seed).normal(size=(HASH_DIMS, EMBED_DIMS)).astype(np.float32)
+    out = np.zeros((n, EMBED_DIMS), dtype=np.float32)
+    for start in range(0, n, CHUNK):
+        part = docs[start:start + CHUNK]
+        tfidf = np.zeros((len(part), HASH_DIMS), dtype=np.float32)
+        for i, d in enumerate(part):
+            np.add.at(tfidf[i], d, 1.0)
+        tfidf *= idf
+        out[start:start + len(part)] = tfidf @ projection
+    norms = np.linalg.norm(out, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return out / norms
+
+
+class SimilarityIndex:
+    """
+    Immutable: with_courses() returns an updated copy, so readers holding
+    the old index are never disturbed.
+    """
+
+    def __init__(self, course_ids, vectors, planes, idf=None, seed=0):
+        self.course_ids = np.asarray(course_ids, dtype=np.int64)
+        self.vectors = vectors
+        self.planes = planes
+        self.idf = idf  # None for indexes saved before it was kept
+        self.seed = seed
+        self.position = {int(c): i for i, c in enumerate(self.course_ids)}
+        weights = 1 << np.arange(planes.shape[1], dtype=np.int64)
+        # codes[t, i] = LSH bucket of course i in table t
+        self.codes = np.stack([((vectors @ p.T) > 0) @ weights for p in planes])
+        self.tables = []
+        for codes in self.codes:
+            order = np.argsort(codes, kind="stable")
+            keys, starts = np.unique(codes[order], return_index=True)
+            members = np.split(order, starts[1:])
+            self.tables.append(dict(zip(keys.tolist(), members)))
+
+    @classmethod
+    def build(cls, rows, seed=0):
+        rows = list(rows)
+        planes = np.random.default_rng(seed + 1).normal(
+            size=(LSH_TABLES, LSH_BITS, EMBED_DIMS)
+        ).astype(np.float32)
+        docs = _documents(rows)
+        idf = idf_weights(docs)
+        return cls([r["course_id"] for r in rows], _embed_documents(docs, idf, seed), planes, idf, seed)
+
+    def with_courses(self, rows, removed=()):
+        """
+        A copy with `rows` (course dicts) added or replaced and `removed`
+        course ids dropped. New vectors use this index's IDF weights, which
+        drift as the catalog changes; rebuild after large imports.
+        """
+        if self.idf is None:
+            raise ValueError("index predates incremental updates; rebuild it")
+        rows = list(rows)
+        replaced = {r["course_id"] for r in rows} | set(removed)
+        keep = [i for i, cid in enumerate(self.course_ids.tolist()) if cid not in replaced]
+        course_ids = np.concatenate([self.course_ids[keep],
+                                     np.asarray([r["course_id"] for r in rows], dtype=np.int64)])
+        vectors = np.concatenate([self.vectors[keep], embed(rows, self.seed, self.idf)])
+        return SimilarityIndex(course_ids, vectors, self.planes, self.idf, self.seed)
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".tmp.npz"
+        extra = {"idf": self.idf} if self.idf is not None else {}
+        np.savez(tmp, course_ids=self.course_ids, vectors=self.vectors, planes=self.planes,
+                 seed=self.seed, **extra)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        idf = data["idf"] if "idf" in data else None
+        seed = int(data["seed"]) if "seed" in data else 0
+        return cls(data["course_ids"], data["vectors"], data["planes"], idf, seed)
+
+    def __len__(self):
+        return len(self.course_ids)
+
+    def __contains__(self, course_id):
+        return course_id in self.position
+
+    def _rank(self, i, cand, k):
+        sims = self.vectors[cand] @ self.vectors[i]
+        order = np.lexsort((self.course_ids[cand], -sims))[:k]
+        return [(int(self.course_ids[cand[j]]), float(sims[j])) for j in order]
+
+    def similar(self, course_id: int, k: int = 10):
+        """[(course_id, cosine)] of the k most similar courses, best first."""
+        i = self.position[course_id]
+        cand = np.unique(np.concatenate([
+            table[int(self.codes[t, i])] for t, table in enumerate(self.tables)
+        ]))
+        cand = cand[cand != i]
+        if len(cand) < k:
+            return self.similar_exact(course_id, k)
+        return self._rank(i, cand, k)
+
+    def similar_exact(self, course_id: int, k: int = 10):
+        """Brute-force scan over the whole catalog."""
+        i = self.position[course_id]
+        cand = np.flatnonzero(np.arange(len(self.course_ids)) != i)
+        return self._rank(i, cand, k)
+
+
+# ---------- Offline build / benchmark ----------
+
+def build_from_db(db_path=DB_PATH, out=SIMILAR_INDEX_PATH):
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    rows = [dict(r) for r in conn.execute("SELECT course_id, title, description, tags FROM courses")]
+    conn.close()
+    index = SimilarityIndex.build(rows)
+    index.save(out)
+    return len(index)
+
+
+def synthetic_rows(n, seed=0):
+    """n courses drawn from 300 word topics, so every course has real neighbours."""
+    rng = np.random.default_rng(seed)
+    topics = [[f"w{t}_{j}" for j in range(30)] for t in range(300)]
+    tags = [f"tag{t}" for t in range(200)]
+    rows = []
+    for cid in range(1, n + 1):
+        topic = topics[rng.integers(len(topics))]
+        words = [topic[j] for j in rng.integers(0, len(topic), 12)]
+        rows.append({
+            "course_id": cid,
+            "title": " ".join(words[:4]),
+            "description": " ".join(words[4:]),
+            "tags": ", ".join(tags[t] for t in rng.choice(len(tags), 2, replace=False)),
+        })
+    return rows
+
+
+def recall_at_k(index, course_ids, k=10):
+    """(mean LSH recall@k against the exact scan, LSH seconds, exact seconds)."""
+    recall, t_lsh, t_exact = 0.0, 0.0, 0.0
+    for cid in course_ids:
+        start = time.perf_counter()
+        approx = index.similar(cid, k)
+        t_lsh += time.perf_counter() - start
+        start = time.perf_counter()
+        exact = index.similar_exact(cid, k)
+        t_exact += time.perf_counter() - start
+        recall += len({c for c, _ in approx} & {c for c, _ in exact}) / k
+    return recall / len(course_ids), t_lsh, t_exact
+
+
+def bench(n=100_000, queries=500, k=10, seed=0):
+    rows = synthetic_rows(n, seed)
+    start = time.perf_counter()
+    index = SimilarityIndex.build(rows, seed)
+    print(f"built {n} courses in {time.perf_counter() - start:.1f}s")
+
+    ids = np.random.default_rng(seed).choice(n, queries, replace=False) + 1
+    recall, t_lsh, t_exact = recall_at_k(index, ids.tolist(), k)
+    print(f"recall@{k}: {recall:.3f}")
+    print(f"lsh: {t_lsh / queries * 1000:.3f} ms/query, exact: {t_exact / queries * 1000:.3f} ms/query")
+
+
+if __name__ == "__main__":
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "build"
+    if cmd == "build":
+        out = sys.argv[sys.argv.index("--out") + 1] if "--out" in sys.argv else SIMILAR_INDEX_PATH
+        print(f"Indexed {build_from_db(out=out)} courses into {out}")
+    elif cmd == "bench":
+        bench(int(sys.argv[2]) if len(sys.argv) > 2 else 100_000)
+    else:
+        sys.exit(f"unknown command: {cmd}")
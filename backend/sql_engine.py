@@ -0,0 +1,156 @@
+"""
+SQL scoring engine for /api/recommend (RECOMMEND_ENGINE=sql).
+
+Scores inside SQLite from the normalized tags: the student's interests are
+resolved to tag_ids through the unique index on tags(name), tag overlap is
+a GROUP BY over course_tags(tag_id, course_id), and the rating and
+popularity boosts come from course_rating_stats and course_popularity. Nothing is held in memory, so every worker sees
+imports and reviews immediately. Rankings are identical to the rule-based
+scorer (tests/test_recommend_engines.py checks this).
+
+    python sql_engine.py [N]     # parity check + timing on a synthetic catalog
+"""
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+from course_index import POPULARITY_WEIGHT, interest_set
+
+RECOMMEND_SQL = """
+    WITH overlap AS (
+        SELECT ct.course_id, COUNT(*) AS n
+        FROM course_tags ct
+        WHERE ct.tag_id IN (SELECT tag_id FROM tags WHERE name IN (SELECT value FROM json_each(?)))
+        GROUP BY ct.course_id
+    ),
+    ranked AS (
+        SELECT c.course_id,
+               COALESCE(o.n, 0) + (COALESCE(s.avg_rating, 0) - 3.0) * 0.3
+                 + ? * COALESCE(p.popularity_score, 0) AS score
+        FROM courses c
+        LEFT JOIN course_rating_stats s ON s.course_id = c.course_id
+        LEFT JOIN course_popularity p ON p.course_id = c.course_id
+        LEFT JOIN overlap o ON o.course_id = c.course_id
+        WHERE COALESCE(c.min_cgpa, 0) <= ?
+        ORDER BY score DESC, c.course_id
+        LIMIT ?
+    )
+    SELECT c.*,
+           COALESCE(s.avg_rating, 0)       AS avg_rating,
+           COALESCE(s.rating_count, 0)     AS rating_count,
+           COALESCE(p.popularity_score, 0) AS popularity_score
+    FROM ranked r
+    JOIN courses c ON c.course_id = r.course_id
+    LEFT JOIN course_rating_stats s ON s.course_id = c.course_id
+    LEFT JOIN course_popularity p ON p.course_id = c.course_id
+    ORDER BY r.score DESC, r.course_id
+"""
+
+COURSE_SQL = """
+    SELECT c.*,
+           COALESCE(s.avg_rating, 0)       AS avg_rating,
+           COALESCE(s.rating_count, 0)     AS rating_count,
+           COALESCE(p.popularity_score, 0) AS popularity_score
+    FROM courses c
+    LEFT JOIN course_rating_stats s ON s.course_id = c.course_id
+    LEFT JOIN course_popularity p ON p.course_id = c.course_id
+    WHERE c.course_id = ?
+"""
+
+
+class SqlRecommender:
+    """
+    Same interface as CourseIndex, backed by queries instead of an index.
+
+    `read` runs fn(conn) on a database connection (db.reads.run_sync).
+    build/upsert_course/remove_course/update_rating are no-ops: the
+    database is the index.
+    """
+
+    def __init__(self, read):
+        self.read = read
+
+    def __len__(self):
+        return self.read(lambda conn: conn.execute("SELECT COUNT(*) FROM courses").fetchone()[0])
+
+    def get(self, course_id: int):
+        row = self.read(lambda conn: conn.execute(COURSE_SQL, (course_id,)).fetchone())
+        return dict(row) if row is not None else None
+
+    def tag_set(self, course_id: int):
+        return None  # nothing held in memory; callers parse courses.tags
+
+    def build(self, rows):
+        pass
+
+    def upsert_course(self, row):
+        pass
+
+    def remove_course(self, course_id: int):
+        pass
+
+    def update_rating(self, course_id: int, avg_rating: float, rating_count: int):
+        pass
+
+    def recommend(self, cgpa: float, interests, top_k: int):
+        """Top-k course dicts for a student, best first."""
+        if top_k <= 0:
+            return []
+        wanted = json.dumps(sorted(interest_set(interests)))
+        rows = self.read(lambda conn: conn.execute(RECOMMEND_SQL, (wanted, POPULARITY_WEIGHT, cgpa, top_k)).fetchall())
+        return [dict(r) for r in rows]
+
+    def recommend_many(self, requests):
+        """Yield recommend() results for (cgpa, interests, top_k) tuples, in order."""
+        for cgpa, interests, top_k in requests:
+            yield self.recommend(cgpa, interests, top_k)
+
+
+# ---------- Parity check / timing ----------
+
+def check_parity(db_path, n_queries=300, seed=0):
+    """Compare SqlRecommender rankings with the brute-force rule loop on db_path."""
+    import random
+
+    from course_index import brute_force_recommend
+
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    engine = SqlRecommender(lambda fn: fn(conn))
+    courses = [dict(r) for r in conn.execute(COURSE_SQL.replace("WHERE c.course_id = ?", ""))]
+    vocab = [r[0] for r in conn.execute("SELECT name FROM tags")] + ["nope"]
+    rng = random.Random(seed)
+    for _ in range(n_queries):
+        cgpa = rng.choice([0.0, 5.5, 6.0, 7.0, 10.0])
+        interests = [t.upper() if rng.random() < 0.2 else t for t in rng.sample(vocab, rng.randint(0, 3))]
+        top_k = rng.randint(1, 50)
+        want = [c["course_id"] for c in brute_force_recommend(courses, cgpa, interests, top_k)]
+        got = [c["course_id"] for c in engine.recommend(cgpa, interests, top_k)]
+        if want != got:
+            raise AssertionError(f"ranking mismatch for {cgpa=} {interests=} {top_k=}: {want} != {got}")
+    conn.close()
+    return n_queries
+
+
+if __name__ == "__main__":
+    from bench.synthetic import generate
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    with tempfile.TemporaryDirectory() as scratch:
+        db_path = os.path.join(scratch, "db.sqlite")
+        generate(db_path, courses=n, reviews=n * 5, interactions=0, users=n, log=lambda msg: None)
+        print(f"Parity: {check_parity(db_path)} queries match the brute-force scorer.")
+
+        conn = sqlite3.connect(db_path)
+        conn.row_factory = sqlite3.Row
+        engine = SqlRecommender(lambda fn: fn(conn))
+        runs = 100
+        start = time.perf_counter()
+        for _ in range(runs):
+            engine.recommend(7.0, ["AI", "ML", "Python"], 10)
+        ms = (time.perf_counter() - start) / runs * 1000
+        print(f"{n} courses: {ms:.2f} ms per recommend")
+        conn.close()
@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+
+@pytest.fixture(scope="session")
+def synthetic_db(tmp_path_factory):
+    """A small bench.synthetic database (2000 courses), shared by the whole run."""
+    from bench.synthetic import generate
+
+    path = str(tmp_path_factory.mktemp("db") / "db.sqlite")
+    generate(path, courses=2000, reviews=10_000, interactions=20_000, users=500, log=lambda msg: None)
+    return path
@@ -0,0 +1,82 @@
+"""catalog_import.py: the courses triggers keep course_tags in step with upserted tags."""
+import json
+import sqlite3
+
+from catalog_import import import_files
+from course_index import parse_tags
+
+
+def linked_tags(conn):
+    rows = conn.execute("SELECT ct.course_id, t.name FROM course_tags ct JOIN tags t USING (tag_id)")
+    linked = {}
+    for cid, name in rows:
+        linked.setdefault(cid, set()).add(name)
+    return linked
+
+
+def write_feed(path, rows):
+    with open(path, "w") as f:
+        for row in rows:
+            f.write(json.dumps(row) + "\n")
+    return str(path)
+
+
+def test_reimport_relinks_existing_tags(tmp_path):
+    db = str(tmp_path / "db.sqlite")
+    first = write_feed(tmp_path / "a.jsonl", [
+        {"title": "Intro ML", "provider": "P", "tags": "ML, Python"},
+        {"title": "Intro Web", "provider": "P", "tags": "Web, python, PYTHON"},
+    ])
+    # Re-tags an existing course with tags that already exist, and adds one new.
+    second = write_feed(tmp_path / "b.jsonl", [
+        {"title": "Intro ML", "provider": "P", "tags": "Web, Python, Stats"},
+    ])
+    import_files([first], db, log=lambda msg: None)
+    import_files([second], db, log=lambda msg: None)
+
+    conn = sqlite3.connect(db)
+    try:
+        courses = conn.execute("SELECT course_id, tags FROM courses")
+        expected = {cid: set(parse_tags(tags)) for cid, tags in courses}
+        assert linked_tags(conn) == expected
+        assert conn.execute("SELECT COUNT(*), COUNT(DISTINCT name) FROM tags").fetchone() == (4, 4)
+    finally:
+        conn.close()
+
+
+def test_non_ascii_tags_are_folded_like_parse_tags(tmp_path):
+    db = str(tmp_path / "db.sqlite")
+    feed = write_feed(tmp_path / "a.jsonl", [
+        {"title": "Macro", "provider": "P", "tags": "Économie, IA"},
+        {"title": "Micro", "provider": "P", "tags": "économie"},
+    ])
+    import_files([feed], db, log=lambda msg: None)
+
+    conn = sqlite3.connect(db)
+    try:
+        assert sorted(r[0] for r in conn.execute("SELECT name FROM tags")) == ["ia", "économie"]
+        assert len(linked_tags(conn)) == 2
+    finally:
+        conn.close()
+
+
+def test_bad_jsonl_lines_are_skipped(tmp_path):
+    db = str(tmp_path / "db.sqlite")
+    feed = tmp_path / "feed.jsonl"
+    feed.write_text("\n".join([
+        json.dumps({"title": "Intro ML", "provider": "P", "tags": "ML"}),
+        "{bad json",
+        "[1, 2]",
+        json.dumps({"provider": "P"}),
+        json.dumps({"title": "Intro Web", "provider": "P", "tags": "Web"}),
+    ]) + "\n")
+    logged = []
+    importer = import_files([str(feed)], db, chunk_size=2, log=logged.append)
+
+    assert (importer.rows, importer.skipped) == (2, 3)
+    assert sum("skipped row" in msg for msg in logged) == 3
+    conn = sqlite3.connect(db)
+    try:
+        assert sorted(r[0] for r in conn.execute("SELECT title FROM courses")) == ["Intro ML", "Intro Web"]
+    finally:
+        conn.close()
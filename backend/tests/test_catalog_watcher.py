@@ -0,0 +1,60 @@
+"""CatalogWatcher: course vs rating changes, pruned gaps, and the kind column on older databases."""
+import sqlite3
+
+import pytest
+
+from catalog_import import CatalogWatcher, prune_changes
+from seed_db import init_db
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = str(tmp_path / "db.sqlite")
+    init_db(path)
+    conn = sqlite3.connect(path)
+    yield conn
+    conn.close()
+
+
+def log_changes(conn, changes):
+    with conn:
+        conn.executemany("INSERT INTO catalog_changes (course_id, kind) VALUES (?, ?)", changes)
+
+
+def watcher(conn):
+    calls = []
+    w = CatalogWatcher(lambda fn: fn(conn), lambda ids: calls.append(("course", ids)),
+                       lambda ids: calls.append(("rating", ids)))
+    w.mark_current()
+    return w, calls
+
+
+def test_ratings_go_to_on_ratings_unless_the_course_changed_too(db):
+    w, calls = watcher(db)
+    log_changes(db, [(1, "rating"), (2, "course"), (2, "rating"), (3, "rating"), (1, "rating")])
+    assert w.poll() == 3
+    assert calls == [("course", [2]), ("rating", [1, 3])]
+    assert w.poll() == 0
+
+
+def test_pruned_changes_reload_everything(db):
+    w, calls = watcher(db)
+    log_changes(db, [(1, "rating"), (2, "rating")])
+    with db:
+        db.execute("UPDATE catalog_changes SET changed_at = '2000-01-01' WHERE course_id = 1")
+    assert prune_changes(db, 1) == 1
+    w.poll()
+    assert calls == [("course", None)]
+
+
+def test_init_db_adds_kind_to_an_older_change_log(tmp_path):
+    path = str(tmp_path / "old.sqlite")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE catalog_changes (change_id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                 "course_id INTEGER NOT NULL, changed_at DATETIME DEFAULT CURRENT_TIMESTAMP)")
+    conn.execute("INSERT INTO catalog_changes (course_id) VALUES (5)")
+    conn.commit()
+    init_db(path)
+    init_db(path)
+    assert conn.execute("SELECT course_id, kind FROM catalog_changes").fetchall() == [(5, "course")]
+    conn.close()
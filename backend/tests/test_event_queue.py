@@ -0,0 +1,28 @@
+"""EventWriter: a failing row is dropped and logged; the rest of its batch still commits."""
+import logging
+import sqlite3
+
+import pytest
+
+from event_queue import EventWriter
+from seed_db import init_db
+
+INSERT_REVIEW = "INSERT INTO reviews (course_id, rating) VALUES (?, ?)"
+
+
+def test_bad_row_is_logged_and_the_batch_lands(tmp_path, caplog):
+    path = str(tmp_path / "db.sqlite")
+    init_db(path)
+    writer = EventWriter(path, flush_interval=0.05)
+    futures = [writer.submit([(INSERT_REVIEW, (1, rating))]) for rating in (5, 9, 4)]
+    with caplog.at_level(logging.ERROR, logger="event_queue"):
+        writer.start()
+        writer.stop()
+
+    assert futures[0].result() is None and futures[2].result() is None
+    with pytest.raises(sqlite3.IntegrityError):
+        futures[1].result()
+    assert [r.getMessage() for r in caplog.records] == ["Event writer: dropped write"]
+    conn = sqlite3.connect(path)
+    assert sorted(r[0] for r in conn.execute("SELECT rating FROM reviews")) == [4, 5]
+    conn.close()
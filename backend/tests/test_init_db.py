@@ -0,0 +1,110 @@
+"""init_db on databases that predate the trigger-maintained aggregates."""
+import sqlite3
+import threading
+
+import pytest
+
+import seed_db
+from seed_db import init_db
+
+
+def copy_db(src, path):
+    a, b = sqlite3.connect(src), sqlite3.connect(path)
+    a.backup(b)
+    a.close()
+    b.close()
+    return path
+
+
+@pytest.fixture
+def write_during(monkeypatch):
+    """
+    write_during(path, marker, write): when init_db starts a statement
+    containing marker, another connection commits write(conn) right then, as
+    a request racing worker startup would. If init_db holds the write lock
+    the write waits briefly and is dropped.
+    """
+    def install(path, marker, write):
+        register = seed_db.register_functions
+
+        def traced(conn):
+            def on_statement(sql):
+                if marker not in sql:
+                    return
+                other = sqlite3.connect(path, timeout=0.1)
+                try:
+                    write(other)
+                    other.commit()
+                except sqlite3.OperationalError:  # locked: the write can't interleave
+                    pass
+                finally:
+                    other.close()
+
+            conn.set_trace_callback(on_statement)
+            return register(conn)
+
+        monkeypatch.setattr(seed_db, "register_functions", traced)
+
+    return install
+
+
+def init_concurrently(path, workers=4):
+    """init_db from several threads at once, as workers starting together do; returns the errors."""
+    errors = []
+
+    def run():
+        try:
+            init_db(path)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run) for _ in range(workers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return errors
+
+
+def test_review_counts_are_backfilled_once(synthetic_db, tmp_path, write_during):
+    path = copy_db(synthetic_db, str(tmp_path / "db.sqlite"))
+    conn = sqlite3.connect(path)
+    conn.executescript("DROP TABLE course_review_counts; DROP TRIGGER reviews_counts_insert;")
+
+    def review(other):
+        other.execute("INSERT INTO reviews (course_id, rating, is_senior) VALUES (1, 5, 0)")
+
+    write_during(path, "INSERT INTO course_review_counts", review)
+    assert init_concurrently(path) == []
+    init_db(path)
+
+    total = "SELECT COALESCE(SUM(n), 0) FROM course_review_counts"
+    reviews = "SELECT COUNT(*) FROM reviews WHERE rating IS NOT NULL"
+    assert conn.execute(total).fetchone() == conn.execute(reviews).fetchone()
+    review(conn)
+    conn.commit()
+    assert conn.execute(total).fetchone() == conn.execute(reviews).fetchone()
+    conn.close()
+
+
+def test_user_courses_are_backfilled_once(synthetic_db, tmp_path, write_during):
+    path = copy_db(synthetic_db, str(tmp_path / "db.sqlite"))
+    conn = sqlite3.connect(path)
+    conn.executescript("DROP TABLE user_courses; DROP TRIGGER interactions_user_courses;")
+
+    def purchase(other):
+        other.execute("INSERT INTO interactions (user_id, course_id, event_type) "
+                      "VALUES ('late-buyer', 1, 'purchase')")
+
+    write_during(path, "INSERT INTO user_courses", purchase)
+    assert init_concurrently(path) == []
+    init_db(path)
+
+    owned = """SELECT COUNT(*) FROM (SELECT DISTINCT user_id, course_id FROM interactions
+               WHERE event_type IN ('purchase', 'complete') AND user_id IS NOT NULL
+                 AND user_id != 'anon' AND course_id IS NOT NULL)"""
+    assert conn.execute("SELECT COUNT(*) FROM user_courses").fetchone() == conn.execute(owned).fetchone()
+    purchase(conn)
+    conn.commit()
+    assert conn.execute("SELECT COUNT(*) FROM user_courses").fetchone() == conn.execute(owned).fetchone()
+    conn.close()
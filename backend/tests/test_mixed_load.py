@@ -0,0 +1,23 @@
+"""bench.mixed_load as a smoke test: a short run must finish without 5xx or runaway latency."""
+import subprocess
+import sys
+
+import pytest
+
+from conftest import BACKEND
+
+pytest.importorskip("httpx")
+
+# Generous: this guards against errors and pathological stalls, not regressions of a few ms.
+MAX_P99_MS = 2000
+
+
+def test_mixed_load_has_no_errors(synthetic_db):
+    result = subprocess.run(
+        [sys.executable, "-m", "bench.mixed_load", "--db", synthetic_db,
+         "--clients", "16", "--seconds", "2", "--max-p99-ms", str(MAX_P99_MS)],
+        cwd=BACKEND, capture_output=True, text=True, timeout=120,
+    )
+    assert result.returncode == 0, result.stdout + result.stderr
+    for kind in ("courses", "course", "search", "complete", "review"):
+        assert kind in result.stdout
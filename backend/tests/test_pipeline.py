@@ -0,0 +1,30 @@
+"""Pipeline.load_history_async: the awaited history lookup keeps the candidate budget."""
+import asyncio
+
+from pipeline import CANDIDATE_BUDGET_MS, Context, Pipeline
+
+
+def lookup(delay, owned):
+    async def history(user_id):
+        await asyncio.sleep(delay)
+        return owned
+    return history
+
+
+def test_history_is_awaited():
+    pipeline = Pipeline(workers=1)
+    pipeline.history_async = lookup(0, [3, 1])
+    ctx = Context(8.0, ["ml"], 5, user_id="u1")
+    assert asyncio.run(pipeline.load_history_async(ctx)) == [3, 1]
+    assert "history" in ctx.timings and ctx.timed_out == []
+    pipeline.close()
+
+
+def test_late_history_is_dropped():
+    pipeline = Pipeline(workers=1)
+    pipeline.history_async = lookup(CANDIDATE_BUDGET_MS / 1000 + 0.2, [3, 1])
+    ctx = Context(8.0, ["ml"], 5, user_id="u1")
+    assert asyncio.run(pipeline.load_history_async(ctx)) == []
+    assert ctx.timed_out == ["history"]
+    assert pipeline.load_history(ctx) == []  # not looked up again
+    pipeline.close()
@@ -0,0 +1,144 @@
+"""Every /api/recommend engine against the original rule-based loop."""
+import random
+import sqlite3
+
+import pytest
+
+from course_index import POPULARITY_WEIGHT, CourseIndex, brute_force_recommend
+from db import register_functions
+from sql_engine import COURSE_SQL, SqlRecommender
+
+ALL_COURSES_SQL = COURSE_SQL.replace("WHERE c.course_id = ?", "ORDER BY c.course_id")
+
+
+def original_recommend(rows, cgpa, interests, top_k):
+    """The pre-index scorer from main.py, kept verbatim as the baseline."""
+    interests_set = set(i.strip().lower() for i in (interests or []) if i.strip())
+    scored = []
+    for r in sorted(rows, key=lambda r: r["course_id"]):
+        min_cg = r["min_cgpa"] if r["min_cgpa"] is not None else 0.0
+        if min_cg > cgpa:
+            continue
+        tags = r["tags"] or ""
+        tag_set = set(t.strip().lower() for t in tags.split(",") if t.strip())
+        score = len(interests_set & tag_set)
+        score += ((r["avg_rating"] or 0.0) - 3.0) * 0.3
+        score += POPULARITY_WEIGHT * (r.get("popularity_score") or 0.0)
+        scored.append((score, r))
+    scored.sort(key=lambda x: x[0], reverse=True)
+    return [r["course_id"] for _, r in scored[:top_k]]
+
+
+def random_queries(rng, vocab, n):
+    for _ in range(n):
+        interests = [t.upper() if rng.random() < 0.2 else t for t in rng.sample(vocab, rng.randint(0, 3))]
+        yield rng.choice([0.0, 5.5, 6.0, 6.3, 7.0, 8.0, 10.0]), interests, rng.randint(1, 60)
+
+
+@pytest.fixture()
+def conn(synthetic_db, tmp_path):
+    path = tmp_path / "db.sqlite"
+    path.write_bytes(open(synthetic_db, "rb").read())
+    conn = register_functions(sqlite3.connect(path))  # the courses triggers call normalize_tag()
+    conn.row_factory = sqlite3.Row
+    yield conn
+    conn.close()
+
+
+def load_rows(conn):
+    return [dict(r) for r in conn.execute(ALL_COURSES_SQL)]
+
+
+def vocabulary(conn):
+    return [r[0] for r in conn.execute("SELECT name FROM tags ORDER BY name")] + ["no such tag", " "]
+
+
+def engines(conn):
+    rows = load_rows(conn)
+    built = {"index": CourseIndex(), "sql": SqlRecommender(lambda fn: fn(conn))}
+    try:
+        from vector_engine import VectorScorer
+
+        built["numpy"] = VectorScorer()
+    except ImportError:
+        pass
+    for engine in built.values():
+        engine.build(rows)
+    return built
+
+
+def assert_parity(conn, built, rng, n=150):
+    rows = load_rows(conn)
+    for cgpa, interests, top_k in random_queries(rng, vocabulary(conn), n):
+        want = original_recommend(rows, cgpa, interests, top_k)
+        assert [c["course_id"] for c in brute_force_recommend(rows, cgpa, interests, top_k)] == want
+        for name, engine in built.items():
+            got = [c["course_id"] for c in engine.recommend(cgpa, interests, top_k)]
+            assert got == want, (name, cgpa, interests, top_k)
+
+
+def test_engines_match_original_scorer(conn):
+    assert_parity(conn, engines(conn), random.Random(0))
+
+
+def test_engines_match_after_reviews_and_catalog_changes(conn):
+    built = engines(conn)
+    rng = random.Random(1)
+    ids = [r[0] for r in conn.execute("SELECT course_id FROM courses")]
+
+    # New reviews move the rating aggregate (triggers keep course_rating_stats current).
+    for cid in rng.sample(ids, 40):
+        conn.execute("INSERT INTO reviews (course_id, rating) VALUES (?, ?)", (cid, rng.randint(1, 5)))
+        stats = conn.execute(
+            "SELECT avg_rating, rating_count FROM course_rating_stats WHERE course_id = ?", (cid,)
+        ).fetchone()
+        for engine in built.values():
+            engine.update_rating(cid, stats["avg_rating"], stats["rating_count"])
+
+    # Retagged and removed courses.
+    for cid in rng.sample(ids, 20):
+        conn.execute("UPDATE courses SET tags = ?, min_cgpa = ? WHERE course_id = ?",
+                     (", ".join(rng.sample(vocabulary(conn)[:-2], 2)), rng.choice([0.0, 6.5, 9.0]), cid))
+    removed = rng.sample(ids, 10)
+    for cid in removed:
+        conn.execute("DELETE FROM courses WHERE course_id = ?", (cid,))
+    conn.commit()
+    from seed_db import sync_course_tags
+
+    sync_course_tags(conn)
+    for row in load_rows(conn):
+        for name, engine in built.items():
+            if name != "sql":
+                engine.upsert_course(row)
+    for cid in removed:
+        for engine in built.values():
+            engine.remove_course(cid)
+
+    assert_parity(conn, built, rng)
+
+
+def test_non_ascii_tags_fold_the_same_everywhere(conn):
+    # SQLite's lower() only folds ASCII; the triggers must fold like parse_tags.
+    ids = [r[0] for r in conn.execute("SELECT course_id FROM courses ORDER BY course_id LIMIT 30")]
+    for i, cid in enumerate(ids):
+        conn.execute("UPDATE courses SET tags = ? WHERE course_id = ?",
+                     ("Économie, IA" if i % 2 else " économie ,Straße", cid))
+    conn.commit()
+    names = [r[0] for r in conn.execute("SELECT name FROM tags WHERE name LIKE '%conomie'")]
+    assert names == ["économie"]
+
+    built = engines(conn)
+    rows = load_rows(conn)
+    for interests in (["économie"], ["Économie"], ["ÉCONOMIE", "straße"], ["IA"]):
+        want = original_recommend(rows, 10.0, interests, 20)
+        for name, engine in built.items():
+            assert [c["course_id"] for c in engine.recommend(10.0, interests, 20)] == want, (name, interests)
+
+
+def test_batch_matches_single_requests(conn):
+    built = engines(conn)
+    rows = load_rows(conn)
+    requests = list(random_queries(random.Random(2), vocabulary(conn), 80))
+    for name, engine in built.items():
+        for request, got in zip(requests, engine.recommend_many(requests)):
+            assert [c["course_id"] for c in got] == original_recommend(rows, *request), (name, request)
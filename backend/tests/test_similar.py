@@ -0,0 +1,38 @@
+"""The /similar index: exact scan correctness and LSH recall."""
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from similar import SimilarityIndex, recall_at_k, synthetic_rows  # noqa: E402
+
+# recall@10 of the LSH lookup against the exact scan; python similar.py
+# bench 5000 reports about 0.97. Fewer courses than this leaves most synthetic
+# topics with under 10 members, and recall measures noise instead.
+COURSES = 5000
+RECALL_FLOOR = 0.95
+
+
+@pytest.fixture(scope="module")
+def index():
+    return SimilarityIndex.build(synthetic_rows(COURSES))
+
+
+def test_exact_scan_matches_brute_force_cosine(index):
+    for cid in (1, 17, 2500, COURSES):
+        i = index.position[cid]
+        sims = index.vectors @ index.vectors[i]
+        want = sorted((-float(s), int(c)) for c, s in zip(index.course_ids, sims) if c != cid)[:10]
+        got = index.similar_exact(cid, 10)
+        assert [c for c, _ in got] == [c for _, c in want]
+        assert [s for _, s in got] == pytest.approx([-s for s, _ in want], abs=1e-5)
+
+
+def test_lsh_recall(index):
+    ids = np.random.default_rng(0).choice(len(index), 300, replace=False) + 1
+    recall, _, _ = recall_at_k(index, ids.tolist(), 10)
+    assert recall >= RECALL_FLOOR
+
+
+def test_lookup_never_returns_the_course_itself(index):
+    for cid in range(1, 200):
+        assert cid not in [c for c, _ in index.similar(cid, 10)]
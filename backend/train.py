@@ -0,0 +1,254 @@
+"""
+Offline collaborative-filtering trainer.
+
+Streams `interactions` (live and archived) and `reviews` in chunks, builds a sparse
+user x course preference matrix and fits implicit-feedback ALS
+(Hu, Koren & Volinsky 2008) with NumPy on the CPU. Each run writes a new
+versioned artifact directory and then points MODEL_DIR/CURRENT at it:
+
+    models/
+      CURRENT                   -> "20261018T021500Z"
+      20261018T021500Z/
+        user_factors.npy        float32 (n_users x factors)
+        item_factors.npy        float32 (n_courses x factors)
+        course_ids.npy          int64, row order of item_factors
+        user_ids.json           row order of user_factors
+        meta.json
+
+The .npy files are plain arrays so the API can memory-map them.
+
+    python train.py [--factors 32] [--iterations 10] [--db PATH] [--out DIR]
+"""
+import argparse
+import datetime
+import json
+import os
+import sqlite3
+import sys
+import time
+
+import numpy as np
+
+from cf_model import MODEL_DIR
+from db import DB_PATH
+from interaction_store import read_interactions
+
+# Implicit-feedback strength per interaction type. Explicit review ratings
+# are read from `reviews` instead of the duplicate "rating" interactions.
+EVENT_WEIGHTS = {
+    "view": 1.0,
+    "purchase": 3.0,
+    "complete": 4.0,
+}
+
+
+def review_weight(rating: int):
+    """3 stars -> 1, 5 stars -> 3; 1-2 stars carry no positive signal."""
+    return max(rating - 2, 0)
+
+
+# ---------- Loading ----------
+
+class _IdMap:
+    def __init__(self):
+        self.index = {}
+        self.keys = []
+
+    def lookup(self, key):
+        i = self.index.get(key)
+        if i is None:
+            i = self.index[key] = len(self.keys)
+            self.keys.append(key)
+        return i
+
+
+def _iter_chunks(conn, sql, chunk_size):
+    cur = conn.execute(sql)
+    while True:
+        rows = cur.fetchmany(chunk_size)
+        if not rows:
+            return
+        yield rows
+
+
+def load_preferences(conn, chunk_size=50_000):
+    """
+    Stream interactions and reviews into COO arrays.
+
+    Returns (users, courses, rows, cols, weights) where users/courses map
+    matrix rows/cols back to user_id/course_id. Duplicate (user, course)
+    pairs are summed.
+    """
+    users, courses = _IdMap(), _IdMap()
+    parts_r, parts_c, parts_w = [], [], []
+
+    def add(chunk):
+        r = np.fromiter((users.lookup(u) for u, _, _ in chunk), dtype=np.int64, count=len(chunk))
+        c = np.fromiter((courses.lookup(cid) for _, cid, _ in chunk), dtype=np.int64, count=len(chunk))
+        w = np.fromiter((w for _, _, w in chunk), dtype=np.float32, count=len(chunk))
+        parts_r.append(r)
+        parts_c.append(c)
+        parts_w.append(w)
+
+    # Live and archived interactions (interaction_store.py).
+    for rows in read_interactions(conn, event_types=EVENT_WEIGHTS,
+                                  columns=("user_id", "course_id", "event_type"),
+                                  chunk_size=chunk_size):
+        add([(u, int(cid), EVENT_WEIGHTS[ev]) for u, cid, ev in rows
+             if u is not None and cid is not None])
+
+    for rows in _iter_chunks(
+        conn,
+        "SELECT user_id, course_id, rating FROM reviews "
+        "WHERE user_id IS NOT NULL AND rating IS NOT NULL",
+        chunk_size,
+    ):
+        chunk = [(u, int(cid), review_weight(r)) for u, cid, r in rows]
+        add([x for x in chunk if x[2] > 0])
+
+    if not parts_r:
+        empty = np.empty(0, dtype=np.int64)
+        return users.keys, courses.keys, empty, empty, np.empty(0, dtype=np.float32)
+
+    rows = np.concatenate(parts_r)
+    cols = np.concatenate(parts_c)
+    weights = np.concatenate(parts_w)
+
+    # Sum duplicate (user, course) pairs.
+    key = rows * len(courses.keys) + cols
+    uniq, inverse = np.unique(key, return_inverse=True)
+    summed = np.bincount(inverse, weights=weights).astype(np.float32)
+    return (
+        users.keys,
+        courses.keys,
+        uniq // len(courses.keys),
+        uniq % len(courses.keys),
+        summed,
+    )
+
+
+def compress(rows, cols, values, n_rows):
+    """COO -> CSR arrays (indptr, indices, data)."""
+    order = np.lexsort((cols, rows))
+    indptr = np.zeros(n_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n_rows), out=indptr[1:])
+    return indptr, cols[order], values[order]
+
+
+# ---------- Implicit ALS ----------
+
+def _als_step(indptr, indices, data, fixed, reg, alpha):
+    """Solve every row's factors against the fixed side's factors."""
+    n_rows, f = len(indptr) - 1, fixed.shape[1]
+    gram = fixed.T @ fixed
+    eye = reg * np.eye(f)
+    out = np.zeros((n_rows, f), dtype=np.float64)
+    for u in range(n_rows):
+        start, end = indptr[u], indptr[u + 1]
+        if start == end:
+            continue
+        y = fixed[indices[start:end]]
+        conf = 1.0 + alpha * data[start:end]
+        # (Y'Y + Y'(C-I)Y + reg*I) x = Y'C p, with p = 1 for observed pairs
+        a = gram + (y.T * (conf - 1.0)) @ y + eye
+        b = y.T @ conf
+        out[u] = np.linalg.solve(a, b)
+    return out
+
+
+def implicit_als(rows, cols, values, n_users, n_items,
+                 factors=32, reg=0.1, alpha=40.0, iterations=10, seed=0, log=None):
+    """Fit user/item factors; returns (user_factors, item_factors) as float32."""
+    rng = np.random.default_rng(seed)
+    user_f = rng.normal(0, 0.01, (n_users, factors))
+    item_f = rng.normal(0, 0.01, (n_items, factors))
+    by_user = compress(rows, cols, values, n_users)
+    by_item = compress(cols, rows, values, n_items)
+    for it in range(iterations):
+        start = time.perf_counter()
+        user_f = _als_step(*by_user, item_f, reg, alpha)
+        item_f = _als_step(*by_item, user_f, reg, alpha)
+        if log:
+            log(f"iteration {it + 1}/{iterations}: {time.perf_counter() - start:.2f}s")
+    return user_f.astype(np.float32), item_f.astype(np.float32)
+
+
+# ---------- Artifacts ----------
+
+def write_artifacts(out_dir, user_ids, course_ids, user_f, item_f, meta):
+    """Write a new model version and atomically repoint CURRENT at it."""
+    version = datetime.datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+    final = os.path.join(out_dir, version)
+    n = 1
+    while os.path.exists(final) or os.path.exists(final + ".tmp"):
+        version = f"{version.split('-')[0]}-{n}"
+        final = os.path.join(out_dir, version)
+        n += 1
+    tmp = final + ".tmp"
+    os.makedirs(tmp)
+
+    np.save(os.path.join(tmp, "user_factors.npy"), user_f)
+    np.save(os.path.join(tmp, "item_factors.npy"), item_f)
+    np.save(os.path.join(tmp, "course_ids.npy"), np.asarray(course_ids, dtype=np.int64))
+    with open(os.path.join(tmp, "user_ids.json"), "w") as f:
+        json.dump(list(user_ids), f)
+    with open(os.path.join(tmp, "meta.json"), "w") as f:
+        json.dump(dict(meta, version=version), f, indent=2)
+    os.rename(tmp, final)
+
+    pointer = os.path.join(out_dir, "CURRENT")
+    with open(pointer + ".tmp", "w") as f:
+        f.write(version + "\n")
+    os.replace(pointer + ".tmp", pointer)
+    return version
+
+
+def train(db_path=DB_PATH, out_dir=MODEL_DIR, factors=32, reg=0.1, alpha=40.0,
+          iterations=10, chunk_size=50_000, log=print):
+    conn = sqlite3.connect(db_path)
+    try:
+        start = time.perf_counter()
+        user_ids, course_ids, rows, cols, values = load_preferences(conn, chunk_size)
+    finally:
+        conn.close()
+    log(f"Loaded {len(values)} user-course pairs ({len(user_ids)} users, "
+        f"{len(course_ids)} courses) in {time.perf_counter() - start:.2f}s")
+    if len(values) == 0:
+        log("No interactions to train on.")
+        return None
+
+    user_f, item_f = implicit_als(
+        rows, cols, values, len(user_ids), len(course_ids),
+        factors=factors, reg=reg, alpha=alpha, iterations=iterations, log=log,
+    )
+    meta = {
+        "algorithm": "implicit-als",
+        "factors": factors,
+        "reg": reg,
+        "alpha": alpha,
+        "iterations": iterations,
+        "n_users": len(user_ids),
+        "n_courses": len(course_ids),
+        "n_pairs": int(len(values)),
+        "event_weights": EVENT_WEIGHTS,
+        "trained_at": datetime.datetime.utcnow().isoformat(),
+    }
+    os.makedirs(out_dir, exist_ok=True)
+    version = write_artifacts(out_dir, user_ids, course_ids, user_f, item_f, meta)
+    log(f"Wrote model {version} to {out_dir}")
+    return version
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--out", default=MODEL_DIR)
+    parser.add_argument("--factors", type=int, default=32)
+    parser.add_argument("--reg", type=float, default=0.1)
+    parser.add_argument("--alpha", type=float, default=40.0)
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--chunk-size", type=int, default=50_000)
+    args = parser.parse_args()
+    version = train(args.db, args.out, args.factors, args.reg, args.alpha,
+                    args.iterations, args.chunk_size)
+    sys.exit(0 if version else 1)
@@ -0,0 +1,262 @@
+"""
+Vectorized NumPy scoring engine for /api/recommend.
+
+Optional drop-in for CourseIndex on large catalogs (RECOMMEND_ENGINE=numpy).
+The catalog is held as a sparse course x tag matrix in CSC form plus
+min_cgpa and rating-boost vectors; a request is one sparse matrix-vector
+product with the 0/1 interest vector, a CGPA mask and an argpartition
+top-k. Batches are scored a chunk at a time as one (requests x courses)
+matrix. Rankings are identical to the rule-based scorer
+(tests/test_recommend_engines.py checks this).
+
+    python vector_engine.py            # parity check + timing at 100k courses
+"""
+import sys
+import threading
+import time
+
+import numpy as np
+
+from course_index import course_boost, interest_set, parse_tags
+from metrics import observe_candidates
+
+# Upper bound on requests x courses cells scored at once by recommend_many.
+BATCH_CELLS = 4_000_000
+
+
+class VectorScorer:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._courses = {}  # course_id -> row dict
+        self._tags = {}     # course_id -> frozenset of tags
+        self._dirty = True
+        self._ids = np.empty(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self._courses)
+
+    def get(self, course_id: int):
+        course = self._courses.get(course_id)
+        return dict(course) if course is not None else None
+
+    def tag_set(self, course_id: int):
+        """The course's parsed tags (frozenset), or None if unknown."""
+        return self._tags.get(course_id)
+
+    # ---------- Building / incremental updates ----------
+
+    def build(self, rows):
+        """Rebuild from rows of COURSES_WITH_RATINGS."""
+        with self._lock:
+            self._courses = {r["course_id"]: dict(r) for r in rows}
+            self._tags = {cid: parse_tags(c.get("tags")) for cid, c in self._courses.items()}
+            self._compile()
+
+    def upsert_course(self, row):
+        with self._lock:
+            course = dict(row)
+            self._courses[course["course_id"]] = course
+            self._tags[course["course_id"]] = parse_tags(course.get("tags"))
+            self._dirty = True
+
+    def remove_course(self, course_id: int):
+        with self._lock:
+            self._tags.pop(course_id, None)
+            if self._courses.pop(course_id, None) is not None:
+                self._dirty = True
+
+    def update_rating(self, course_id: int, avg_rating: float, rating_count: int):
+        with self._lock:
+            course = self._courses.get(course_id)
+            if course is None:
+                return
+            self._courses[course_id] = dict(course, avg_rating=avg_rating, rating_count=rating_count)
+            if not self._dirty:
+                i = self._pos[course_id]
+                self._rows[i] = self._courses[course_id]
+                self._boost[i] = course_boost(self._rows[i])
+
+    def _compile(self):
+        ids = sorted(self._courses)
+        n = len(ids)
+        self._ids = np.asarray(ids, dtype=np.int64)
+        self._pos = {cid: i for i, cid in enumerate(ids)}
+        self._rows = [self._courses[cid] for cid in ids]
+
+        self._min_cgpa = np.fromiter(
+            (r["min_cgpa"] if r.get("min_cgpa") is not None else 0.0 for r in self._rows),
+            dtype=np.float64, count=n,
+        )
+        self._boost = np.fromiter(
+            (course_boost(r) for r in self._rows),
+            dtype=np.float64, count=n,
+        )
+
+        # Course x tag incidence matrix, stored column-wise (CSC).
+        columns = {}
+        for i, cid in enumerate(ids):
+            for t in self._tags[cid]:
+                columns.setdefault(t, []).append(i)
+        self._vocab = {t: j for j, t in enumerate(columns)}
+        lengths = [len(columns[t]) for t in columns]
+        self._indptr = np.zeros(len(columns) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=self._indptr[1:])
+        self._indices = np.fromiter(
+            (i for t in columns for i in columns[t]), dtype=np.int64, count=int(self._indptr[-1])
+        )
+        self._dirty = False
+
+    # ---------- Querying ----------
+
+    def _interest_rows(self, interests):
+        """Row indices of every course carrying one of the interests (with repeats)."""
+        cols = [self._vocab[t] for t in interest_set(interests) if t in self._vocab]
+        if not cols:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([self._indices[self._indptr[j]:self._indptr[j + 1]] for j in cols])
+
+    def scores(self, cgpa: float, interests):
+        """Score vector over the catalog (-inf where the CGPA filter fails)."""
+        n = len(self._ids)
+        overlap = np.bincount(self._interest_rows(interests), minlength=n).astype(np.float64)
+        score = overlap + self._boost
+        score[self._min_cgpa > cgpa] = -np.inf
+        return score
+
+    def batch_scores(self, cgpas, interests_list):
+        """Score matrix (requests x courses) for several requests at once."""
+        n, b = len(self._ids), len(cgpas)
+        flat = [self._interest_rows(interests) + q * n for q, interests in enumerate(interests_list)]
+        flat = np.concatenate(flat) if flat else np.empty(0, dtype=np.int64)
+        overlap = np.bincount(flat, minlength=b * n).astype(np.float64).reshape(b, n)
+        score = overlap + self._boost[None, :]
+        score[self._min_cgpa[None, :] > np.asarray(cgpas, dtype=np.float64)[:, None]] = -np.inf
+        return score
+
+    def recommend(self, cgpa: float, interests, top_k: int):
+        """Top-k course dicts for a student, best first."""
+        with self._lock:
+            if self._dirty:
+                self._compile()
+            if top_k <= 0 or len(self._ids) == 0:
+                return []
+            order = self._top_k(self.scores(cgpa, interests), top_k)
+            return [dict(self._rows[i]) for i in order]
+
+    def recommend_many(self, requests):
+        """Yield recommend() results for (cgpa, interests, top_k) tuples, in order."""
+        requests = list(requests)
+        with self._lock:
+            if self._dirty:
+                self._compile()
+            chunk = max(1, BATCH_CELLS // max(1, len(self._ids)))
+        for start in range(0, len(requests), chunk):
+            part = requests[start:start + chunk]
+            with self._lock:
+                if self._dirty:
+                    self._compile()
+                if len(self._ids) == 0:
+                    results = [[] for _ in part]
+                else:
+                    matrix = self.batch_scores([r[0] for r in part], [r[1] for r in part])
+                    results = [
+                        [dict(self._rows[i]) for i in self._top_k(row, top_k)] if top_k > 0 else []
+                        for row, (_, _, top_k) in zip(matrix, part)
+                    ]
+            yield from results
+
+    def _top_k(self, score, top_k):
+        eligible = np.isfinite(score)
+        n_eligible = int(eligible.sum())
+        observe_candidates(n_eligible)
+        k = min(top_k, n_eligible)
+        if k == 0:
+            return []
+        if k < len(score):
+            part = np.argpartition(-score, k - 1)[:k]
+            # Pull in every course tied with the k-th score so ties are
+            # broken by course_id, as in the rule-based scorer.
+            cand = np.flatnonzero(score >= score[part].min())
+        else:
+            cand = np.flatnonzero(eligible)
+        order = np.lexsort((self._ids[cand], -score[cand]))[:k]
+        return cand[order].tolist()
+
+
+# ---------- Parity check / timing ----------
+
+def _synthetic_rows(n, seed=0):
+    rng = np.random.default_rng(seed)
+    vocab = [f"tag{i}" for i in range(200)] + ["AI", "ML", "Data Science", "Web Development"]
+    cgpas = [None, 0.0, 5.5, 6.0, 6.5, 7.0, 7.5, 8.0]
+    ratings = [0.0, 1.0, 2.0, 3.0, 3.5, 4.0, 4.5, 5.0]
+    rows = []
+    for cid in range(1, n + 1):
+        tags = rng.choice(len(vocab), size=rng.integers(0, 4), replace=False)
+        rows.append({
+            "course_id": cid,
+            "title": f"Course {cid}",
+            "tags": ", ".join(vocab[t] for t in tags),
+            "min_cgpa": cgpas[rng.integers(len(cgpas))],
+            "avg_rating": ratings[rng.integers(len(ratings))],
+            "rating_count": 1,
+        })
+    return rows, vocab
+
+
+def check_parity(n_courses=5000, n_queries=300, seed=0):
+    """Compare VectorScorer rankings with the brute-force rule loop on a synthetic catalog."""
+    from course_index import brute_force_recommend
+
+    rows, vocab = _synthetic_rows(n_courses, seed)
+    courses = {r["course_id"]: r for r in rows}
+    engine = VectorScorer()
+    engine.build(rows)
+    rng = np.random.default_rng(seed + 1)
+    for q in range(n_queries):
+        if q % 10 == 0:
+            cid = int(rng.integers(1, n_courses + 1))
+            avg = float(rng.choice([1.0, 2.5, 4.0, 5.0]))
+            courses[cid] = dict(courses[cid], avg_rating=avg, rating_count=2)
+            engine.update_rating(cid, avg, 2)
+        cgpa = float(rng.choice([0.0, 5.5, 6.0, 7.0, 10.0]))
+        interests = [vocab[t] for t in rng.choice(len(vocab), size=rng.integers(0, 4), replace=False)]
+        top_k = int(rng.integers(1, 50))
+        want = [c["course_id"] for c in brute_force_recommend(courses.values(), cgpa, interests, top_k)]
+        got = [c["course_id"] for c in engine.recommend(cgpa, interests, top_k)]
+        if want != got:
+            raise AssertionError(f"ranking mismatch for {cgpa=} {interests=} {top_k=}: {want} != {got}")
+
+    batch = [
+        (float(rng.choice([0.0, 6.0, 7.0])),
+         [vocab[t] for t in rng.choice(len(vocab), size=rng.integers(0, 4), replace=False)],
+         int(rng.integers(1, 50)))
+        for _ in range(n_queries)
+    ]
+    for request, got in zip(batch, engine.recommend_many(batch)):
+        want = brute_force_recommend(courses.values(), *request)
+        if [c["course_id"] for c in want] != [c["course_id"] for c in got]:
+            raise AssertionError(f"batch ranking mismatch for {request}")
+    return n_queries
+
+
+if __name__ == "__main__":
+    print(f"Parity: {check_parity()} queries match the brute-force scorer.")
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    rows, _ = _synthetic_rows(n)
+    engine = VectorScorer()
+    engine.build(rows)
+    runs = 200
+    start = time.perf_counter()
+    for _ in range(runs):
+        engine.recommend(7.0, ["AI", "ML", "tag3"], 10)
+    ms = (time.perf_counter() - start) / runs * 1000
+    print(f"{n} courses: {ms:.2f} ms per recommend")
+
+    batch = [(7.0, ["AI", "ML", f"tag{i % 200}"], 10) for i in range(runs)]
+    start = time.perf_counter()
+    for _ in engine.recommend_many(batch):
+        pass
+    ms = (time.perf_counter() - start) / runs * 1000
+    print(f"{n} courses: {ms:.2f} ms per request in a batch of {runs}")
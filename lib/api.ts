@@ -12,6 +12,13 @@ export type Review = {
 
 export type CourseWithReviews = Course & {
   reviews?: Review[]
+  // Cursor for the reviews after the first page; null when there are no more
+  next_cursor?: number | null
+}
+
+export type ReviewPage = {
+  reviews: Review[]
+  next_cursor: number | null
 }
 
 // Backend base URL
@@ -53,12 +60,27 @@ function mapBackendCourse(c: BackendCourse): Course {
   }
 }
 
+// Last body + ETag per GET path, so unchanged payloads come back as 304s
+const etagCache = new Map<string, { etag: string; data: any }>()
+
 async function apiGet(path: string) {
-  const res = await fetch(`${API_BASE}${path}`, { cache: "no-store" })
+  const cached = etagCache.get(path)
+  const res = await fetch(`${API_BASE}${path}`, {
+    cache: "no-store",
+    headers: cached ? { "If-None-Match": cached.etag } : undefined,
+  })
+  if (res.status === 304 && cached) {
+    return cached.data
+  }
   if (!res.ok) {
     throw new Error(`GET ${path} failed with ${res.status}`)
   }
-  return res.json()
+  const data = await res.json()
+  const etag = res.headers.get("ETag")
+  if (etag) {
+    etagCache.set(path, { etag, data })
+  }
+  return data
 }
 
 async function apiPost(path: string, body: any) {
@@ -139,6 +161,7 @@ export async function getCourseById(id: string): Promise<CourseWithReviews | nul
     }
 
     course.reviews = (data.reviews ?? []) as Review[]
+    course.next_cursor = data.next_cursor ?? null
 
     return course
   } catch (error) {
@@ -150,9 +173,20 @@ export async function getCourseById(id: string): Promise<CourseWithReviews | nul
   const found = courses.find((c) => String(c.course_id) === String(id))
   if (!found) return null
 
-  const course: CourseWithReviews = { ...found, reviews: [] }
+  const course: CourseWithReviews = { ...found, reviews: [], next_cursor: null }
   return course
 }
+
+// Next page of a course's reviews, newest first: pass course.next_cursor,
+// then each page's next_cursor until it is null
+export async function getCourseReviews(id: number | string, cursor: number): Promise<ReviewPage> {
+  const data = await apiGet(`/api/course/${id}/reviews?cursor=${cursor}`)
+  return {
+    reviews: (data.reviews ?? []) as Review[],
+    next_cursor: data.next_cursor ?? null,
+  }
+}
+
 export async function addReview(input: {
   course_id: number
   rating: number